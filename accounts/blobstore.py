@@ -0,0 +1,189 @@
+"""
+按内容寻址的媒体文件存储
+
+文件按 SHA-256 保存在 MEDIA_ROOT/blobs/<前两位>/<三四位>/<sha256><扩展名>，相同内容只保存
+一份，通过 MediaBlob.refcount 记录被多少条 media_files 引用：
+- 新内容：上传临时文件与 MEDIA_ROOT 在同一文件系统时直接硬链接到存储位置，不复制数据
+- 重复内容：不写入任何数据，只增加引用计数
+- 释放：引用计数归零时才删除文件，删除一个数据模型不会影响引用同一文件的其他模型
+
+引用计数归零时保留记录，由后台任务锁定记录后删除文件和记录；任务执行前同一内容又被上传时
+（记录被同一把行锁串行化），引用计数已不为零，任务不删除文件。
+
+引用计数与数据模型在同一事务中修改，保存数据模型失败时引用计数随事务回滚。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from jobs.queue import enqueue, task
+from videos.thumbnails import remove_thumbnails
+
+from .models import MediaBlob
+
+
+BLOB_DIR = 'blobs'
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def blob_relpath(sha256, name):
+    """内容对应的存储路径（相对 MEDIA_ROOT），保留原扩展名便于按类型返回"""
+    ext = os.path.splitext(name)[1].lower()
+    return f'{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def full_path(relpath):
+    """存储路径对应的绝对路径"""
+    return os.path.join(settings.MEDIA_ROOT, relpath)
+
+
+def file_sha256(path):
+    """按块计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def uploaded_file_sha256(uploaded_file):
+    """上传文件的 SHA-256（优先使用上传处理器接收时计算的结果）"""
+    sha256 = getattr(uploaded_file, 'sha256', None)
+    if sha256:
+        return sha256
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def _link_or_copy(src, dest):
+    """硬链接到目标位置，跨文件系统等无法链接时复制"""
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def _write_local_file(path, dest):
+    """把本地文件硬链接到目标位置（源文件保留），先链接为同目录的临时文件再重命名"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.tmp')
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        _link_or_copy(path, tmp)
+        os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(tmp, dest)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_uploaded_file(uploaded_file, dest):
+    """写入上传文件：临时文件直接硬链接，内存文件先写入同目录的临时文件再重命名"""
+    temp_path = getattr(uploaded_file, 'temporary_file_path', None)
+    if temp_path:
+        _write_local_file(temp_path(), dest)
+        return
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+        os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(tmp, dest)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _acquire(sha256, size, name, write):
+    """增加引用计数，内容尚未保存时调用 write(目标路径) 写入文件"""
+    with transaction.atomic():
+        blob, _ = MediaBlob.objects.select_for_update().get_or_create(
+            sha256=sha256,
+            defaults={'size': size, 'path': blob_relpath(sha256, name)},
+        )
+        dest = full_path(blob.path)
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            write(dest)
+        MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+    return blob
+
+
+def store_uploaded_file(uploaded_file):
+    """保存上传文件，返回 MediaBlob"""
+    sha256 = uploaded_file_sha256(uploaded_file)
+    return _acquire(
+        sha256, uploaded_file.size, uploaded_file.name,
+        lambda dest: _write_uploaded_file(uploaded_file, dest),
+    )
+
+
+def store_local_file(path, name):
+    """
+    把本地文件存入存储（同一文件系统内为硬链接），返回 MediaBlob
+
+    源文件保留，由调用方在事务提交后删除：事务回滚时源文件仍在，可以重试；
+    已链接的内容文件在重试时直接复用。
+    """
+    sha256 = file_sha256(path)
+    return _acquire(sha256, os.path.getsize(path), name, lambda dest: _write_local_file(path, dest))
+
+
+def release(sha256):
+    """减少引用计数，归零时由后台任务删除文件和记录"""
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is None or blob.refcount <= 0:
+            return
+        MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+        if blob.refcount <= 1:
+            # 文件由后台任务删除，任务随事务提交，事务回滚时文件仍被引用
+            enqueue(remove_blob_files, args=[blob.path, blob.sha256])
+
+
+@task
+def remove_blob_files(path, sha256):
+    """引用计数仍为零时删除内容文件、缩略图和记录"""
+    with transaction.atomic():
+        # 与 _acquire() 锁定同一行：重新上传和删除不会交错
+        blob = MediaBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is not None and blob.refcount > 0:
+            return False
+        try:
+            os.remove(full_path(path))
+        except FileNotFoundError:
+            pass
+        remove_thumbnails(sha256)
+        if blob is not None:
+            blob.delete()
+    return True
+
+
+def media_entry(blob, name, **extra):
+    """构造 DataModel.media_files 中的一条记录"""
+    entry = {
+        'name': name,
+        'size': blob.size,
+        'path': blob.path,
+        'sha256': blob.sha256,
+    }
+    entry.update(extra)
+    return entry
+
+
+def release_media_files(media_files):
+    """释放 media_files 引用的全部文件（旧格式记录没有 sha256，不做处理）"""
+    for entry in media_files or []:
+        if entry.get('sha256'):
+            release(entry['sha256'])
@@ -0,0 +1,107 @@
+"""
+分块上传（断点续传）
+
+流程：创建会话 -> 逐块 PUT（可带 MD5 校验）-> 完成。每个分块先读入临时文件校验，再在锁定
+会话的事务中写入暂存文件的对应偏移位置；全部分块到齐后把暂存文件链接到媒体文件存储（同一
+文件系统内为硬链接），事务提交后删除暂存文件。完成时锁定并在同一事务中把会话标记为已完成，
+重复或并发的完成请求不会重复创建数据模型，完成后也不再接受分块写入（暂存文件已链接到存储）。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """分块数据不合法"""
+
+
+def staging_dir():
+    """暂存目录"""
+    return settings.UPLOAD_STAGING_DIR
+
+
+def staging_path(session):
+    """会话对应的暂存文件路径"""
+    return os.path.join(staging_dir(), f'{session.id}.part')
+
+
+def create_staging_file(session):
+    """创建与目标文件等长的暂存文件（稀疏文件，不实际占用空间）"""
+    os.makedirs(staging_dir(), exist_ok=True)
+    with open(staging_path(session), 'wb') as f:
+        f.truncate(session.file_size)
+
+
+def receive_chunk(session, index, stream, expected_md5=None):
+    """
+    把 stream 中第 index 块的数据读入临时文件并校验，返回 (临时文件路径, 字节数, MD5)
+
+    边读边写边计算 MD5，大小或校验不符时删除临时文件并抛出 ChunkError。校验通过后再由
+    write_chunk() 写入暂存文件，重传的分块不合法时不会覆盖已收到的数据。
+    """
+    if not 0 <= index < session.total_chunks:
+        raise ChunkError('分块序号超出范围')
+
+    _, length = session.chunk_range(index)
+    os.makedirs(staging_dir(), exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=staging_dir(), prefix=f'{session.id}.{index}.', suffix='.chunk')
+    md5 = hashlib.md5()
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                # 多读一个字节用于发现超长的分块
+                data = stream.read(min(COPY_BUFFER_SIZE, length - written + 1))
+                if not data:
+                    break
+                written += len(data)
+                if written > length:
+                    raise ChunkError('分块大小不正确')
+                md5.update(data)
+                f.write(data)
+
+        if written != length:
+            raise ChunkError('分块大小不正确')
+        digest = md5.hexdigest()
+        if expected_md5 and expected_md5.lower() != digest:
+            raise ChunkError('分块校验失败')
+    except Exception:
+        discard_chunk(path)
+        raise
+    return path, written, digest
+
+
+def write_chunk(session, index, chunk_path):
+    """把已校验的分块复制到暂存文件第 index 块的位置（调用方需锁定会话）"""
+    offset, _ = session.chunk_range(index)
+    with open(chunk_path, 'rb') as src, open(staging_path(session), 'r+b') as dest:
+        dest.seek(offset)
+        shutil.copyfileobj(src, dest, COPY_BUFFER_SIZE)
+
+
+def discard_chunk(chunk_path):
+    """删除分块临时文件"""
+    try:
+        os.remove(chunk_path)
+    except FileNotFoundError:
+        pass
+
+
+def missing_chunks(session):
+    """尚未收到的分块序号"""
+    received = set(session.chunks.values_list('index', flat=True))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def discard_staging_file(session):
+    """删除暂存文件"""
+    try:
+        os.remove(staging_path(session))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import chunked_upload
+from accounts.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = '清理过期未完成的分块上传会话及其暂存文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.CHUNKED_UPLOAD_EXPIRE_HOURS,
+                            help='超过多少小时未更新的会话视为过期')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        expired = UploadSession.objects.filter(status='uploading', updated_at__lt=cutoff)
+        count = 0
+        for session in expired.iterator():
+            chunked_upload.discard_staging_file(session)
+            count += 1
+        expired.delete()
+        UploadSession.objects.filter(status='completed', updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'已清理 {count} 个过期上传会话'))
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from mysite import explain, seed
+
+
+class Command(BaseCommand):
+    help = '请求主要视图并 EXPLAIN 其中的查询，报告全表扫描和额外排序（建议先执行 seed_perf_data）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default=seed.ADMIN_USERNAME, help='以该用户身份请求视图（需拥有全部权限）')
+        parser.add_argument('--min-rows', type=int, default=1000, help='只报告行数不少于此值的表的全表扫描')
+        parser.add_argument('--plans', action='store_true', help='输出每条查询的完整执行计划')
+        parser.add_argument('--output', help='把结果写入 JSON 文件，便于比较加索引前后的计划')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'用户 {options["username"]} 不存在，可先执行 seed_perf_data')
+
+        report = explain.check_views(user, min_rows=options['min_rows'])
+
+        problems = 0
+        for item in report:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{item["view"]} {item["params"] or ""}'.rstrip()))
+            for query in item['queries']:
+                flagged = query['full_scans'] or query['sort']
+                if not flagged and not options['plans']:
+                    continue
+                problems += bool(flagged)
+                for scan in query['full_scans']:
+                    self.stdout.write(self.style.WARNING(f'  全表扫描 {scan["table"]}（{scan["rows"]} 行）'))
+                if query['sort']:
+                    self.stdout.write(self.style.WARNING('  额外排序（未使用索引顺序）'))
+                self.stdout.write(f'    {query["sql"][:300]}')
+                if options['plans']:
+                    for line in query['plan']:
+                        self.stdout.write(f'      {line}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+        total = sum(len(item['queries']) for item in report)
+        message = f'共检查 {len(report)} 个视图、{total} 条查询，{problems} 条存在全表扫描或额外排序'
+        self.stdout.write(self.style.WARNING(message) if problems else self.style.SUCCESS(message))
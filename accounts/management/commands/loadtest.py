@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from accounts.models import User
+from mysite import loadtest, seed
+
+DEFAULT_MIX = 'upload_data_model=1,download_data_model=3,video_upload=1,video_download=3'
+
+
+class Command(BaseCommand):
+    help = ('上传/下载接口压测，结果写入 JSON。'
+            '启动本地服务时需使用 --settings=mysite.settings_loadtest（LOADTEST_DATABASE=sqlite|mysql）')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='压测已运行的服务（如 http://127.0.0.1:8000），不启动本地服务')
+        parser.add_argument('--username', default=seed.ADMIN_USERNAME, help='压测用户')
+        parser.add_argument('--password', default=seed.PASSWORD, help='压测用户密码')
+        parser.add_argument('--server', choices=['gunicorn', 'runserver'], default='gunicorn', help='本地服务类型')
+        parser.add_argument('--workers', type=int, default=3, help='gunicorn 工作进程数')
+        parser.add_argument('--concurrency', type=int, default=8, help='并发用户数')
+        parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+        parser.add_argument('--sizes', default='256K,4M', help='上传文件大小，逗号分隔，如 256K,4M,64M')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='各操作的比例')
+        parser.add_argument('--fresh', action='store_true', help='先清空压测目录（SQLite 数据库和媒体文件）')
+        parser.add_argument('--output', help='结果文件，默认 loadtest_results/<提交>-<时间>.json')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [loadtest.parse_size(size) for size in options['sizes'].split(',')]
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        process = sampler = None
+        base_url = options['url']
+        if base_url is None:
+            self.prepare(options)
+            port = loadtest.free_port()
+            log_path = os.path.join(settings.LOADTEST_DIR, 'server.log')
+            self.stdout.write(f'启动 {options["server"]}（127.0.0.1:{port}，日志 {log_path}）')
+            try:
+                process = loadtest.start_server(
+                    options['server'], settings.SETTINGS_MODULE, options['workers'], port, log_path
+                )
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            sampler = loadtest.RSSSampler(process.pid)
+            sampler.start()
+            base_url = f'http://127.0.0.1:{port}'
+
+        self.stdout.write(f'压测 {base_url}：{options["concurrency"]} 并发，{options["duration"]} 秒')
+        try:
+            results = loadtest.run(
+                base_url, options['username'], options['password'], mix, sizes,
+                options['concurrency'], options['duration'],
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        finally:
+            processes = sampler.stop() if sampler else []
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+        commit = loadtest.git_commit()
+        report = {
+            'commit': commit,
+            'started_at': timezone.now().isoformat(),
+            'config': {
+                'url': options['url'],
+                'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1] if not options['url'] else None,
+                'server': options['server'] if not options['url'] else None,
+                'workers': options['workers'] if not options['url'] else None,
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'sizes': sizes,
+                'mix': mix,
+            },
+            'operations': results,
+            'processes': processes,
+        }
+        output = options['output'] or os.path.join(
+            'loadtest_results', f'{commit or "unknown"}-{timezone.localtime():%Y%m%d-%H%M%S}.json'
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        self.print_summary(results, processes)
+        self.stdout.write(self.style.SUCCESS(f'结果已写入 {output}'))
+
+    def prepare(self, options):
+        """建表并创建压测用户（拥有全部权限）"""
+        directory = getattr(settings, 'LOADTEST_DIR', None)
+        if directory is None:
+            raise CommandError('启动本地服务压测需使用 --settings=mysite.settings_loadtest，或用 --url 指定服务')
+        if options['fresh']:
+            connections.close_all()
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        call_command('migrate', verbosity=0)
+        if options['username'] == seed.ADMIN_USERNAME and not User.objects.filter(username=seed.ADMIN_USERNAME).exists():
+            seed.create_admin(seed.PASSWORD)
+        # 服务进程各自建立连接
+        connections.close_all()
+
+    def print_summary(self, results, processes):
+        self.stdout.write(f'{"操作":<22}{"请求":>8}{"错误":>8}{"req/s":>10}{"MB/s":>10}'
+                          f'{"p50":>10}{"p95":>10}{"p99":>10}')
+        for name, stats in results.items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f'{name:<22}{stats["requests"]:>8}{stats["errors"]:>8}{stats["throughput_rps"]:>10}'
+                f'{stats["throughput_mb_s"]:>10}{latency["p50"] or "-":>10}{latency["p95"] or "-":>10}'
+                f'{latency["p99"] or "-":>10}'
+            )
+            for reason, count in stats['error_reasons'].items():
+                self.stdout.write(f'  {count} 次: {reason}')
+        for item in processes:
+            self.stdout.write(f'{item["role"]} {item["pid"]}: 峰值 RSS {item["peak_rss_mb"]} MB')
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import DailyActivityRollup, UploadLog, DownloadLog
+from accounts.stats import rollup_rows
+from audit.models import OperationLog
+from audit.retention import archived_until
+from mysite.daterange import filter_day_range
+
+
+# 类别 -> (原始日志查询集, rollup_rows 参数)
+SOURCES = {
+    'upload': (UploadLog.objects.all(), {
+        'time_field': 'upload_time', 'bytes_field': 'file_size',
+    }),
+    'download': (DownloadLog.objects.all(), {
+        'time_field': 'download_time', 'bytes_field': 'file_size',
+    }),
+    'operation': (OperationLog.objects.all(), {
+        'time_field': 'operation_time', 'kind_field': 'operation_type', 'status_field': 'result',
+    }),
+}
+
+
+class Command(BaseCommand):
+    help = '根据原始日志回填/重建每日活动汇总表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='只重建该日期（YYYY-MM-DD，含）之后的数据，默认全部重建')
+        parser.add_argument('--category', choices=list(SOURCES), action='append',
+                            help='只重建指定类别，可重复指定，默认全部类别')
+        parser.add_argument('--batch-size', type=int, default=1000, help='批量写入大小')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since 格式应为 YYYY-MM-DD')
+
+        for category in options['category'] or list(SOURCES):
+            queryset, params = SOURCES[category]
+            start = since
+            archived = archived_until('operation') if category == 'operation' else None
+            if archived:
+                # 已归档的操作日志不在数据库中，保留这些日期的汇总；归档按 UTC 月份，边界当天也保留
+                floor = archived + timedelta(days=1)
+                if start is None or start < floor:
+                    start = floor
+                    self.stdout.write(f'{category}: {floor} 之前的日志已归档，从 {floor} 开始重建')
+            total = self.rebuild(category, queryset, params, start, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{category}: 写入 {total} 条汇总记录'))
+
+    @transaction.atomic
+    def rebuild(self, category, queryset, params, since, batch_size):
+        existing = DailyActivityRollup.objects.filter(category=category)
+        if since:
+            existing = existing.filter(date__gte=since)
+            queryset = filter_day_range(queryset, params['time_field'], start_date=since)
+        existing.delete()
+
+        batch = []
+        total = 0
+        for row in rollup_rows(queryset, **params):
+            batch.append(DailyActivityRollup(category=category, **row))
+            if len(batch) >= batch_size:
+                DailyActivityRollup.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            DailyActivityRollup.objects.bulk_create(batch)
+            total += len(batch)
+        return total
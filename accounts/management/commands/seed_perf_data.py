@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import User
+from mysite import seed
+
+
+class Command(BaseCommand):
+    help = '生成性能测试/压测数据（默认数量见 mysite.seed，也可用 PERF_* 环境变量指定）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, help='普通用户数')
+        parser.add_argument('--models', type=int, help='数据模型数，如 100000')
+        parser.add_argument('--logs', type=int, help='每类日志的条数，如 1000000')
+        parser.add_argument('--videos', type=int, help='视频数')
+        parser.add_argument('--batch-size', type=int, default=5000, help='批量写入大小')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username=seed.ADMIN_USERNAME).exists():
+            raise CommandError(f'数据库中已有性能测试数据（用户 {seed.ADMIN_USERNAME}）')
+        with transaction.atomic():
+            seed.seed(
+                users=options['users'], models=options['models'], logs=options['logs'],
+                videos=options['videos'], batch_size=options['batch_size'], stdout=self.stdout,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'已生成性能测试数据，管理员 {seed.ADMIN_USERNAME} / {seed.PASSWORD}'
+        ))
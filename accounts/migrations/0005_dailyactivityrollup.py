@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-17 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_uploadlog_source_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('category', models.CharField(choices=[('upload', '上传记录'), ('download', '下载记录'), ('operation', '操作日志')], max_length=20, verbose_name='类别')),
+                ('kind', models.CharField(blank=True, default='', max_length=20, verbose_name='操作类型')),
+                ('status', models.CharField(max_length=20, verbose_name='状态')),
+                ('count', models.IntegerField(default=0, verbose_name='次数')),
+                ('total_bytes', models.BigIntegerField(default=0, verbose_name='字节数')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '每日活动汇总',
+                'verbose_name_plural': '每日活动汇总',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailyactivityrollup',
+            index=models.Index(fields=['category', 'date'], name='rollup_category_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyactivityrollup',
+            unique_together={('user', 'date', 'category', 'kind', 'status')},
+        ),
+    ]
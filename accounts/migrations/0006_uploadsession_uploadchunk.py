@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-17 01:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_dailyactivityrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='文件名')),
+                ('file_size', models.BigIntegerField(verbose_name='文件大小')),
+                ('chunk_size', models.IntegerField(verbose_name='分块大小')),
+                ('status', models.CharField(choices=[('uploading', '上传中'), ('completed', '已完成')], default='uploading', max_length=20, verbose_name='状态')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '分块上传会话',
+                'verbose_name_plural': '分块上传会话',
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField(verbose_name='分块序号')),
+                ('size', models.IntegerField(verbose_name='分块大小')),
+                ('md5', models.CharField(max_length=32, verbose_name='MD5')),
+                ('received_at', models.DateTimeField(auto_now=True, verbose_name='接收时间')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='accounts.uploadsession', verbose_name='上传会话')),
+            ],
+            options={
+                'verbose_name': '上传分块',
+                'verbose_name_plural': '上传分块',
+                'unique_together': {('session', 'index')},
+            },
+        ),
+    ]
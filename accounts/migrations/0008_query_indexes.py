@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datamodel',
+            index=models.Index(fields=['created_at'], name='datamodel_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datamodel',
+            index=models.Index(fields=['source', 'created_at'], name='datamodel_source_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datamodel',
+            index=models.Index(fields=['project_tag', 'created_at'], name='datamodel_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downloadlog',
+            index=models.Index(fields=['user', 'download_time'], name='downloadlog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downloadlog',
+            index=models.Index(fields=['user', 'status', 'download_time'], name='downloadlog_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadlog',
+            index=models.Index(fields=['user', 'upload_time'], name='uploadlog_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadlog',
+            index=models.Index(fields=['user', 'status', 'upload_time'], name='uploadlog_user_status_time_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:02
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+
+def fill_user_key(apps, schema_editor):
+    """user_key 取用户 ID；匿名活动原先可能有重复行，合并为一行"""
+    DailyActivityRollup = apps.get_model('accounts', 'DailyActivityRollup')
+    DailyActivityRollup.objects.filter(user__isnull=False).update(user_key=F('user_id'))
+
+    duplicates = DailyActivityRollup.objects.filter(user__isnull=True).values(
+        'date', 'category', 'kind', 'status',
+    ).annotate(rows=Count('id'), keep=Min('id'), count_sum=Sum('count'), bytes_sum=Sum('total_bytes')).filter(rows__gt=1)
+    for group in duplicates:
+        rows = DailyActivityRollup.objects.filter(
+            user__isnull=True, date=group['date'], category=group['category'],
+            kind=group['kind'], status=group['status'],
+        )
+        rows.filter(id=group['keep']).update(count=group['count_sum'], total_bytes=group['bytes_sum'])
+        rows.exclude(id=group['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyactivityrollup',
+            name='user_key',
+            field=models.PositiveIntegerField(default=0, verbose_name='用户键'),
+        ),
+        migrations.RunPython(fill_user_key, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='dailyactivityrollup',
+            unique_together={('user_key', 'date', 'category', 'kind', 'status')},
+        ),
+    ]
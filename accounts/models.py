@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import datetime
+import uuid
 
 
 class User(AbstractUser):
@@ -112,6 +113,13 @@ class DataModel(models.Model):
     class Meta:
         verbose_name = "数据模型"
         verbose_name_plural = "数据模型"
+        # 数据管理页按 (created_at, id) 倒序游标分页，可按来源、项目筛选。
+        # 索引用升序：索引项末尾隐含主键升序，反向扫描正好是 (created_at DESC, id DESC)
+        indexes = [
+            models.Index(fields=['created_at'], name='datamodel_created_idx'),
+            models.Index(fields=['source', 'created_at'], name='datamodel_source_created_idx'),
+            models.Index(fields=['project_tag', 'created_at'], name='datamodel_project_created_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -129,6 +137,11 @@ class UploadLog(models.Model):
     class Meta:
         verbose_name = "上传日志"
         verbose_name_plural = "上传日志"
+        # 我的数据（按用户）和仪表盘（按用户、状态）的最近记录
+        indexes = [
+            models.Index(fields=['user', 'upload_time'], name='uploadlog_user_time_idx'),
+            models.Index(fields=['user', 'status', 'upload_time'], name='uploadlog_user_status_time_idx'),
+        ]
 
 
 class DownloadLog(models.Model):
@@ -143,4 +156,96 @@ class DownloadLog(models.Model):
     
     class Meta:
         verbose_name = "下载日志"
-        verbose_name_plural = "下载日志"
\ No newline at end of file
+        verbose_name_plural = "下载日志"
+        indexes = [
+            models.Index(fields=['user', 'download_time'], name='downloadlog_user_time_idx'),
+            models.Index(fields=['user', 'status', 'download_time'], name='downloadlog_user_status_idx'),
+        ]
+
+class DailyActivityRollup(models.Model):
+    """每日活动汇总（按用户、日期、类别、操作类型、状态累计）"""
+    CATEGORY_CHOICES = [
+        ('upload', '上传记录'),
+        ('download', '下载记录'),
+        ('operation', '操作日志'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="用户")
+    # 唯一约束中的 NULL 互不相等，匿名活动用 user_key = 0 参与唯一约束，避免并发插入重复行
+    user_key = models.PositiveIntegerField(default=0, verbose_name="用户键")
+    date = models.DateField(verbose_name="日期")
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, verbose_name="类别")
+    kind = models.CharField(max_length=20, default='', blank=True, verbose_name="操作类型")
+    status = models.CharField(max_length=20, verbose_name="状态")
+    count = models.IntegerField(default=0, verbose_name="次数")
+    total_bytes = models.BigIntegerField(default=0, verbose_name="字节数")
+    
+    class Meta:
+        verbose_name = "每日活动汇总"
+        verbose_name_plural = "每日活动汇总"
+        unique_together = ['user_key', 'date', 'category', 'kind', 'status']
+        indexes = [
+            models.Index(fields=['category', 'date'], name='rollup_category_date_idx'),
+        ]
+
+
+
+class UploadSession(models.Model):
+    """分块上传会话（断点续传）"""
+    STATUS_CHOICES = [
+        ('uploading', '上传中'),
+        ('completed', '已完成'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="用户")
+    filename = models.CharField(max_length=255, verbose_name="文件名")
+    file_size = models.BigIntegerField(verbose_name="文件大小")
+    chunk_size = models.IntegerField(verbose_name="分块大小")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading', verbose_name="状态")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+    
+    class Meta:
+        verbose_name = "分块上传会话"
+        verbose_name_plural = "分块上传会话"
+    
+    @property
+    def total_chunks(self):
+        """分块总数（空文件按一个空块计算）"""
+        return max(1, -(-self.file_size // self.chunk_size))
+    
+    def chunk_range(self, index):
+        """返回第 index 块的 (偏移量, 长度)"""
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.file_size - offset)
+
+
+class UploadChunk(models.Model):
+    """已接收的分块"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks', verbose_name="上传会话")
+    index = models.IntegerField(verbose_name="分块序号")
+    size = models.IntegerField(verbose_name="分块大小")
+    md5 = models.CharField(max_length=32, verbose_name="MD5")
+    received_at = models.DateTimeField(auto_now=True, verbose_name="接收时间")
+    
+    class Meta:
+        verbose_name = "上传分块"
+        verbose_name_plural = "上传分块"
+        unique_together = ['session', 'index']
+
+
+class MediaBlob(models.Model):
+    """按内容寻址存储的媒体文件（相同内容只保存一份）"""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    size = models.BigIntegerField(verbose_name="文件大小")
+    path = models.CharField(max_length=255, verbose_name="存储路径")
+    refcount = models.IntegerField(default=0, verbose_name="引用计数")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    
+    class Meta:
+        verbose_name = "媒体文件"
+        verbose_name_plural = "媒体文件"
+    
+    def __str__(self):
+        return self.sha256
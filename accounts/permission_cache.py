@@ -0,0 +1,69 @@
+"""
+模块权限快照缓存
+
+check_permission 需要的四个模块权限在一次请求内只加载一次（挂在 request.user 上），
+跨请求缓存在 Django 缓存中，键包含用户 ID 和全局版本号。权限组或用户权限变更时
+递增版本号，旧快照随之失效。
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserPermission
+
+
+VERSION_KEY = 'accounts:permission_version'
+
+# 模块名 -> PermissionGroup 字段
+PERMISSION_FIELDS = {
+    'dashboard': 'can_view_dashboard',
+    'my_data': 'can_view_my_data',
+    'data_management': 'can_view_data_management',
+    'system_settings': 'can_view_system_settings',
+}
+
+
+def get_version():
+    """获取当前权限版本号"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 以时间戳作为初始值，缓存被清空后不会与旧版本号重复
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """递增权限版本号，使所有已缓存的权限快照失效"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns() // 1000, None)
+
+
+def load_snapshot(user):
+    """从数据库加载用户的模块权限，未分配权限组时返回空字典"""
+    try:
+        user_permission = UserPermission.objects.select_related('permission_group').get(user=user)
+    except UserPermission.DoesNotExist:
+        return {}
+    permission_group = user_permission.permission_group
+    return {name: getattr(permission_group, field) for name, field in PERMISSION_FIELDS.items()}
+
+
+def get_permission_snapshot(user):
+    """获取用户的模块权限快照（请求内缓存 + 跨请求缓存）"""
+    snapshot = getattr(user, '_permission_snapshot', None)
+    if snapshot is not None:
+        return snapshot
+    if not user.is_authenticated:
+        return {}
+
+    key = f'accounts:permissions:{user.pk}:{get_version()}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = load_snapshot(user)
+        cache.set(key, snapshot, getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300))
+    user._permission_snapshot = snapshot
+    return snapshot
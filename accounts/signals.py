@@ -0,0 +1,60 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import PermissionGroup, UserPermission, UploadLog, DownloadLog, DataModel
+from .blobstore import release_media_files
+from .permission_cache import bump_version
+from .stats import record_activity
+
+
+@receiver(post_save, sender=UploadLog)
+def rollup_upload_log(sender, instance, created, **kwargs):
+    """新增上传日志时累加每日汇总"""
+    if created:
+        record_activity('upload', instance.user_id, instance.upload_time, instance.status,
+                        total_bytes=instance.file_size)
+
+
+@receiver(post_delete, sender=UploadLog)
+def unroll_upload_log(sender, instance, **kwargs):
+    """删除上传日志时扣减每日汇总"""
+    record_activity('upload', instance.user_id, instance.upload_time, instance.status,
+                    count=-1, total_bytes=-instance.file_size)
+
+
+@receiver(post_save, sender=DownloadLog)
+def rollup_download_log(sender, instance, created, **kwargs):
+    """新增下载日志时累加每日汇总"""
+    if created:
+        record_activity('download', instance.user_id, instance.download_time, instance.status,
+                        total_bytes=instance.file_size)
+
+
+@receiver(post_delete, sender=DownloadLog)
+def unroll_download_log(sender, instance, **kwargs):
+    """删除下载日志时扣减每日汇总"""
+    record_activity('download', instance.user_id, instance.download_time, instance.status,
+                    count=-1, total_bytes=-instance.file_size)
+
+
+@receiver(post_save, sender='audit.OperationLog')
+def rollup_operation_log(sender, instance, created, **kwargs):
+    """新增操作日志时累加每日汇总（操作日志只追加，不做扣减）"""
+    if created:
+        record_activity('operation', instance.user_id, instance.operation_time, instance.result,
+                        kind=instance.operation_type)
+
+
+@receiver(post_save, sender=PermissionGroup)
+@receiver(post_delete, sender=PermissionGroup)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def invalidate_permission_snapshots(sender, **kwargs):
+    """权限组或用户权限变更后，使缓存的权限快照失效"""
+    bump_version()
+
+
+@receiver(post_delete, sender=DataModel)
+def release_data_model_media(sender, instance, **kwargs):
+    """删除数据模型时释放其媒体文件的引用"""
+    release_media_files(instance.media_files)
@@ -0,0 +1,141 @@
+"""
+数据统计聚合
+
+按自然日（当前时区）对上传/下载/操作记录做汇总。原始日志写入时增量更新
+DailyActivityRollup，统计页面只读取汇总表，查询量与历史数据量无关。
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyActivityRollup
+
+
+def local_day_window(days, today=None):
+    """返回最近 days 个自然日（含今天）的日期列表，按时间升序"""
+    today = today or timezone.localdate()
+    return [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+
+
+def fill_series(counts, dates):
+    """按日期列表补零，返回与 dates 等长的数量列表"""
+    return [counts.get(day, 0) for day in dates]
+
+
+def record_activity(category, user_id, when, status, kind='', count=1, total_bytes=0):
+    """
+    增量累加一条汇总记录
+
+    先尝试原子 UPDATE，行不存在时再插入；并发插入冲突时回退为 UPDATE。
+    count/total_bytes 可以为负数，用于撤销已删除的日志。
+    """
+    lookup = {
+        'user_key': user_id or 0,
+        'date': timezone.localdate(when),
+        'category': category,
+        'kind': kind or '',
+        'status': status,
+    }
+    increments = {
+        'count': F('count') + count,
+        'total_bytes': F('total_bytes') + total_bytes,
+    }
+    if DailyActivityRollup.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DailyActivityRollup.objects.create(user_id=user_id, count=count, total_bytes=total_bytes, **lookup)
+    except IntegrityError:
+        DailyActivityRollup.objects.filter(**lookup).update(**increments)
+
+
+def rollup_rows(queryset, time_field, user_field='user_id', kind_field=None,
+                status_field='status', bytes_field=None):
+    """
+    将原始日志按 (用户, 日期, 类型, 状态) 分组聚合，用于回填汇总表
+
+    返回字典迭代器，键与 DailyActivityRollup 字段一致。
+    """
+    group_by = {
+        'rollup_user': F(user_field),
+        'rollup_date': TruncDate(time_field, tzinfo=timezone.get_current_timezone()),
+        'rollup_status': F(status_field),
+    }
+    if kind_field:
+        group_by['rollup_kind'] = F(kind_field)
+    aggregates = {'rollup_count': Count('id')}
+    if bytes_field:
+        aggregates['rollup_bytes'] = Sum(bytes_field)
+
+    rows = queryset.values(**group_by).annotate(**aggregates).order_by()
+    for row in rows.iterator():
+        yield {
+            'user_id': row['rollup_user'],
+            'user_key': row['rollup_user'] or 0,
+            'date': row['rollup_date'],
+            'kind': row.get('rollup_kind') or '',
+            'status': row['rollup_status'],
+            'count': row['rollup_count'],
+            'total_bytes': row.get('rollup_bytes') or 0,
+        }
+
+
+def user_activity_summary(user, days=30, recent_days=7):
+    """
+    用户上传/下载统计，供仪表盘使用
+
+    读取每日汇总表：一次查询合计，一次查询最近 days 天的逐日数据。
+    最近 recent_days 天按自然日（含今天）计算。
+    """
+    rollups = DailyActivityRollup.objects.filter(
+        user=user,
+        category__in=['upload', 'download'],
+        status='success',
+    )
+    totals = {
+        row['category']: row['count']
+        for row in rollups.values('category').annotate(count=Sum('count')).order_by()
+    }
+
+    dates = local_day_window(days)
+    series = {'upload': {}, 'download': {}}
+    daily_rows = rollups.filter(date__gte=dates[0]).values('category', 'date').annotate(
+        count=Sum('count')
+    ).order_by()
+    for row in daily_rows:
+        series[row['category']][row['date']] = row['count']
+
+    upload_counts = fill_series(series['upload'], dates)
+    download_counts = fill_series(series['download'], dates)
+    return {
+        'total_uploads': totals.get('upload', 0),
+        'total_downloads': totals.get('download', 0),
+        'recent_uploads': sum(upload_counts[-recent_days:]),
+        'recent_downloads': sum(download_counts[-recent_days:]),
+        'dates': [day.strftime('%m-%d') for day in dates],
+        'upload_counts': upload_counts,
+        'download_counts': download_counts,
+    }
+
+
+def operation_statistics(days=30, top_users=10):
+    """操作日志统计（按日期、类型、结果、用户），读取每日汇总表"""
+    operations = DailyActivityRollup.objects.filter(category='operation')
+    recent_dates = operations.values('date').annotate(
+        count=Sum('count')
+    ).order_by('-date')[:days]
+    return {
+        'operation_stats': list(reversed(recent_dates)),
+        'operation_type_stats': operations.values(operation_type=F('kind')).annotate(
+            count=Sum('count')
+        ).order_by('-count'),
+        'result_stats': operations.values(result=F('status')).annotate(
+            count=Sum('count')
+        ).order_by('-count'),
+        'user_stats': operations.filter(user__isnull=False).values('user__username').annotate(
+            count=Sum('count')
+        ).order_by('-count')[:top_users],
+    }
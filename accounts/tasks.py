@@ -0,0 +1,16 @@
+"""
+accounts 的后台任务
+"""
+import os
+
+from jobs.queue import task
+
+
+@task
+def delete_files(paths):
+    """删除文件，已不存在的忽略"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
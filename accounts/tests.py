@@ -1,3 +1,424 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings as django_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.backends import DatabaseBackend, LocalBackend
+from jobs.models import Job
+from mysite.testing import PerformanceTestCase
+
+from . import blobstore, chunked_upload
+from .models import DailyActivityRollup, DataModel, DownloadLog, MediaBlob, UploadLog, UploadSession
+from .stats import record_activity
+
+
+class ViewPerformanceTests(PerformanceTestCase):
+    """页面和接口的查询预算"""
+
+    def test_login(self):
+        self.client.logout()
+        self.assertBudget(reverse('accounts:login'), queries=0)
+
+    def test_dashboard(self):
+        self.assertBudget(reverse('accounts:dashboard'), queries=6)
+
+    def test_my_data(self):
+        self.assertBudget(reverse('accounts:my_data'), queries=8)
+        response = self.assertBudget(reverse('accounts:my_data'), queries=8)
+        uploads, downloads = response.context['user_uploads'], response.context['user_downloads']
+        self.assertBudget(reverse('accounts:my_data'), queries=8, data={
+            'upload_cursor': uploads.next_cursor, 'download_cursor': downloads.next_cursor,
+        })
+
+    def test_data_management(self):
+        # 表统计信息查询 + 限量计数（SQLite 未执行 ANALYZE 时没有统计信息）
+        self.assertBudget(reverse('accounts:data_management'), queries=7)
+        self.assertBudget(reverse('accounts:data_management'), queries=7, data={
+            'source': 'internal', 'model_name': '模型', 'start_date': '2000-01-01', 'end_date': '2999-12-31',
+        })
+
+    def test_system_settings(self):
+        self.assertBudget(reverse('accounts:system_settings'), queries=3)
+
+    def test_person(self):
+        self.assertBudget(reverse('accounts:person'), queries=2)
+
+    def test_model_detail(self):
+        model = DataModel.objects.first()
+        self.assertBudget(reverse('accounts:get_data_model', args=[model.id]), queries=3)
+        self.assertBudget(reverse('accounts:get_model_detail', args=[model.id]), queries=3)
+
+    def test_log_detail(self):
+        upload_log = UploadLog.objects.filter(user=self.admin).first()
+        download_log = DownloadLog.objects.filter(user=self.admin).first()
+        self.assertBudget(reverse('accounts:get_upload_log_detail', args=[upload_log.id]), queries=3)
+        self.assertBudget(reverse('accounts:get_download_log_detail', args=[download_log.id]), queries=3)
+
+    def test_download_data_model(self):
+        model = DataModel.objects.first()
+        self.assertBudget(reverse('accounts:download_data_model', args=[model.id]), queries=5, method='POST')
+
+    def test_delete_model(self):
+        legacy = DataModel.objects.create(
+            name='旧格式', source='internal', infringement_risk='no', model_level='normal', created_by=self.admin,
+            media_files=[{'name': 'old.jpg', 'path': 'media_files/old.jpg'}],
+        )
+        empty = DataModel.objects.create(
+            name='无文件', source='internal', infringement_risk='no', model_level='normal', created_by=self.admin,
+        )
+        with mock.patch('jobs.backends.get_backend', return_value=DatabaseBackend()):
+            responses = [
+                self.client.post(reverse('accounts:delete_model', args=[model.id])) for model in (legacy, empty)
+            ]
+        # 有无需要删除的文件，响应都是任务已提交
+        for response in responses:
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(set(response.json()), {'success', 'message', 'data'})
+        job = Job.objects.get(id=responses[0].json()['data']['job_id'])
+        self.assertEqual(job.args, [[os.path.join(django_settings.MEDIA_ROOT, 'media_files/old.jpg')]])
+        self.assertFalse(DataModel.objects.filter(id__in=[legacy.id, empty.id]).exists())
+
+
+class ActivityRollupTests(TestCase):
+    """每日汇总的唯一约束"""
+
+    def test_anonymous_activity_single_row(self):
+        now = timezone.now()
+        record_activity('operation', None, now, 'success', kind='view')
+        record_activity('operation', None, now, 'success', kind='view', count=2)
+        rollup = DailyActivityRollup.objects.get(user__isnull=True)
+        self.assertEqual((rollup.user_key, rollup.count), (0, 3))
+
+        # 并发插入时第二行违反唯一约束，record_activity 回退为 UPDATE
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyActivityRollup.objects.create(
+                user=None, date=rollup.date, category='operation', kind='view', status='success', count=1,
+            )
+
+
+class MediaAccessTests(PerformanceTestCase):
+    """媒体文件只能经权限检查后下载"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, SENDFILE_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.model = DataModel.objects.first()
+        media_file = self.model.media_files[0]
+        for path in (media_file['path'], media_file['thumbnails'][0]['jpeg']):
+            os.makedirs(os.path.join(self.media_root, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(self.media_root, path), 'wb') as f:
+                f.write(b'image')
+        self.other = get_user_model().objects.create_user('media_other', password='x')
+
+    def test_serve_model_media(self):
+        url = reverse('accounts:serve_model_media', args=[self.model.id, 0])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'image')
+        response.close()
+        self.assertEqual(self.client.get(reverse('accounts:serve_model_media', args=[self.model.id, 5])).status_code, 404)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_serve_model_thumbnail(self):
+        width = self.model.media_files[0]['thumbnails'][0]['width']
+        url = reverse('accounts:serve_model_thumbnail', args=[self.model.id, 0, width, 'jpeg'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        response.close()
+        # 缩略图文件不存在或格式不支持
+        self.assertEqual(self.client.get(
+            reverse('accounts:serve_model_thumbnail', args=[self.model.id, 0, width, 'webp'])
+        ).status_code, 404)
+        self.assertEqual(self.client.get(
+            reverse('accounts:serve_model_thumbnail', args=[self.model.id, 0, width, 'png'])
+        ).status_code, 404)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_model_detail_links_protected_urls(self):
+        response = self.client.get(reverse('accounts:get_model_detail', args=[self.model.id]))
+        media_file = response.json()['model']['media_files'][0]
+        self.assertEqual(media_file['url'], reverse('accounts:serve_model_media', args=[self.model.id, 0]))
+
+
+class ChunkedUploadTests(PerformanceTestCase):
+    """分块上传：校验、断点续传和完成"""
+
+    CONTENT = b'0123456789' * 5
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(
+            MEDIA_ROOT=media_root, UPLOAD_STAGING_DIR=os.path.join(media_root, 'staging'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # 缩略图任务只写入任务表，不在线程池中执行（线程使用独立的数据库连接）
+        backend = mock.patch('jobs.backends.get_backend', return_value=DatabaseBackend())
+        backend.start()
+        self.addCleanup(backend.stop)
+
+    def init(self, content=CONTENT, chunk_size=20):
+        response = self.client.post(reverse('accounts:init_chunked_upload'), json.dumps({
+            'filename': 'scene.bin', 'file_size': len(content), 'chunk_size': chunk_size,
+        }), content_type='application/json')
+        return response.json()['data']
+
+    def put_chunk(self, upload_id, index, data, md5=None):
+        return self.client.put(
+            reverse('accounts:upload_chunk', args=[upload_id, index]), data,
+            content_type='application/octet-stream', HTTP_X_CHUNK_MD5=md5 or hashlib.md5(data).hexdigest(),
+        )
+
+    def upload(self, content=CONTENT, chunk_size=20):
+        upload = self.init(content, chunk_size)
+        for index in range(upload['total_chunks']):
+            self.assertEqual(self.put_chunk(upload['upload_id'], index, content[index * chunk_size:][:chunk_size])
+                             .status_code, 200)
+        return upload['upload_id']
+
+    def status(self, upload_id):
+        return self.client.get(reverse('accounts:get_chunked_upload_status', args=[upload_id])).json()['data']
+
+    def finalize(self, *upload_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('accounts:finalize_chunked_upload'), json.dumps({
+                'name': '分块上传', 'source': 'internal', 'infringement_risk': 'no', 'model_level': 'normal',
+                'upload_ids': list(upload_ids),
+            }), content_type='application/json')
+        return response
+
+    def test_checksum_mismatch(self):
+        upload = self.init()
+        response = self.put_chunk(upload['upload_id'], 0, self.CONTENT[:20], md5='0' * 32)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.status(upload['upload_id'])['missing_chunks'], [0, 1, 2])
+
+        self.assertEqual(self.put_chunk(upload['upload_id'], 0, self.CONTENT[:19]).status_code, 400)
+        self.assertEqual(self.put_chunk(upload['upload_id'], 3, b'').status_code, 400)
+
+    def test_invalid_resend_keeps_received_chunk(self):
+        upload_id = self.upload()
+        self.assertEqual(self.put_chunk(upload_id, 0, b'x' * 20, md5='0' * 32).status_code, 400)
+        self.assertEqual(self.put_chunk(upload_id, 0, b'x' * 21).status_code, 400)
+        self.assertEqual(self.status(upload_id)['missing_chunks'], [])
+
+        data_model = DataModel.objects.get(id=self.finalize(upload_id).json()['data']['id'])
+        self.assertEqual(data_model.media_files[0]['sha256'], hashlib.sha256(self.CONTENT).hexdigest())
+        # 分块临时文件均已删除
+        self.assertEqual(os.listdir(django_settings.UPLOAD_STAGING_DIR), [])
+
+    def test_chunk_after_finalize_rejected(self):
+        upload_id = self.upload()
+        self.assertEqual(self.finalize(upload_id).status_code, 202)
+        self.assertEqual(self.put_chunk(upload_id, 0, self.CONTENT[:20]).status_code, 404)
+
+        # 读取分块数据期间完成请求已提交：锁定会话后发现已完成，不写入暂存文件
+        session = UploadSession.objects.get(id=upload_id)
+        with mock.patch('accounts.views.get_object_or_404', return_value=session), \
+                mock.patch('accounts.chunked_upload.write_chunk') as write_chunk:
+            self.assertEqual(self.put_chunk(upload_id, 0, self.CONTENT[:20]).status_code, 409)
+        write_chunk.assert_not_called()
+
+    def test_missing_chunk(self):
+        upload = self.init()
+        self.put_chunk(upload['upload_id'], 0, self.CONTENT[:20])
+        self.put_chunk(upload['upload_id'], 2, self.CONTENT[40:])
+        self.assertEqual(self.status(upload['upload_id'])['missing_chunks'], [1])
+
+        models = DataModel.objects.count()
+        response = self.finalize(upload['upload_id'])
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(DataModel.objects.count(), models)
+        self.assertEqual(self.status(upload['upload_id'])['status'], 'uploading')
+
+    def test_finalize(self):
+        upload_id = self.upload()
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 202)
+        data_model = DataModel.objects.get(id=response.json()['data']['id'])
+        media_file = data_model.media_files[0]
+        self.assertEqual(media_file['sha256'], hashlib.sha256(self.CONTENT).hexdigest())
+        with open(os.path.join(django_settings.MEDIA_ROOT, media_file['path']), 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+        session = UploadSession.objects.get(id=upload_id)
+        self.assertEqual(session.status, 'completed')
+        self.assertFalse(session.chunks.exists())
+        self.assertFalse(os.path.exists(chunked_upload.staging_path(session)))
+
+        # 重复提交不会再创建数据模型，也不会增加引用计数
+        response = self.finalize(upload_id)
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(DataModel.objects.filter(name='分块上传').count(), 1)
+        self.assertEqual(MediaBlob.objects.get(sha256=media_file['sha256']).refcount, 1)
+
+    def test_finalize_rejects_unknown_sessions(self):
+        upload_id = self.upload()
+        response = self.finalize(upload_id, '00000000-0000-0000-0000-000000000000')
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(UploadSession.objects.get(id=upload_id).status, 'uploading')
+
+        other = get_user_model().objects.create_user('upload_other', password='x')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(
+            reverse('accounts:get_chunked_upload_status', args=[upload_id])
+        ).status_code, 404)
+
+    def test_finalize_retry_after_failure(self):
+        upload_id = self.upload()
+        with mock.patch('accounts.views._create_data_model', side_effect=RuntimeError('数据库错误')):
+            response = self.finalize(upload_id)
+        self.assertFalse(response.json()['success'])
+
+        # 事务回滚后暂存文件和会话都保留，可以重试
+        session = UploadSession.objects.get(id=upload_id)
+        self.assertEqual(session.status, 'uploading')
+        self.assertTrue(os.path.exists(chunked_upload.staging_path(session)))
+        self.assertFalse(MediaBlob.objects.filter(sha256=hashlib.sha256(self.CONTENT).hexdigest()).exists())
+
+        self.assertEqual(self.finalize(upload_id).status_code, 202)
+        self.assertEqual(MediaBlob.objects.get(sha256=hashlib.sha256(self.CONTENT).hexdigest()).refcount, 1)
+
+
+class DataModelUpdateTests(PerformanceTestCase):
+    """编辑数据模型时替换媒体文件"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root, UPLOAD_INCOMING_DIR=os.path.join(media_root, 'incoming'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        backend = mock.patch('jobs.backends.get_backend', return_value=DatabaseBackend())
+        backend.start()
+        self.addCleanup(backend.stop)
+
+    def update(self, model, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('accounts:update_data_model', args=[model.id]), {
+                'name': '已编辑', 'project_tag': '', 'location_tag': '',
+                'media_file': SimpleUploadedFile('scene.jpg', content),
+            }).json()
+
+    def test_replace_media_file(self):
+        model = DataModel.objects.first()
+        self.assertTrue(self.update(model, b'first')['success'])
+        first = hashlib.sha256(b'first').hexdigest()
+        self.assertEqual(MediaBlob.objects.get(sha256=first).refcount, 1)
+
+        self.assertTrue(self.update(model, b'second')['success'])
+        model.refresh_from_db()
+        self.assertEqual(model.name, '已编辑')
+        self.assertIsNone(model.project_tag_id)
+        self.assertEqual([entry['sha256'] for entry in model.media_files], [hashlib.sha256(b'second').hexdigest()])
+        # 原文件的引用已释放
+        self.assertEqual(MediaBlob.objects.get(sha256=first).refcount, 0)
+
+    def test_requires_permission(self):
+        self.client.force_login(get_user_model().objects.create_user('update_other', password='x'))
+        model = DataModel.objects.first()
+        self.assertFalse(self.update(model, b'data')['success'])
+        self.assertNotEqual(DataModel.objects.get(id=model.id).name, '已编辑')
+
+
+class BlobStoreTests(TestCase):
+    """按内容寻址存储的去重和引用计数"""
+
+    CONTENT = b'blob-content' * 100
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, JOBS_LOCAL_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # 删除文件的任务在事务提交后同步执行
+        backend = mock.patch('jobs.backends.get_backend', return_value=LocalBackend())
+        backend.start()
+        self.addCleanup(backend.stop)
+
+    def test_duplicate_content_stored_once(self):
+        first = blobstore.store_uploaded_file(SimpleUploadedFile('a.jpg', self.CONTENT))
+        second = blobstore.store_uploaded_file(SimpleUploadedFile('b.png', self.CONTENT))
+        self.assertEqual(first.pk, second.pk)
+        blob = MediaBlob.objects.get(pk=first.pk)
+        self.assertEqual((blob.refcount, blob.size), (2, len(self.CONTENT)))
+        self.assertEqual(blob.sha256, hashlib.sha256(self.CONTENT).hexdigest())
+        # 路径保留第一次上传的扩展名
+        self.assertTrue(blob.path.endswith('.jpg'))
+        with open(blobstore.full_path(blob.path), 'rb') as f:
+            self.assertEqual(f.read(), self.CONTENT)
+
+    def test_uploaded_digest_reused(self):
+        uploaded = SimpleUploadedFile('a.jpg', self.CONTENT)
+        uploaded.sha256 = 'f' * 64
+        self.assertEqual(blobstore.uploaded_file_sha256(uploaded), 'f' * 64)
+
+    def test_release(self):
+        blob = blobstore.store_uploaded_file(SimpleUploadedFile('a.jpg', self.CONTENT))
+        blobstore.store_uploaded_file(SimpleUploadedFile('a.jpg', self.CONTENT))
+        path = blobstore.full_path(blob.path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blobstore.release(blob.sha256)
+        self.assertEqual(MediaBlob.objects.get(pk=blob.pk).refcount, 1)
+        self.assertTrue(os.path.exists(path))
+
+        # 最后一个引用释放后删除记录，文件由提交后执行的任务删除
+        with self.captureOnCommitCallbacks(execute=True):
+            blobstore.release_media_files([blobstore.media_entry(blob, 'a.jpg'), {'name': 'legacy.jpg'}])
+        self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(os.path.exists(path))
+        blobstore.release(blob.sha256)
+
+    def test_reupload_before_removal(self):
+        blob = blobstore.store_uploaded_file(SimpleUploadedFile('a.jpg', self.CONTENT))
+        with mock.patch('jobs.backends.get_backend', return_value=DatabaseBackend()):
+            with self.captureOnCommitCallbacks(execute=True):
+                blobstore.release(blob.sha256)
+        self.assertEqual(MediaBlob.objects.get(pk=blob.pk).refcount, 0)
+
+        # 删除任务执行前又上传了相同内容：复用记录和文件，任务不再删除
+        self.assertEqual(blobstore.store_uploaded_file(SimpleUploadedFile('b.jpg', self.CONTENT)).pk, blob.pk)
+        self.assertFalse(blobstore.remove_blob_files(blob.path, blob.sha256))
+        self.assertEqual(MediaBlob.objects.get(pk=blob.pk).refcount, 1)
+        self.assertTrue(os.path.exists(blobstore.full_path(blob.path)))
+
+    def test_release_rolled_back(self):
+        blob = blobstore.store_uploaded_file(SimpleUploadedFile('a.jpg', self.CONTENT))
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            blobstore.release(blob.sha256)
+            raise RuntimeError
+        self.assertEqual(MediaBlob.objects.get(pk=blob.pk).refcount, 1)
+        self.assertTrue(os.path.exists(blobstore.full_path(blob.path)))
+
+    def test_store_local_file_keeps_source(self):
+        source = os.path.join(self.media_root, 'source.bin')
+        with open(source, 'wb') as f:
+            f.write(self.CONTENT)
+        blob = blobstore.store_local_file(source, 'scene.bin')
+        self.assertTrue(os.path.exists(source))
+        self.assertTrue(os.path.samefile(source, blobstore.full_path(blob.path)))
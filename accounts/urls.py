@@ -38,6 +38,12 @@ urlpatterns = [
     path('api/data-models/<int:model_id>/update/', views.update_data_model, name='update_data_model'),
     path('api/data-models/<int:model_id>/delete/', views.delete_data_model, name='delete_data_model'),
     
+    # API 路由 - 分块上传（断点续传）
+    path('api/uploads/', views.init_chunked_upload, name='init_chunked_upload'),
+    path('api/uploads/finalize/', views.finalize_chunked_upload, name='finalize_chunked_upload'),
+    path('api/uploads/<uuid:upload_id>/', views.get_chunked_upload_status, name='get_chunked_upload_status'),
+    path('api/uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_chunk, name='upload_chunk'),
+    
     # API 路由 - 模型详情和编辑
     path('api/models/<int:model_id>/', views.get_model_detail, name='get_model_detail'),
     path('api/models/<int:model_id>/update/', views.update_model, name='update_model'),
@@ -55,6 +61,12 @@ urlpatterns = [
     path('api/data-models/<int:model_id>/download/', views.download_data_model, name='download_data_model'),
     path('api/download-logs/<int:log_id>/', views.get_download_log_detail, name='get_download_log_detail'),
     
+    # 受保护媒体文件
+    path('api/data-models/<int:model_id>/media/<int:index>/', views.serve_model_media, name='serve_model_media'),
+    path('api/data-models/<int:model_id>/model-file/', views.serve_model_file, name='serve_model_file'),
+    path('api/data-models/<int:model_id>/media/<int:index>/thumbnail/<int:width>.<str:fmt>', views.serve_model_thumbnail,
+         name='serve_model_thumbnail'),
+    
     # 测试路由
     path('test-images/', views.test_images_view, name='test_images'),
 ]
\ No newline at end of file
@@ -1,38 +1,76 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse, Http404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q, Count
 from django.utils import timezone
 from django.conf import settings
 import json
 import os
+import uuid
 from datetime import datetime, timedelta
 
-from .models import User, PermissionGroup, UserPermission, LocationTag, ProjectTag, DataModel, UploadLog, DownloadLog
+from .models import User, PermissionGroup, UserPermission, LocationTag, ProjectTag, DataModel, UploadLog, DownloadLog, UploadSession, UploadChunk
+from . import blobstore, chunked_upload
+from .tasks import delete_files
+from .stats import user_activity_summary
+from .permission_cache import get_permission_snapshot
+from videos.sendfile import send_file
+from videos import thumbnails
+from videos.upload_handlers import hashed_uploads
+from jobs.queue import enqueue
+from jobs.views import job_accepted
+from mysite.daterange import filter_day_range
+from mysite.pagination import paginate
+
+# 详情接口返回的关联对象，与模型一起查询
+MODEL_RELATIONS = ('created_by', 'project_tag', 'location_tag')
+SOURCE_MODEL_RELATIONS = ('source_model',) + tuple(f'source_model__{name}' for name in MODEL_RELATIONS)
+
+
+def media_files_data(model):
+    """media_files 附带经权限检查的访问地址，前端不直接访问 MEDIA_ROOT 下的路径"""
+    return [
+        dict(entry, url=reverse('accounts:serve_model_media', args=[model.id, index]))
+        for index, entry in enumerate(model.media_files or [])
+    ]
+
+
+def serialize_data_model(model):
+    """数据模型的 JSON 表示（需 select_related(*MODEL_RELATIONS)）"""
+    return {
+        'id': model.id,
+        'name': model.name,
+        'source': model.source,
+        'infringement_risk': model.infringement_risk,
+        'model_level': model.model_level,
+        'description': model.description,
+        'media_files': media_files_data(model),
+        'created_at': model.created_at.isoformat(),
+        'created_by': {
+            'username': model.created_by.username,
+            'display_name': getattr(model.created_by, 'display_name', model.created_by.username)
+        },
+        'project_tag': {
+            'id': model.project_tag.id,
+            'name': model.project_tag.name
+        } if model.project_tag else None,
+        'location_tag': {
+            'id': model.location_tag.id,
+            'name': model.location_tag.name
+        } if model.location_tag else None,
+    }
 
 
 def check_permission(user, permission_name):
     """检查用户是否有特定权限"""
-    try:
-        user_permission = UserPermission.objects.get(user=user)
-        permission_group = user_permission.permission_group
-        
-        if permission_name == 'dashboard':
-            return permission_group.can_view_dashboard
-        elif permission_name == 'my_data':
-            return permission_group.can_view_my_data
-        elif permission_name == 'data_management':
-            return permission_group.can_view_data_management
-        elif permission_name == 'system_settings':
-            return permission_group.can_view_system_settings
-    except UserPermission.DoesNotExist:
-        return False
-    return False
+    return get_permission_snapshot(user).get(permission_name, False)
 
 
 def login_view(request):
@@ -72,74 +110,27 @@ def dashboard_view(request):
         messages.error(request, '您没有访问数据统计的权限')
         return redirect('accounts:login')
     
-    # 获取当前用户的统计数据
-    user_total_uploads = UploadLog.objects.filter(user=request.user, status='success').count()
-    user_total_downloads = DownloadLog.objects.filter(user=request.user, status='success').count()
-    
-    # 获取最近7天的用户数据
-    seven_days_ago = timezone.now() - timedelta(days=7)
-    user_recent_uploads = UploadLog.objects.filter(
-        user=request.user,
-        upload_time__gte=seven_days_ago, 
-        status='success'
-    ).count()
-    user_recent_downloads = DownloadLog.objects.filter(
-        user=request.user,
-        download_time__gte=seven_days_ago, 
-        status='success'
-    ).count()
+    # 统计数据（按天分组聚合，避免逐日查询）
+    summary = user_activity_summary(request.user, days=30, recent_days=7)
     
     # 获取当前用户的上传记录（用于本月数据展示）
-    user_uploads = UploadLog.objects.filter(user=request.user, status='success').order_by('-upload_time')[:5]
+    user_uploads = UploadLog.objects.filter(user=request.user, status='success').select_related('source_model').order_by('-upload_time')[:5]
     
     # 获取当前用户的下载记录（用于本月数据展示）
-    user_downloads = DownloadLog.objects.filter(user=request.user, status='success').order_by('-download_time')[:5]
-    
-    # 获取最近30天的数据用于折线图
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    
-    # 生成最近30天的日期列表
-    dates = []
-    upload_counts = []
-    download_counts = []
-    
-    for i in range(30):
-        date = timezone.now() - timedelta(days=29-i)
-        dates.append(date.strftime('%m-%d'))
-        
-        # 统计当天的上传数量
-        day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        upload_count = UploadLog.objects.filter(
-            user=request.user,
-            upload_time__gte=day_start,
-            upload_time__lt=day_end,
-            status='success'
-        ).count()
-        
-        download_count = DownloadLog.objects.filter(
-            user=request.user,
-            download_time__gte=day_start,
-            download_time__lt=day_end,
-            status='success'
-        ).count()
-        
-        upload_counts.append(upload_count)
-        download_counts.append(download_count)
+    user_downloads = DownloadLog.objects.filter(user=request.user, status='success').select_related('source_model').order_by('-download_time')[:5]
     
     context = {
         'user': request.user,
-        'total_uploads': user_total_uploads,
-        'total_downloads': user_total_downloads,
-        'recent_uploads': user_recent_uploads,
-        'recent_downloads': user_recent_downloads,
+        'total_uploads': summary['total_uploads'],
+        'total_downloads': summary['total_downloads'],
+        'recent_uploads': summary['recent_uploads'],
+        'recent_downloads': summary['recent_downloads'],
         'user_uploads': user_uploads,
         'user_downloads': user_downloads,
         'chart_data': json.dumps({
-            'dates': dates,
-            'upload_counts': upload_counts,
-            'download_counts': download_counts,
+            'dates': summary['dates'],
+            'upload_counts': summary['upload_counts'],
+            'download_counts': summary['download_counts'],
         })
     }
     return render(request, 'dashboard.html', context)
@@ -153,27 +144,25 @@ def my_data_view(request):
         return redirect('accounts:login')
     
     # 获取用户的上传记录（UploadLog）
-    user_uploads = UploadLog.objects.filter(user=request.user).order_by('-upload_time')
+    user_uploads = UploadLog.objects.filter(user=request.user)
     
     # 获取用户的下载记录（DownloadLog）
-    user_downloads = DownloadLog.objects.filter(user=request.user).order_by('-download_time')
-    
-    # 上传记录分页
-    upload_paginator = Paginator(user_uploads, 10)
-    upload_page_number = request.GET.get('upload_page', 1)
-    upload_page_obj = upload_paginator.get_page(upload_page_number)
+    user_downloads = DownloadLog.objects.filter(user=request.user)
     
-    # 下载记录分页
-    download_paginator = Paginator(user_downloads, 10)
-    download_page_number = request.GET.get('download_page', 1)
-    download_page_obj = download_paginator.get_page(download_page_number)
+    # 上传、下载记录分别用游标分页，翻页时保留另一个列表的位置
+    upload_page_obj = paginate(
+        request, user_uploads, 10, ordering=('-upload_time', '-id'), param='upload_cursor', count='approximate'
+    )
+    download_page_obj = paginate(
+        request, user_downloads, 10, ordering=('-download_time', '-id'), param='download_cursor', count='approximate'
+    )
     
     context = {
         'user': request.user,
         'user_uploads': upload_page_obj,
         'user_downloads': download_page_obj,
-        'total_uploads': user_uploads.count(),
-        'total_downloads': user_downloads.count(),
+        'total_uploads': upload_page_obj.paginator.count_display,
+        'total_downloads': download_page_obj.paginator.count_display,
     }
     return render(request, 'my_data.html', context)
 
@@ -186,7 +175,7 @@ def data_management_view(request):
         return redirect('accounts:login')
     
     # 获取所有数据模型
-    models = DataModel.objects.all().order_by('-created_at')
+    models = DataModel.objects.all()
     
     # 获取查询参数
     source = request.GET.get('source', '')
@@ -205,26 +194,16 @@ def data_management_view(request):
     if model_name:
         models = models.filter(name__icontains=model_name)
     
-    if start_date:
-        try:
-            start_datetime = datetime.strptime(start_date, '%Y-%m-%d')
-            models = models.filter(created_at__gte=start_datetime)
-        except ValueError:
-            pass
+    # 按当前时区的自然日筛选（含结束日整天），格式无效的日期忽略
+    models = filter_day_range(models, 'created_at', start_date, end_date)
     
-    if end_date:
-        try:
-            end_datetime = datetime.strptime(end_date, '%Y-%m-%d')
-            # 添加一天的时间以包含结束日期的整天
-            end_datetime = end_datetime.replace(hour=23, minute=59, second=59)
-            models = models.filter(created_at__lte=end_datetime)
-        except ValueError:
-            pass
-    
-    # 分页
-    paginator = Paginator(models, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 游标分页（按创建时间和 ID 定位，不做 OFFSET 扫描和全表计数）
+    wants_json = request.headers.get('Accept') == 'application/json'
+    if wants_json:
+        models = models.select_related(*MODEL_RELATIONS)
+    page_obj = paginate(request, models, 12, ordering=('-created_at', '-id'), count='approximate')
+    if wants_json:
+        return JsonResponse({'success': True, **page_obj.as_dict(serialize_data_model)})
     
     # 获取标签数据
     location_tags = LocationTag.objects.all()
@@ -521,33 +500,57 @@ def delete_project_tag(request, tag_id):
 
 
 # API 视图 - 数据模型管理
+def _resolve_tags(data):
+    """根据提交的数据获取项目归属和地理位置标签"""
+    project_tag = None
+    location_tag = None
+    
+    if data.get('project_tag'):
+        project_tag = get_object_or_404(ProjectTag, id=data.get('project_tag'))
+    if data.get('location_tag'):
+        location_tag = get_object_or_404(LocationTag, id=data.get('location_tag'))
+    return project_tag, location_tag
+
+
+def _create_data_model(user, data, project_tag, location_tag, media_file_info):
+    """创建数据模型并记录上传日志"""
+    data_model = DataModel.objects.create(
+        name=data.get('name'),
+        source=data.get('source'),
+        project_tag=project_tag,
+        location_tag=location_tag,
+        infringement_risk=data.get('infringement_risk'),
+        model_level=data.get('model_level'),
+        description=data.get('description', ''),
+        media_files=media_file_info,
+        created_by=user
+    )
+    
+    # 记录上传日志
+    UploadLog.objects.create(
+        user=user,
+        filename=data_model.name,
+        file_size=sum(item['size'] for item in media_file_info),
+        status='success',
+        source_model=data_model
+    )
+    return data_model
+
+
 @login_required
 @require_http_methods(["POST"])
+@hashed_uploads
 def upload_data_model(request):
     """上传数据模型"""
     if not check_permission(request.user, 'data_management'):
         return JsonResponse({'success': False, 'message': '权限不足'})
     
     try:
-        name = request.POST.get('name')
-        source = request.POST.get('source')
-        project_tag_id = request.POST.get('project_tag')
-        location_tag_id = request.POST.get('location_tag')
-        infringement_risk = request.POST.get('infringement_risk')
-        model_level = request.POST.get('model_level')
-        description = request.POST.get('description', '')
-        
-        if not name:
+        if not request.POST.get('name'):
             return JsonResponse({'success': False, 'message': '模型名称不能为空'})
         
         # 获取标签
-        project_tag = None
-        location_tag = None
-        
-        if project_tag_id:
-            project_tag = get_object_or_404(ProjectTag, id=project_tag_id)
-        if location_tag_id:
-            location_tag = get_object_or_404(LocationTag, id=location_tag_id)
+        project_tag, location_tag = _resolve_tags(request.POST)
         
         # 处理文件上传
         media_files = request.FILES.getlist('media_files')
@@ -555,137 +558,169 @@ def upload_data_model(request):
         if not media_files:
             return JsonResponse({'success': False, 'message': '请上传图片或视频文件'})
         
-        # 创建数据模型
-        data_model = DataModel.objects.create(
-            name=name,
-            source=source,
-            project_tag=project_tag,
-            location_tag=location_tag,
-            infringement_risk=infringement_risk,
-            model_level=model_level,
-            description=description,
-            created_by=request.user
-        )
-        
-        # 保存媒体文件信息
-        media_file_info = []
-        for media_file in media_files:
-            # 保存媒体文件到media目录
-            import os
-            from django.conf import settings
-            
-            media_dir = os.path.join(settings.MEDIA_ROOT, 'media_files')
-            os.makedirs(media_dir, exist_ok=True)
+        # 按内容保存媒体文件，重复内容只增加引用计数
+        with transaction.atomic():
+            media_file_info = []
+            for media_file in media_files:
+                blob = blobstore.store_uploaded_file(media_file)
+                media_file_info.append(blobstore.media_entry(blob, media_file.name))
             
-            file_path = os.path.join(media_dir, media_file.name)
-            with open(file_path, 'wb') as f:
-                for chunk in media_file.chunks():
-                    f.write(chunk)
-            
-            media_file_info.append({
-                'name': media_file.name,
-                'size': media_file.size,
-                'path': f'media_files/{media_file.name}'
-            })
-        
-        data_model.media_files = media_file_info
-        data_model.save()
+            data_model = _create_data_model(request.user, request.POST, project_tag, location_tag, media_file_info)
+            job = thumbnails.schedule_data_model(data_model.id, request.user)
         
-        # 记录上传日志
-        UploadLog.objects.create(
+        # 文件已保存，缩略图在后台生成
+        return job_accepted(job, '图片/视频上传成功', {'id': data_model.id, 'name': data_model.name})
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'上传失败：{str(e)}'})
+
+
+# API 视图 - 分块上传（断点续传）
+@login_required
+@require_http_methods(["POST"])
+def init_chunked_upload(request):
+    """创建分块上传会话"""
+    if not check_permission(request.user, 'data_management'):
+        return JsonResponse({'success': False, 'message': '权限不足'})
+    
+    try:
+        data = json.loads(request.body)
+        filename = os.path.basename(data.get('filename') or '')
+        file_size = int(data.get('file_size', -1))
+        chunk_size = int(data.get('chunk_size') or settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+        
+        if not filename:
+            return JsonResponse({'success': False, 'message': '文件名不能为空'})
+        if file_size < 0 or file_size > settings.MAX_FILE_SIZE:
+            return JsonResponse({'success': False, 'message': '文件大小不正确或超过限制'})
+        if chunk_size <= 0 or chunk_size > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return JsonResponse({'success': False, 'message': '分块大小不正确'})
+        
+        session = UploadSession.objects.create(
             user=request.user,
-            filename=name,
-            file_size=sum(file.size for file in media_files),
-            status='success',
-            source_model=data_model
+            filename=filename,
+            file_size=file_size,
+            chunk_size=chunk_size
         )
+        chunked_upload.create_staging_file(session)
         
         return JsonResponse({
-            'success': True, 
-            'message': '图片/视频上传成功',
-            'data': {'id': data_model.id, 'name': data_model.name}
+            'success': True,
+            'data': {
+                'upload_id': str(session.id),
+                'chunk_size': session.chunk_size,
+                'total_chunks': session.total_chunks,
+            }
         })
     except Exception as e:
-        return JsonResponse({'success': False, 'message': f'上传失败：{str(e)}'})
+        return JsonResponse({'success': False, 'message': f'创建上传失败：{str(e)}'})
+
+
+@login_required
+@require_http_methods(["PUT"])
+def upload_chunk(request, upload_id, index):
+    """接收一个分块（请求体为分块原始数据，可通过 X-Chunk-MD5 头校验）"""
+    session = get_object_or_404(UploadSession, id=upload_id, user=request.user, status='uploading')
+    
+    try:
+        chunk_path, size, md5 = chunked_upload.receive_chunk(
+            session, index, request, expected_md5=request.headers.get('X-Chunk-MD5')
+        )
+    except chunked_upload.ChunkError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    try:
+        with transaction.atomic():
+            # 锁定会话：完成请求已把暂存文件链接到存储后，不能再写入
+            if not UploadSession.objects.select_for_update().filter(id=session.id, status='uploading').exists():
+                return JsonResponse({'success': False, 'message': '上传已完成'}, status=409)
+            chunked_upload.write_chunk(session, index, chunk_path)
+            UploadChunk.objects.update_or_create(
+                session=session,
+                index=index,
+                defaults={'size': size, 'md5': md5}
+            )
+            session.save(update_fields=['updated_at'])
+    finally:
+        chunked_upload.discard_chunk(chunk_path)
+    
+    offset, _ = session.chunk_range(index)
+    return JsonResponse({
+        'success': True,
+        'data': {'index': index, 'offset': offset, 'size': size, 'md5': md5}
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def get_chunked_upload_status(request, upload_id):
+    """查询分块上传进度，用于断点续传"""
+    session = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+    missing = chunked_upload.missing_chunks(session)
+    
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'upload_id': str(session.id),
+            'status': session.status,
+            'chunk_size': session.chunk_size,
+            'total_chunks': session.total_chunks,
+            'missing_chunks': missing,
+        }
+    })
 
 
 @login_required
 @require_http_methods(["POST"])
-def update_data_model(request, model_id):
-    """更新数据模型"""
+def finalize_chunked_upload(request):
+    """所有分块到齐后创建数据模型"""
     if not check_permission(request.user, 'data_management'):
         return JsonResponse({'success': False, 'message': '权限不足'})
     
     try:
-        data_model = get_object_or_404(DataModel, id=model_id)
-        
-        # 检查权限：只有创建者或管理员可以更新
-        if data_model.created_by != request.user and not request.user.is_superuser:
-            return JsonResponse({'success': False, 'message': '权限不足'})
-        
-        # 更新基本信息
-        if 'name' in request.POST:
-            data_model.name = request.POST['name']
-        if 'source' in request.POST:
-            data_model.source = request.POST['source']
-        if 'infringement_risk' in request.POST:
-            data_model.infringement_risk = request.POST['infringement_risk']
-        if 'model_level' in request.POST:
-            data_model.model_level = request.POST['model_level']
-        if 'description' in request.POST:
-            data_model.description = request.POST['description']
-        
-        # 更新关联标签
-        if 'project_tag' in request.POST and request.POST['project_tag']:
-            try:
-                project_tag = ProjectTag.objects.get(id=request.POST['project_tag'])
-                data_model.project_tag = project_tag
-            except ProjectTag.DoesNotExist:
-                pass
-        
-        if 'location_tag' in request.POST and request.POST['location_tag']:
-            try:
-                location_tag = LocationTag.objects.get(id=request.POST['location_tag'])
-                data_model.location_tag = location_tag
-            except LocationTag.DoesNotExist:
-                pass
+        data = json.loads(request.body)
         
-        # 处理文件上传
-        print(f"DEBUG: Files in request: {list(request.FILES.keys())}")
+        if not data.get('name'):
+            return JsonResponse({'success': False, 'message': '模型名称不能为空'})
         
-        if 'model_file' in request.FILES:
-            data_model.model_file = request.FILES['model_file']
-            print(f"DEBUG: Model file uploaded: {request.FILES['model_file'].name}")
+        try:
+            upload_ids = {uuid.UUID(str(upload_id)) for upload_id in data.get('upload_ids') or []}
+        except ValueError:
+            return JsonResponse({'success': False, 'message': '上传会话不正确'})
+        if not upload_ids:
+            return JsonResponse({'success': False, 'message': '请上传图片或视频文件'})
         
-        if 'media_file' in request.FILES:
-            print(f"DEBUG: Media file uploaded: {request.FILES['media_file'].name}")
-            # 处理媒体文件上传
-            media_file = request.FILES['media_file']
-            media_info = {
-                'name': media_file.name,
-                'size': media_file.size,
-                'path': f'media_files/{media_file.name}',
-                'upload_time': timezone.now().isoformat()
-            }
+        project_tag, location_tag = _resolve_tags(data)
+        
+        with transaction.atomic():
+            # 锁定会话：并发或重复的完成请求等待本事务提交后，会话已不是上传中，不会重复创建数据模型
+            sessions = list(UploadSession.objects.select_for_update().filter(
+                id__in=upload_ids,
+                user=request.user,
+                status='uploading'
+            ).order_by('created_at'))
+            if len(sessions) != len(upload_ids):
+                return JsonResponse({'success': False, 'message': '上传会话不存在或已完成'})
             
-            # 保存文件
-            import os
-            from django.core.files.storage import default_storage
+            for session in sessions:
+                if chunked_upload.missing_chunks(session):
+                    return JsonResponse({'success': False, 'message': f'文件未上传完成：{session.filename}'})
             
-            file_path = default_storage.save(f'media_files/{media_file.name}', media_file)
-            media_info['path'] = file_path
+            media_file_info = []
+            for session in sessions:
+                blob = blobstore.store_local_file(chunked_upload.staging_path(session), session.filename)
+                media_file_info.append(blobstore.media_entry(blob, session.filename))
             
-            # 替换媒体文件列表（而不是追加）
-            data_model.media_files = [media_info]
-        
-        data_model.save()
+            data_model = _create_data_model(request.user, data, project_tag, location_tag, media_file_info)
+            job = thumbnails.schedule_data_model(data_model.id, request.user)
+            
+            UploadChunk.objects.filter(session__in=sessions).delete()
+            UploadSession.objects.filter(id__in=upload_ids).update(status='completed')
+            # 暂存文件在提交后删除，事务回滚时保留，客户端可以重试
+            transaction.on_commit(lambda: [chunked_upload.discard_staging_file(session) for session in sessions])
         
-        return JsonResponse({
-            'success': True,
-            'message': '数据模型更新成功'
-        })
+        return job_accepted(job, '图片/视频上传成功', {'id': data_model.id, 'name': data_model.name})
     except Exception as e:
-        return JsonResponse({'success': False, 'message': f'更新失败：{str(e)}'})
+        return JsonResponse({'success': False, 'message': f'上传失败：{str(e)}'})
 
 
 @login_required
@@ -813,35 +848,11 @@ def get_data_model(request, model_id):
         return JsonResponse({'success': False, 'message': '权限不足'})
     
     try:
-        model = get_object_or_404(DataModel, id=model_id)
-        
-        # 构建模型数据
-        model_data = {
-            'id': model.id,
-            'name': model.name,
-            'source': model.source,
-            'infringement_risk': model.infringement_risk,
-            'model_level': model.model_level,
-            'description': model.description,
-            'media_files': model.media_files,
-            'created_at': model.created_at.isoformat(),
-            'created_by': {
-                'username': model.created_by.username,
-                'display_name': getattr(model.created_by, 'display_name', model.created_by.username)
-            },
-            'project_tag': {
-                'id': model.project_tag.id,
-                'name': model.project_tag.name
-            } if model.project_tag else None,
-            'location_tag': {
-                'id': model.location_tag.id,
-                'name': model.location_tag.name
-            } if model.location_tag else None,
-        }
+        model = get_object_or_404(DataModel.objects.select_related(*MODEL_RELATIONS), id=model_id)
         
         return JsonResponse({
             'success': True,
-            'model': model_data
+            'model': serialize_data_model(model)
         })
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'获取失败：{str(e)}'})
@@ -872,7 +883,9 @@ def delete_upload_log(request, log_id):
 def get_upload_log_detail(request, log_id):
     """获取上传记录详情"""
     try:
-        upload_log = get_object_or_404(UploadLog, id=log_id, user=request.user)
+        upload_log = get_object_or_404(
+            UploadLog.objects.select_related(*SOURCE_MODEL_RELATIONS), id=log_id, user=request.user
+        )
         
         log_data = {
             'id': upload_log.id,
@@ -894,7 +907,7 @@ def get_upload_log_detail(request, log_id):
                 'model_level': model.model_level,
                 'description': model.description,
                 'created_at': model.created_at.isoformat(),
-                'media_files': model.media_files,
+                'media_files': media_files_data(model),
                 'project_tag': {
                     'id': model.project_tag.id,
                     'name': model.project_tag.name
@@ -939,10 +952,10 @@ def download_data_model(request, model_id):
         # 返回文件下载信息
         download_info = []
         if model.media_files:
-            for media_file in model.media_files:
+            for index, media_file in enumerate(model.media_files):
                 download_info.append({
                     'filename': media_file['name'],
-                    'url': f'/media/{media_file["path"]}',
+                    'url': reverse('accounts:serve_model_media', args=[model.id, index]) + '?download=1',
                     'size': media_file['size']
                 })
         
@@ -955,11 +968,85 @@ def download_data_model(request, model_id):
         return JsonResponse({'success': False, 'message': f'下载失败：{str(e)}'})
 
 
+def can_view_model_media(user, model):
+    """有数据管理权限，或是模型的创建者（仪表盘展示自己上传的数据）"""
+    return model.created_by_id == user.id or check_permission(user, 'data_management')
+
+
+def _model_media_file(request, model_id, index):
+    """权限检查后返回 media_files 中的一条记录，无权限时返回 None"""
+    model = get_object_or_404(DataModel.objects.only('id', 'created_by_id', 'media_files'), id=model_id)
+    if not can_view_model_media(request.user, model):
+        return None
+    media_files = model.media_files or []
+    if index >= len(media_files):
+        raise Http404('文件不存在')
+    return media_files[index]
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def serve_model_media(request, model_id, index):
+    """经权限检查后返回数据模型的媒体文件（由文件发送后端输出）"""
+    media_file = _model_media_file(request, model_id, index)
+    if media_file is None:
+        return JsonResponse({'success': False, 'message': '权限不足'}, status=403)
+    
+    file_path = os.path.join(settings.MEDIA_ROOT, media_file['path'])
+    if not os.path.isfile(file_path):
+        raise Http404('文件不存在')
+    
+    return send_file(
+        request,
+        file_path,
+        filename=media_file['name'],
+        etag=f'"{media_file["sha256"]}"' if media_file.get('sha256') else None,
+        as_attachment=request.GET.get('download') == '1',
+    )
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def serve_model_file(request, model_id):
+    """经权限检查后下载数据模型的模型文件"""
+    model = get_object_or_404(DataModel.objects.only('id', 'created_by_id', 'model_file'), id=model_id)
+    if not can_view_model_media(request.user, model):
+        return JsonResponse({'success': False, 'message': '权限不足'}, status=403)
+    if not model.model_file or not os.path.isfile(model.model_file.path):
+        raise Http404('文件不存在')
+    return send_file(request, model.model_file.path, filename=os.path.basename(model.model_file.name))
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
+def serve_model_thumbnail(request, model_id, index, width, fmt):
+    """经权限检查后返回媒体文件的缩略图（按内容命名，允许浏览器缓存）"""
+    media_file = _model_media_file(request, model_id, index)
+    if media_file is None:
+        return JsonResponse({'success': False, 'message': '权限不足'}, status=403)
+    
+    thumbnail = next(
+        (thumb for thumb in media_file.get('thumbnails', []) if thumb['width'] == width and thumb.get(fmt)), None
+    ) if fmt in thumbnails.FORMAT_EXTENSIONS else None
+    if thumbnail is None:
+        raise Http404('缩略图不存在')
+    file_path = os.path.join(settings.MEDIA_ROOT, thumbnail[fmt])
+    if not os.path.isfile(file_path):
+        raise Http404('缩略图不存在')
+    
+    filename = os.path.basename(file_path)
+    response = send_file(request, file_path, filename=filename, etag=f'"{filename}"', as_attachment=False)
+    response['Cache-Control'] = f'private, max-age={settings.MEDIA_CACHE_SECONDS}'
+    return response
+
+
 @require_http_methods(["GET"])
 def get_download_log_detail(request, log_id):
     """获取下载记录详情"""
     try:
-        download_log = get_object_or_404(DownloadLog, id=log_id, user=request.user)
+        download_log = get_object_or_404(
+            DownloadLog.objects.select_related(*SOURCE_MODEL_RELATIONS), id=log_id, user=request.user
+        )
         
         log_data = {
             'id': download_log.id,
@@ -982,7 +1069,7 @@ def get_download_log_detail(request, log_id):
                 'model_level': model.model_level,
                 'description': model.description,
                 'created_at': model.created_at.isoformat(),
-                'media_files': model.media_files,
+                'media_files': media_files_data(model),
                 'project_tag': {
                     'id': model.project_tag.id,
                     'name': model.project_tag.name
@@ -1006,9 +1093,14 @@ def get_download_log_detail(request, log_id):
         return JsonResponse({'success': False, 'message': f'获取失败：{str(e)}'})
 
 
+@login_required
 @require_http_methods(["POST"])
+@hashed_uploads
 def update_data_model(request, model_id):
-    """更新数据模型"""
+    """更新数据模型（可同时替换模型文件和媒体文件）"""
+    if not check_permission(request.user, 'data_management'):
+        return JsonResponse({'success': False, 'message': '权限不足'})
+    
     try:
         model = get_object_or_404(DataModel, id=model_id)
         
@@ -1039,7 +1131,21 @@ def update_data_model(request, model_id):
         else:
             model.location_tag = None
         
-        model.save()
+        if 'model_file' in request.FILES:
+            model.model_file = request.FILES['model_file']
+        
+        with transaction.atomic():
+            if 'media_file' in request.FILES:
+                media_file = request.FILES['media_file']
+                blob = blobstore.store_uploaded_file(media_file)
+                media_info = blobstore.media_entry(blob, media_file.name, upload_time=timezone.now().isoformat())
+                
+                # 替换媒体文件列表（而不是追加），释放原文件的引用
+                blobstore.release_media_files(model.media_files)
+                model.media_files = [media_info]
+                thumbnails.schedule_data_model(model.id, request.user)
+            
+            model.save()
         
         return JsonResponse({
             'success': True,
@@ -1057,7 +1163,7 @@ def get_model_detail(request, model_id):
         return JsonResponse({'success': False, 'message': '您没有访问数据管理的权限'})
     
     try:
-        model = get_object_or_404(DataModel, id=model_id)
+        model = get_object_or_404(DataModel.objects.select_related(*MODEL_RELATIONS), id=model_id)
         
         model_data = {
             'id': model.id,
@@ -1068,8 +1174,8 @@ def get_model_detail(request, model_id):
             'description': model.description,
             'created_at': model.created_at.isoformat(),
             'updated_at': model.updated_at.isoformat(),
-            'media_files': model.media_files,
-            'model_file': model.model_file.url if model.model_file else None,
+            'media_files': media_files_data(model),
+            'model_file': reverse('accounts:serve_model_file', args=[model.id]) if model.model_file else None,
             'project_tag': {
                 'id': model.project_tag.id,
                 'name': model.project_tag.name
@@ -1095,6 +1201,7 @@ def get_model_detail(request, model_id):
 
 @login_required
 @require_http_methods(["POST"])
+@hashed_uploads
 def update_model(request, model_id):
     """更新模型信息"""
     if not check_permission(request.user, 'data_management'):
@@ -1137,28 +1244,20 @@ def update_model(request, model_id):
             model.model_file = request.FILES['model_file']
             print(f"DEBUG: Model file uploaded: {request.FILES['model_file'].name}")
         
-        if 'media_file' in request.FILES:
-            print(f"DEBUG: Media file uploaded: {request.FILES['media_file'].name}")
-            # 处理媒体文件上传
-            media_file = request.FILES['media_file']
-            media_info = {
-                'name': media_file.name,
-                'size': media_file.size,
-                'path': f'media_files/{media_file.name}',
-                'upload_time': timezone.now().isoformat()
-            }
-            
-            # 保存文件
-            import os
-            from django.core.files.storage import default_storage
+        with transaction.atomic():
+            if 'media_file' in request.FILES:
+                print(f"DEBUG: Media file uploaded: {request.FILES['media_file'].name}")
+                # 处理媒体文件上传
+                media_file = request.FILES['media_file']
+                blob = blobstore.store_uploaded_file(media_file)
+                media_info = blobstore.media_entry(blob, media_file.name, upload_time=timezone.now().isoformat())
+                
+                # 替换媒体文件列表（而不是追加），释放原文件的引用
+                blobstore.release_media_files(model.media_files)
+                model.media_files = [media_info]
+                thumbnails.schedule_data_model(model.id)
             
-            file_path = default_storage.save(f'media_files/{media_file.name}', media_file)
-            media_info['path'] = file_path
-            
-            # 替换媒体文件列表（而不是追加）
-            model.media_files = [media_info]
-        
-        model.save()
+            model.save()
         
         return JsonResponse({
             'success': True,
@@ -1178,24 +1277,20 @@ def delete_model(request, model_id):
     try:
         model = get_object_or_404(DataModel, id=model_id)
         
-        # 删除关联的文件
+        # 关联文件由后台任务删除；内容寻址存储的文件由 post_delete 信号按引用计数释放，
+        # 这里只处理模型文件和旧格式记录（路径相对 MEDIA_ROOT，转换为绝对路径，不依赖执行进程的工作目录）
+        file_paths = []
         if model.model_file:
-            model.model_file.delete()
+            file_paths.append(model.model_file.path)
+        for media_file in model.media_files or []:
+            if not media_file.get('sha256') and media_file.get('path'):
+                file_paths.append(os.path.join(settings.MEDIA_ROOT, media_file['path']))
         
-        if model.media_files:
-            for media_file in model.media_files:
-                try:
-                    file_path = media_file.get('path')
-                    if file_path and os.path.exists(file_path):
-                        os.remove(file_path)
-                except Exception as e:
-                    print(f"删除文件失败: {e}")
-        
-        model.delete()
+        # 没有需要删除的文件时也提交任务，响应始终为 202 和相同的结构
+        with transaction.atomic():
+            model.delete()
+            job = enqueue(delete_files, args=[file_paths], created_by=request.user)
         
-        return JsonResponse({
-            'success': True,
-            'message': '模型删除成功'
-        })
+        return job_accepted(job, '模型删除成功')
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'删除模型失败：{str(e)}'})
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+日志流式导出
+
+按 (时间, id) 逐批读取 values() 投影的列（每批 AUDIT_EXPORT_BATCH_SIZE 行，一次索引范围查询），
+边读边编码输出，内存占用与导出行数无关，不限制导出条数。
+
+格式：
+- json：JSON 数组（与原接口兼容）
+- ndjson：每行一个 JSON 对象
+- csv：UTF-8（带 BOM，Excel 可直接打开）
+- parquet：需要安装 pyarrow，每批写为一个 row group
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+
+from mysite.pagination import CursorPaginator
+
+from .models import AccessLog, OperationLog, SystemLog
+
+# 日志类型 -> (模型, 时间字段, [(列名, values() 字段), ...])
+SOURCES = {
+    'operation': (OperationLog, 'operation_time', [
+        ('id', 'id'),
+        ('operation_time', 'operation_time'),
+        ('user', 'user__username'),
+        ('operation_type', 'operation_type'),
+        ('result', 'result'),
+        ('description', 'description'),
+        ('ip_address', 'ip_address'),
+        ('security_level', 'security_level'),
+    ]),
+    'system': (SystemLog, 'created_at', [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('level', 'level'),
+        ('module', 'module'),
+        ('message', 'message'),
+    ]),
+    'access': (AccessLog, 'accessed_at', [
+        ('id', 'id'),
+        ('accessed_at', 'accessed_at'),
+        ('user', 'user__username'),
+        ('path', 'path'),
+        ('method', 'method'),
+        ('status_code', 'status_code'),
+        ('response_time', 'response_time'),
+        ('ip_address', 'ip_address'),
+    ]),
+}
+
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def export_rows(log_type, queryset):
+    """按时间倒序逐行生成 {列名: 值}，时间转为 ISO 格式，无用户的记录为 "匿名" """
+    _, time_field, columns = SOURCES[log_type]
+    fields = [field for _, field in columns]
+    paginator = CursorPaginator(
+        queryset.values(*fields), settings.AUDIT_EXPORT_BATCH_SIZE, ordering=(f'-{time_field}', '-id'), count=None,
+    )
+    for row in paginator.iterate():
+        data = {}
+        for name, field in columns:
+            value = row[field]
+            if field == time_field:
+                value = value.isoformat()
+            elif field == 'user__username' and value is None:
+                value = '匿名'
+            data[name] = value
+        yield data
+
+
+def column_names(log_type):
+    return [name for name, _ in SOURCES[log_type][2]]
+
+
+def encode_json(rows, log_type):
+    yield '['
+    for index, row in enumerate(rows):
+        yield (',' if index else '') + json.dumps(row, ensure_ascii=False)
+    yield ']'
+
+
+def encode_ndjson(rows, log_type):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """csv.writer 的输出目标，write() 直接返回写入的内容"""
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(rows, log_type):
+    columns = column_names(log_type)
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[name] for name in columns])
+
+
+class ChunkSink(io.RawIOBase):
+    """pyarrow 的输出目标：写入的数据暂存，由生成器取走后清空"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def parquet_schema(log_type):
+    """按模型字段类型确定列类型（整数、浮点数，其余为字符串）"""
+    import pyarrow as pa
+
+    model, _, columns = SOURCES[log_type]
+    types = {
+        'AutoField': pa.int64(), 'BigAutoField': pa.int64(), 'IntegerField': pa.int64(),
+        'PositiveIntegerField': pa.int64(), 'FloatField': pa.float64(),
+    }
+    return pa.schema([
+        (name, pa.string() if '__' in field else types.get(model._meta.get_field(field).get_internal_type(), pa.string()))
+        for name, field in columns
+    ])
+
+
+def encode_parquet(rows, log_type):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema(log_type)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    batch = []
+
+    def write_batch():
+        writer.write_table(pa.Table.from_pydict(
+            {name: [row[name] for row in batch] for name in schema.names}, schema=schema
+        ))
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= settings.AUDIT_EXPORT_BATCH_SIZE:
+            write_batch()
+            yield sink.drain()
+    if batch:
+        write_batch()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {
+    'json': encode_json,
+    'ndjson': encode_ndjson,
+    'csv': encode_csv,
+    'parquet': encode_parquet,
+}
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def buffered(chunks, size=CHUNK_SIZE):
+    """把逐行生成的小块合并为约 size 字节的块再输出，减少 WSGI 写入次数"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_stream(log_type, format_type, queryset):
+    """返回导出内容的生成器（bytes 块）"""
+    return buffered(ENCODERS[format_type](export_rows(log_type, queryset), log_type))
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from audit import retention
+from audit import stats as log_stats
+
+
+class Command(BaseCommand):
+    help = '把超过保留期的操作、访问、系统日志按月归档为 gzip 压缩的 NDJSON 文件，并从数据库删除'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=settings.AUDIT_RETENTION_MONTHS,
+                            help='数据库中保留最近几个月（含当月）的日志')
+        parser.add_argument('--type', choices=list(retention.LOG_TABLES), action='append', dest='types',
+                            help='只归档指定类型，可重复指定，默认全部类型')
+        parser.add_argument('--output-dir', default=settings.AUDIT_ARCHIVE_DIR, help='归档目录')
+        parser.add_argument('--dry-run', action='store_true', help='只列出需要归档的月份和条数')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months 至少为 1')
+        cutoff = retention.cutoff_month(options['months'])
+
+        for log_type in options['types'] or list(retention.LOG_TABLES):
+            month = retention.oldest_month(log_type)
+            total = 0
+            while month is not None and month < cutoff:
+                total += self.archive(log_type, month, options)
+                month = retention.add_months(month, 1)
+            action = '需要归档' if options['dry_run'] else '已归档'
+            self.stdout.write(self.style.SUCCESS(f'{log_type}: {action} {total} 条（{cutoff:%Y-%m} 之前）'))
+        if not options['dry_run']:
+            # 系统日志的增量计数不知道删除了哪些记录，重新全量统计
+            log_stats.invalidate()
+
+    def archive(self, log_type, month, options):
+        count = retention.month_queryset(log_type, month).count()
+        if not count:
+            return 0
+        if options['dry_run']:
+            self.stdout.write(f'{log_type} {month:%Y-%m}: {count} 条')
+            return count
+
+        written, skipped = retention.write_archive(log_type, month, options['output_dir'])
+        if written + skipped != count:
+            # 归档期间该月又有写入，保留数据库中的记录，下次执行时补充归档
+            raise CommandError(
+                f'{log_type} {month:%Y-%m}: 统计 {count} 条，归档 {written + skipped} 条，未删除'
+            )
+        # 只删除归档文件中已有的记录（同时确认归档文件可以完整读取）
+        path = retention.archive_path(log_type, month, options['output_dir'])
+        deleted = retention.delete_month(log_type, month, retention.archived_ids(path))
+        self.stdout.write(f'{log_type} {month:%Y-%m}: 归档 {written} 条，删除 {deleted} 条 -> {path}')
+        return written
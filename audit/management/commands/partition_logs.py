@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from audit import retention
+
+
+class Command(BaseCommand):
+    help = '把操作、访问、系统日志表改为按月 RANGE 分区（MySQL），并提前创建后续月份的分区'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.AUDIT_PARTITION_MONTHS_AHEAD,
+                            help='提前创建当月之后几个月的分区')
+        parser.add_argument('--type', choices=list(retention.LOG_TABLES), action='append', dest='types',
+                            help='只处理指定类型，可重复指定，默认全部类型')
+        parser.add_argument('--sql', action='store_true', help='只输出需要执行的 SQL')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f'{connection.vendor} 不支持按月分区，请定期执行 archive_logs 控制日志表大小')
+
+        for log_type in options['types'] or list(retention.LOG_TABLES):
+            statements = retention.partition_statements(log_type, options['months_ahead'])
+            if not statements:
+                self.stdout.write(f'{log_type}: 分区已是最新')
+                continue
+            for sql in statements:
+                self.stdout.write(sql)
+                if not options['sql']:
+                    # 改为分区表会重建整张表，数据量大时耗时较长
+                    with connection.cursor() as cursor:
+                        cursor.execute(sql)
+            if not options['sql']:
+                self.stdout.write(self.style.SUCCESS(f'{log_type}: 分区已更新'))
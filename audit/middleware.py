@@ -0,0 +1,56 @@
+"""
+访问日志中间件
+
+记录每个请求的路径、方法、状态码和响应时间（perf_counter 计时），写入 AccessLog：
+- ACCESS_LOG_EXCLUDE_PREFIXES 中的路径（静态文件、媒体文件等）不记录
+- 按 ACCESS_LOG_SAMPLE_RATE 抽样记录，5xx 错误和慢请求（ACCESS_LOG_SLOW_MS）始终记录
+- 记录放入进程内缓冲区批量写入（见 audit.writer），请求中不执行 INSERT
+
+不读取 request.POST / request.body，上传请求的请求体仍由视图中的上传处理器流式接收。
+流式响应只计到视图返回响应对象为止，不含发送文件内容的时间。
+"""
+import random
+import time
+
+from django.conf import settings
+from django.utils.functional import empty
+
+from .models import AccessLog
+from .writer import access_writer
+
+
+def loaded_user_id(request):
+    """请求中已加载的登录用户 ID，用户未被加载过时不为记日志额外读取会话"""
+    user = getattr(request, 'user', None)
+    if user is None or getattr(user, '_wrapped', None) is empty:
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+class AccessLogMiddleware:
+    """请求计时并记录访问日志，应放在 MIDDLEWARE 最前面以包含其他中间件的耗时"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.exclude_prefixes = tuple(settings.ACCESS_LOG_EXCLUDE_PREFIXES)
+
+    def __call__(self, request):
+        if not settings.ACCESS_LOG_ENABLED or request.path.startswith(self.exclude_prefixes):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if (response.status_code >= 500 or elapsed_ms >= settings.ACCESS_LOG_SLOW_MS
+                or random.random() < settings.ACCESS_LOG_SAMPLE_RATE):
+            access_writer.add(AccessLog(
+                user_id=loaded_user_id(request),
+                path=request.path[:500],
+                method=request.method,
+                status_code=response.status_code,
+                response_time=round(elapsed_ms, 3),
+                ip_address=request.META.get('REMOTE_ADDR'),
+                user_agent=request.META.get('HTTP_USER_AGENT'),
+            ))
+        return response
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
@@ -26,13 +27,15 @@ class OperationLog(models.Model):
     ]
 
     # 基本信息
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="操作用户")
+    # 日志表在 MySQL 上按月分区（见 audit.retention），分区表不支持外键约束，关联由 Django 维护
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, db_constraint=False, verbose_name="操作用户")
     operation_type = models.CharField(max_length=20, choices=OPERATION_TYPE_CHOICES, verbose_name="操作类型")
-    operation_time = models.DateTimeField(auto_now_add=True, verbose_name="操作时间")
+    # 批量写入时保留记录产生的时间（auto_now_add 会在写入时覆盖）
+    operation_time = models.DateTimeField(default=timezone.now, verbose_name="操作时间")
     result = models.CharField(max_length=10, choices=RESULT_CHOICES, verbose_name="操作结果")
     
     # 操作对象（通用外键）
-    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True, db_constraint=False)
     object_id = models.PositiveIntegerField(null=True, blank=True)
     content_object = GenericForeignKey('content_type', 'object_id')
     
@@ -51,6 +54,13 @@ class OperationLog(models.Model):
         verbose_name = "操作日志"
         verbose_name_plural = "操作日志"
         ordering = ['-operation_time']
+        # 按 (时间, id) 倒序游标分页：反向扫描升序索引，索引项末尾隐含的主键保证同一时间内的顺序，
+        # 因此时间列必须是索引的最后一列；筛选条件作为前缀列
+        indexes = [
+            models.Index(fields=['operation_time'], name='oplog_time_idx'),
+            models.Index(fields=['operation_type', 'operation_time'], name='oplog_type_time_idx'),
+            models.Index(fields=['result', 'operation_time'], name='oplog_result_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_operation_type_display()} - {self.user.username if self.user else '匿名'} - {self.operation_time}"
@@ -84,6 +94,12 @@ class SystemLog(models.Model):
         verbose_name = "系统日志"
         verbose_name_plural = "系统日志"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='systemlog_created_idx'),
+            models.Index(fields=['level', 'created_at'], name='systemlog_level_created_idx'),
+            # 模块下拉列表（DISTINCT module）和按模块筛选
+            models.Index(fields=['module', 'created_at'], name='systemlog_module_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.level} - {self.module} - {self.created_at}"
@@ -91,19 +107,23 @@ class SystemLog(models.Model):
 
 class AccessLog(models.Model):
     """访问日志模型"""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="用户")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False, verbose_name="用户")
     path = models.CharField(max_length=500, verbose_name="访问路径")
     method = models.CharField(max_length=10, verbose_name="HTTP方法")
     status_code = models.IntegerField(verbose_name="状态码")
     response_time = models.FloatField(verbose_name="响应时间(ms)")
     ip_address = models.GenericIPAddressField(verbose_name="IP地址")
     user_agent = models.TextField(blank=True, null=True, verbose_name="用户代理")
-    accessed_at = models.DateTimeField(auto_now_add=True, verbose_name="访问时间")
+    accessed_at = models.DateTimeField(default=timezone.now, verbose_name="访问时间")
 
     class Meta:
         verbose_name = "访问日志"
         verbose_name_plural = "访问日志"
         ordering = ['-accessed_at']
+        indexes = [
+            models.Index(fields=['accessed_at'], name='accesslog_time_idx'),
+            models.Index(fields=['status_code', 'accessed_at'], name='accesslog_status_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.method} {self.path} - {self.status_code} - {self.accessed_at}"
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+日志保留与归档
+
+操作日志、访问日志、系统日志按月归档：超过 AUDIT_RETENTION_MONTHS 个月的数据逐月写入
+AUDIT_ARCHIVE_DIR/<类型>/<YYYY-MM>.ndjson.gz（包含全部字段），核对条数后从数据库删除，
+在线表只保留最近几个月的数据。只删除 id 已写入归档文件的记录，归档过程中新写入的记录不会丢失。
+
+MySQL 上可按月 RANGE 分区（manage.py partition_logs）：
+- 按时间筛选的查询（见 mysite.daterange）只读取相关分区
+- 归档后 DROP PARTITION 删除整月数据，不产生逐行删除的开销
+- 分区表的主键需包含分区列（改为 (id, 时间)），且不能有外键约束（日志表的外键已设为 db_constraint=False）
+
+其他数据库没有分区，归档后按 id 分批删除。月份按数据库中存储的 UTC 时间划分。
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from mysite.pagination import CursorPaginator
+
+from .models import AccessLog, OperationLog, SystemLog
+
+# 日志类型 -> (模型, 时间字段)
+LOG_TABLES = {
+    'operation': (OperationLog, 'operation_time'),
+    'access': (AccessLog, 'accessed_at'),
+    'system': (SystemLog, 'created_at'),
+}
+
+MAX_PARTITION = 'pmax'
+ARCHIVE_RE = re.compile(r'^(\d{4})-(\d{2})\.ndjson\.gz$')
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """[当月 1 日 00:00, 下月 1 日 00:00)，UTC"""
+    start = datetime.combine(month, datetime.min.time()).replace(tzinfo=timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time()).replace(tzinfo=timezone.utc)
+    return start, end
+
+
+def cutoff_month(months=None):
+    """保留最近 months 个月（含当月），返回第一个保留的月份"""
+    months = settings.AUDIT_RETENTION_MONTHS if months is None else months
+    return add_months(month_start(timezone.now().date()), -(months - 1))
+
+
+def archive_path(log_type, month, directory=None):
+    return os.path.join(directory or settings.AUDIT_ARCHIVE_DIR, log_type, f'{month:%Y-%m}.ndjson.gz')
+
+
+def archived_until(log_type, directory=None):
+    """已归档的最后一个月的下一个月（之前的数据已不在数据库中），没有归档时返回 None"""
+    path = os.path.join(directory or settings.AUDIT_ARCHIVE_DIR, log_type)
+    months = [
+        date(int(match.group(1)), int(match.group(2)), 1)
+        for match in map(ARCHIVE_RE.match, os.listdir(path) if os.path.isdir(path) else [])
+        if match
+    ]
+    return add_months(max(months), 1) if months else None
+
+
+def oldest_month(log_type):
+    model, time_field = LOG_TABLES[log_type]
+    oldest = model.objects.order_by(time_field).values_list(time_field, flat=True).first()
+    return month_start(oldest.astimezone(timezone.utc).date()) if oldest else None
+
+
+def encode_value(value):
+    # 保留微秒（DjangoJSONEncoder 会截断为毫秒）
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def archived_ids(path):
+    """归档文件中已有记录的 id"""
+    if not os.path.exists(path):
+        return set()
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return {json.loads(line)['id'] for line in f}
+
+
+def month_queryset(log_type, month):
+    model, time_field = LOG_TABLES[log_type]
+    start, end = month_bounds(month)
+    return model.objects.filter(**{f'{time_field}__gte': start, f'{time_field}__lt': end})
+
+
+def write_archive(log_type, month, directory=None, batch_size=None):
+    """
+    把一个月的日志写入 gzip 压缩的 NDJSON 文件，返回 (新写入条数, 已在归档中的条数)
+
+    先写临时文件再改名，中途失败不会留下不完整的归档。归档文件已存在时（上次归档后未能删除，
+    或之后又写入了该月的日志）跳过已归档的 id，新记录作为新的 gzip 段追加在末尾。
+    """
+    model, time_field = LOG_TABLES[log_type]
+    fields = [field.attname for field in model._meta.concrete_fields]
+    queryset = month_queryset(log_type, month).values(*fields)
+    rows = CursorPaginator(
+        queryset, batch_size or settings.AUDIT_EXPORT_BATCH_SIZE, ordering=(time_field, 'id'), count=None,
+    ).iterate()
+
+    path = archive_path(log_type, month, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    existing = archived_ids(path)
+    temp_path = f'{path}.tmp'
+    if existing:
+        shutil.copyfile(path, temp_path)
+    written = skipped = 0
+    with gzip.open(temp_path, 'at' if existing else 'wt', encoding='utf-8') as f:
+        for row in rows:
+            if row['id'] in existing:
+                skipped += 1
+                continue
+            f.write(json.dumps(row, default=encode_value, ensure_ascii=False) + '\n')
+            written += 1
+    os.replace(temp_path, path)
+    return written, skipped
+
+
+def delete_month(log_type, month, archived, batch_size=None):
+    """
+    删除一个月中已归档（id 在 archived 中）的日志，返回删除条数
+
+    归档之后才写入（或才提交）的记录不在归档中，保留在数据库中，下次归档时补充。
+    整月都已归档且对应一个分区时 DROP PARTITION，否则按 id 分批删除。
+    """
+    model, time_field = LOG_TABLES[log_type]
+    batch_size = batch_size or settings.AUDIT_EXPORT_BATCH_SIZE
+    rows = CursorPaginator(
+        month_queryset(log_type, month).values('id', time_field), batch_size,
+        ordering=(time_field, 'id'), count=None,
+    ).iterate()
+    ids = []
+    unarchived = 0
+    for row in rows:
+        if row['id'] in archived:
+            ids.append(row['id'])
+        else:
+            unarchived += 1
+
+    partition = partition_name(month)
+    if not unarchived and partition in partitions(model):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {quote(model)} PARTITION ({partition})')
+            # 第一个分区还包含更早月份的数据时不能整个删除
+            if cursor.fetchone()[0] == len(ids):
+                cursor.execute(f'ALTER TABLE {quote(model)} DROP PARTITION {partition}')
+                return len(ids)
+
+    deleted = 0
+    for offset in range(0, len(ids), batch_size):
+        # 日志表没有删除信号和级联关系，QuerySet.delete() 直接执行一条 DELETE
+        deleted += model.objects.filter(id__in=ids[offset:offset + batch_size]).delete()[0]
+    return deleted
+
+
+# MySQL 分区
+
+
+def quote(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def partition_name(month):
+    return f'p{month:%Y%m}'
+
+
+def partition_clause(month):
+    """按月分区：存放下月 1 日之前的数据"""
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{add_months(month, 1):%Y-%m-%d}'))"
+
+
+def partitions(model):
+    """表的分区名列表（按顺序），未分区或不是 MySQL 时为空"""
+    if connection.vendor != 'mysql':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL '
+            'ORDER BY PARTITION_ORDINAL_POSITION',
+            [model._meta.db_table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def partition_statements(log_type, months_ahead=None):
+    """把表改为按月分区，或为已分区的表补充到 months_ahead 个月之后的分区，返回需要执行的 SQL"""
+    model, time_field = LOG_TABLES[log_type]
+    months_ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = month_start(timezone.now().date())
+    last = add_months(current, months_ahead)
+    existing = partitions(model)
+    table = quote(model)
+
+    if existing:
+        months = [
+            date(int(name[1:5]), int(name[5:7]), 1) for name in existing if name != MAX_PARTITION
+        ]
+        month = add_months(max(months), 1) if months else current
+        clauses = []
+        while month <= last:
+            clauses.append(partition_clause(month))
+            month = add_months(month, 1)
+        if not clauses:
+            return []
+        clauses.append(f'PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE')
+        return [f'ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO ({", ".join(clauses)})']
+
+    # 第一个分区从最早的数据所在月份开始（之前的数据也落在第一个分区中）
+    month = min(oldest_month(log_type) or current, current)
+    clauses = []
+    while month <= last:
+        clauses.append(partition_clause(month))
+        month = add_months(month, 1)
+    clauses.append(f'PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE')
+    column = connection.ops.quote_name(model._meta.get_field(time_field).column)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    return [
+        # 分区列必须包含在主键中
+        f'ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY ({pk}, {column})',
+        f'ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS({column})) ({", ".join(clauses)})',
+    ]
@@ -0,0 +1,11 @@
+from django.core.signals import request_finished
+from django.dispatch import receiver
+
+from .writer import access_writer, writer
+
+
+@receiver(request_finished)
+def flush_audit_logs(sender, **kwargs):
+    """请求结束（响应已发出）后，缓冲的日志达到阈值时批量写入"""
+    writer.flush_if_due()
+    access_writer.flush_if_due()
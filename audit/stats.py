@@ -0,0 +1,69 @@
+"""
+日志统计页的统计数据
+
+- 操作日志按日期、类型、结果、用户的统计读取每日汇总表（accounts.stats.operation_statistics）
+- 系统日志按级别计数没有汇总表：缓存各级别的计数和已统计到的最大 id（高水位），
+  刷新时只统计 id 更大的新记录；每 AUDIT_STATS_REBUILD_INTERVAL 秒全量重算一次，
+  修正删除（归档、后台删除）造成的偏差
+- 整页统计结果缓存 AUDIT_STATS_CACHE_TIMEOUT 秒，缓存有效期内页面不查询日志表
+
+增量统计只计入 AUDIT_STATS_SETTLE_SECONDS 秒之前创建的记录（高水位推进到其中最新一条的 id）：
+写入较慢的事务可能比 id 更大的记录晚提交，等它们提交后再推进高水位，避免漏计。
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from accounts.stats import operation_statistics
+
+from .models import SystemLog
+
+STATS_KEY = 'audit:log_statistics'
+LEVEL_KEY = 'audit:system_level_counts'
+
+
+def system_level_counts():
+    """系统日志各级别的计数，返回 {级别: 数量}"""
+    entry = cache.get(LEVEL_KEY)
+    if entry is None or time.time() - entry['built_at'] > settings.AUDIT_STATS_REBUILD_INTERVAL:
+        entry = {'max_id': 0, 'counts': {}, 'built_at': time.time()}
+
+    settled = timezone.now() - timedelta(seconds=settings.AUDIT_STATS_SETTLE_SECONDS)
+    # 两端都限定 id 的范围查询走主键，只读取新记录（只有下限时 SQLite 会改为扫描整个 level 索引）
+    upper = SystemLog.objects.filter(created_at__lt=settled).order_by('-created_at', '-id').values_list(
+        'id', flat=True,
+    ).first()
+    if upper is not None and upper > entry['max_id']:
+        rows = SystemLog.objects.filter(id__gt=entry['max_id'], id__lte=upper).values('level').annotate(
+            count=Count('id'),
+        ).order_by()
+        for row in rows:
+            entry['counts'][row['level']] = entry['counts'].get(row['level'], 0) + row['count']
+        entry['max_id'] = upper
+    # 并发刷新时各进程都从同一份缓存累加，结果相同，不会重复计数
+    cache.set(LEVEL_KEY, entry, None)
+    return entry['counts']
+
+
+def log_statistics():
+    """日志统计页的全部统计数据（最近 30 天、前 10 名用户），缓存 AUDIT_STATS_CACHE_TIMEOUT 秒"""
+    stats = cache.get(STATS_KEY)
+    if stats is not None:
+        return stats
+
+    stats = {name: list(rows) for name, rows in operation_statistics(days=30, top_users=10).items()}
+    stats['system_level_stats'] = [
+        {'level': level, 'count': count}
+        for level, count in sorted(system_level_counts().items(), key=lambda item: -item[1])
+    ]
+    cache.set(STATS_KEY, stats, settings.AUDIT_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate():
+    """日志被批量删除后（如归档）丢弃缓存的统计，下次访问时全量重算"""
+    cache.delete_many([LEVEL_KEY, STATS_KEY])
@@ -1,3 +1,161 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, datetime
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from mysite.testing import PerformanceTestCase
+
+from . import retention
+from . import stats as log_stats
+from .models import AccessLog, OperationLog, SystemLog
+from .writer import BufferedWriter
+
+
+class ViewPerformanceTests(PerformanceTestCase):
+    """页面和接口的查询预算"""
+
+    def test_operation_logs(self):
+        self.assertBudget(reverse('audit:operation_logs'), queries=4)
+        self.assertBudget(reverse('audit:operation_logs'), queries=4, data={
+            'search': '操作', 'operation_type': 'view', 'start_date': '2000-01-01', 'end_date': '2999-12-31',
+        })
+
+    def test_system_logs(self):
+        self.assertBudget(reverse('audit:system_logs'), queries=5)
+
+    def test_access_logs(self):
+        self.assertBudget(reverse('audit:access_logs'), queries=4)
+
+    def test_operation_logs_cursor(self):
+        """逐页翻到第 5 页：查询次数与第一页相同，记录不重复，向前翻页回到上一页"""
+        url = reverse('audit:operation_logs')
+        seen, pages, cursor = [], [], None
+        for _ in range(5):
+            # JSON 结果带总数：表统计信息查询 + 限量计数
+            response = self.assertBudget(
+                url, queries=5, data={'cursor': cursor} if cursor else None, HTTP_ACCEPT='application/json'
+            )
+            page = response.json()
+            pages.append(page)
+            seen.extend(row['id'] for row in page['data'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), len(set(seen)))
+        times = [row['operation_time'] for page in pages for row in page['data']]
+        self.assertEqual(times, sorted(times, reverse=True))
+
+        if len(pages) > 1:
+            previous = self.client.get(
+                url, {'cursor': pages[-1]['previous_cursor']}, HTTP_ACCEPT='application/json'
+            ).json()
+            self.assertEqual(previous['data'], pages[-2]['data'])
+
+    def test_export_logs(self):
+        """流式导出：每批一条查询，导出全部记录"""
+        sources = {'operation': OperationLog, 'system': SystemLog, 'access': AccessLog}
+        for log_type, model in sources.items():
+            total = model.objects.count()
+            for format_type in ('json', 'ndjson', 'csv'):
+                with override_settings(AUDIT_EXPORT_BATCH_SIZE=300):
+                    response = self.assertBudget(
+                        reverse('audit:export_logs'), queries=2, data={'type': log_type, 'format': format_type}
+                    )
+                    with CaptureQueriesContext(connection) as context:
+                        content = b''.join(response.streaming_content).decode('utf-8-sig')
+                self.assertEqual(len(context), total // 300 + 1, f'{log_type} {format_type}')
+                if format_type == 'json':
+                    rows = len(json.loads(content))
+                elif format_type == 'ndjson':
+                    rows = len(content.splitlines())
+                else:
+                    rows = len(list(csv.reader(io.StringIO(content)))) - 1
+                self.assertEqual(rows, total, f'{log_type} {format_type}')
+
+    def test_log_statistics(self):
+        # 第二次请求读取缓存的统计结果，不查询日志表和汇总表
+        self.assertBudget(reverse('audit:log_statistics'), queries=3)
+
+    @override_settings(AUDIT_STATS_SETTLE_SECONDS=0)
+    def test_log_statistics_incremental(self):
+        """统计缓存过期后，系统日志只统计高水位之后的新记录"""
+        before = {row['level']: row['count'] for row in log_stats.log_statistics()['system_level_stats']}
+        SystemLog.objects.bulk_create([SystemLog(level='ERROR', module='test', message='新记录') for _ in range(3)])
+        cache.delete(log_stats.STATS_KEY)
+
+        with CaptureQueriesContext(connection) as context:
+            after = {row['level']: row['count'] for row in log_stats.log_statistics()['system_level_stats']}
+        self.assertEqual(after['ERROR'], before.get('ERROR', 0) + 3)
+        self.assertEqual(sum(after.values()), SystemLog.objects.count())
+        level_queries = [query['sql'] for query in context.captured_queries if 'audit_systemlog' in query['sql']]
+        self.assertEqual(len(level_queries), 2)
+        self.assertIn('"audit_systemlog"."id" >', level_queries[-1])
+
+
+@override_settings(AUDIT_BATCH_SIZE=2, AUDIT_FLUSH_INTERVAL=0)
+class BufferedWriterTests(TestCase):
+    """缓冲的日志不在请求线程的事务中写入"""
+
+    def setUp(self):
+        # 不启动后台线程，由测试代替它调用 flush()
+        patcher = mock.patch('audit.writer.threading.Thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.writer = BufferedWriter(OperationLog)
+
+    def log(self, description):
+        return OperationLog(operation_type='view', result='success', description=description, ip_address='127.0.0.1')
+
+    def test_full_buffer_wakes_flusher(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.writer.add(self.log('a'))
+            self.writer.add(self.log('b'))
+            self.writer.flush_if_due()
+            raise RuntimeError
+        # 请求的事务回滚不影响缓冲区中的日志
+        self.assertFalse(OperationLog.objects.filter(description__in=['a', 'b']).exists())
+        self.assertTrue(self.writer.wakeup.is_set())
+        self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(OperationLog.objects.filter(description__in=['a', 'b']).count(), 2)
+
+
+class RetentionTests(TestCase):
+    """归档后只删除已写入归档文件的日志"""
+
+    MONTH = date(2020, 1, 1)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def create_logs(self, count):
+        logs = [SystemLog.objects.create(level='INFO', module='audit', message=str(i)) for i in range(count)]
+        SystemLog.objects.filter(id__in=[log.id for log in logs]).update(
+            created_at=datetime(2020, 1, 15, tzinfo=timezone.utc),
+        )
+        return logs
+
+    def test_rows_written_after_archive_are_kept(self):
+        self.create_logs(3)
+        self.assertEqual(retention.write_archive('system', self.MONTH, self.directory), (3, 0))
+        late = self.create_logs(1)[0]
+
+        path = retention.archive_path('system', self.MONTH, self.directory)
+        self.assertEqual(retention.delete_month('system', self.MONTH, retention.archived_ids(path), batch_size=2), 3)
+        self.assertEqual(list(retention.month_queryset('system', self.MONTH).values_list('id', flat=True)), [late.id])
+
+        # 下次归档时补充
+        call_command('archive_logs', '--type', 'system', '--output-dir', self.directory, stdout=io.StringIO())
+        self.assertFalse(retention.month_queryset('system', self.MONTH).exists())
+        self.assertEqual(len(retention.archived_ids(path)), 4)
@@ -1,15 +1,58 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q, Count
-from django.http import JsonResponse
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import OperationLog, SystemLog, AccessLog
+from . import export
+from . import stats as log_stats
 from permissions.decorators import permission_required
+from mysite.daterange import filter_day_range
+from mysite.pagination import paginate
 import json
 
 
+def wants_json(request):
+    return request.headers.get('Accept') == 'application/json'
+
+
+def operation_log_data(log):
+    return {
+        'id': log.id,
+        'operation_time': log.operation_time.isoformat(),
+        'user': log.user.username if log.user else '匿名',
+        'operation_type': log.operation_type,
+        'result': log.result,
+        'description': log.description,
+        'ip_address': log.ip_address,
+        'security_level': log.security_level,
+    }
+
+
+def system_log_data(log):
+    return {
+        'id': log.id,
+        'created_at': log.created_at.isoformat(),
+        'level': log.level,
+        'module': log.module,
+        'message': log.message,
+    }
+
+
+def access_log_data(log):
+    return {
+        'id': log.id,
+        'accessed_at': log.accessed_at.isoformat(),
+        'user': log.user.username if log.user else '匿名',
+        'path': log.path,
+        'method': log.method,
+        'status_code': log.status_code,
+        'response_time': log.response_time,
+        'ip_address': log.ip_address,
+    }
+
+
 @login_required
 @permission_required('log:view')
 def operation_logs(request):
@@ -41,15 +84,12 @@ def operation_logs(request):
     # 时间范围筛选
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    if start_date:
-        logs = logs.filter(operation_time__date__gte=start_date)
-    if end_date:
-        logs = logs.filter(operation_time__date__lte=end_date)
+    logs = filter_day_range(logs, 'operation_time', start_date, end_date)
     
-    # 分页
-    paginator = Paginator(logs, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 游标分页（按时间和 ID 定位，不做 OFFSET 扫描和全表计数）
+    page_obj = paginate(request, logs, 50, ordering=('-operation_time', '-id'), count='approximate')
+    if wants_json(request):
+        return JsonResponse({'success': True, **page_obj.as_dict(operation_log_data)})
     
     context = {
         'page_obj': page_obj,
@@ -93,18 +133,15 @@ def system_logs(request):
     # 时间范围筛选
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    if start_date:
-        logs = logs.filter(created_at__date__gte=start_date)
-    if end_date:
-        logs = logs.filter(created_at__date__lte=end_date)
+    logs = filter_day_range(logs, 'created_at', start_date, end_date)
     
-    # 分页
-    paginator = Paginator(logs, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 游标分页
+    page_obj = paginate(request, logs, 100, ordering=('-created_at', '-id'), count='approximate')
+    if wants_json(request):
+        return JsonResponse({'success': True, **page_obj.as_dict(system_log_data)})
     
-    # 获取所有模块
-    modules = SystemLog.objects.values_list('module', flat=True).distinct()
+    # 获取所有模块（清除默认排序，否则 DISTINCT 包含 created_at，每条日志返回一行）
+    modules = SystemLog.objects.order_by('module').values_list('module', flat=True).distinct()
     
     context = {
         'page_obj': page_obj,
@@ -147,15 +184,12 @@ def access_logs(request):
     # 时间范围筛选
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    if start_date:
-        logs = logs.filter(accessed_at__date__gte=start_date)
-    if end_date:
-        logs = logs.filter(accessed_at__date__lte=end_date)
+    logs = filter_day_range(logs, 'accessed_at', start_date, end_date)
     
-    # 分页
-    paginator = Paginator(logs, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 游标分页
+    page_obj = paginate(request, logs, 100, ordering=('-accessed_at', '-id'), count='approximate')
+    if wants_json(request):
+        return JsonResponse({'success': True, **page_obj.as_dict(access_log_data)})
     
     context = {
         'page_obj': page_obj,
@@ -174,116 +208,42 @@ def access_logs(request):
 @login_required
 @permission_required('log:export')
 def export_logs(request):
-    """导出日志"""
+    """导出日志（流式输出，不限制条数）"""
     log_type = request.GET.get('type', 'operation')
     format_type = request.GET.get('format', 'json')
     
-    if log_type == 'operation':
-        logs = OperationLog.objects.all().order_by('-operation_time')
-    elif log_type == 'system':
-        logs = SystemLog.objects.all().order_by('-created_at')
-    elif log_type == 'access':
-        logs = AccessLog.objects.all().order_by('-accessed_at')
-    else:
+    if log_type not in export.SOURCES:
         return JsonResponse({'error': '无效的日志类型'}, status=400)
+    if format_type not in export.ENCODERS:
+        return JsonResponse({'error': '不支持的导出格式'}, status=400)
+    if format_type == 'parquet' and not export.parquet_available():
+        return JsonResponse({'error': '服务器未安装 pyarrow，不支持 Parquet 格式'}, status=400)
     
     # 时间范围限制
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    if start_date:
-        if log_type == 'operation':
-            logs = logs.filter(operation_time__date__gte=start_date)
-        elif log_type == 'system':
-            logs = logs.filter(created_at__date__gte=start_date)
-        else:
-            logs = logs.filter(accessed_at__date__gte=start_date)
-    
-    if end_date:
-        if log_type == 'operation':
-            logs = logs.filter(operation_time__date__lte=end_date)
-        elif log_type == 'system':
-            logs = logs.filter(created_at__date__lte=end_date)
-        else:
-            logs = logs.filter(accessed_at__date__lte=end_date)
-    
-    # 限制导出数量
-    logs = logs[:10000]
-    
-    if format_type == 'json':
-        data = []
-        for log in logs:
-            if log_type == 'operation':
-                data.append({
-                    'operation_time': log.operation_time.isoformat(),
-                    'user': log.user.username if log.user else '匿名',
-                    'operation_type': log.operation_type,
-                    'result': log.result,
-                    'description': log.description,
-                    'ip_address': log.ip_address,
-                    'security_level': log.security_level,
-                })
-            elif log_type == 'system':
-                data.append({
-                    'created_at': log.created_at.isoformat(),
-                    'level': log.level,
-                    'module': log.module,
-                    'message': log.message,
-                })
-            else:  # access
-                data.append({
-                    'accessed_at': log.accessed_at.isoformat(),
-                    'user': log.user.username if log.user else '匿名',
-                    'path': log.path,
-                    'method': log.method,
-                    'status_code': log.status_code,
-                    'response_time': log.response_time,
-                    'ip_address': log.ip_address,
-                })
-        
-        return JsonResponse(data, safe=False)
-    
-    return JsonResponse({'error': '不支持的导出格式'}, status=400)
+    model, time_field, _ = export.SOURCES[log_type]
+    logs = filter_day_range(model.objects.all(), time_field, request.GET.get('start_date'), request.GET.get('end_date'))
+    
+    response = StreamingHttpResponse(
+        export.export_stream(log_type, format_type, logs), content_type=export.CONTENT_TYPES[format_type]
+    )
+    filename = f'{log_type}_logs_{timezone.localtime():%Y%m%d_%H%M%S}.{format_type}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 @login_required
 @permission_required('log:view')
 def log_statistics(request):
     """日志统计"""
-    # 操作日志统计
-    operation_stats = OperationLog.objects.extra(
-        select={'date': 'DATE(operation_time)'}
-    ).values('date').annotate(
-        count=Count('id')
-    ).order_by('date')[:30]
-    
-    # 按操作类型统计
-    operation_type_stats = OperationLog.objects.values('operation_type').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # 按结果统计
-    result_stats = OperationLog.objects.values('result').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # 按用户统计
-    user_stats = OperationLog.objects.filter(
-        user__isnull=False
-    ).values('user__username').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
-    
-    # 系统日志统计
-    system_level_stats = SystemLog.objects.values('level').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    # 操作日志统计读取每日汇总表，系统日志按级别增量计数，整页结果缓存
+    stats = log_stats.log_statistics()
     
     context = {
-        'operation_stats': operation_stats,
-        'operation_type_stats': operation_type_stats,
-        'result_stats': result_stats,
-        'user_stats': user_stats,
-        'system_level_stats': system_level_stats,
+        'operation_stats': stats['operation_stats'],
+        'operation_type_stats': stats['operation_type_stats'],
+        'result_stats': stats['result_stats'],
+        'user_stats': stats['user_stats'],
+        'system_level_stats': stats['system_level_stats'],
     }
     
     return render(request, 'audit/log_statistics.html', context)
\ No newline at end of file
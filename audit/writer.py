@@ -0,0 +1,182 @@
+"""
+日志批量写入
+
+视图调用 log_operation() 记录操作日志、AccessLogMiddleware 记录访问日志时只把记录放入进程内
+缓冲区，由以下时机批量 bulk_create：
+- 缓冲条数达到 AUDIT_BATCH_SIZE（唤醒后台线程写入）
+- 距上次写入超过 AUDIT_FLUSH_INTERVAL 秒（请求结束时检查，空闲时由后台线程检查）
+- 进程退出（atexit，gunicorn 的 worker_exit 钩子）
+
+操作日志中删除、权限变更、拒绝访问等安全相关的记录（AUDIT_SYNC_OPERATIONS / AUDIT_SYNC_RESULTS）以及
+sync=True 时仍在请求中同步写入，写入失败会向调用方抛出异常。
+
+缓冲区中是多个请求的日志，不能在处于事务中的请求线程里写入（该事务回滚时其他请求的日志也会丢失），
+此时改由后台线程用它自己的数据库连接写入。
+
+bulk_create 不触发 post_save，批量写入操作日志后由本模块直接累加每日汇总（DailyActivityRollup）。
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.utils import timezone
+
+from .models import AccessLog, OperationLog
+
+logger = logging.getLogger('audit')
+
+
+class BufferedWriter:
+    """进程内的日志缓冲区（线程安全），on_flush 在每批记录写入后调用"""
+
+    def __init__(self, model, on_flush=None):
+        self.model = model
+        self.on_flush = on_flush
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.thread = None
+        self.wakeup = threading.Event()
+
+    def _check_fork(self):
+        # preload_app 时 master 进程 fork 出 worker，缓冲区和后台线程不能沿用
+        if self.pid != os.getpid():
+            self._reset()
+
+    def add(self, log):
+        """放入缓冲区，达到条数阈值时唤醒后台线程写入"""
+        self._check_fork()
+        with self.lock:
+            self.buffer.append(log)
+            full = len(self.buffer) >= settings.AUDIT_BATCH_SIZE
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name=f'{self.model._meta.model_name}-writer', daemon=True
+                )
+                self.thread.start()
+        if full:
+            self.wakeup.set()
+
+    def due(self):
+        return bool(self.buffer) and (
+            len(self.buffer) >= settings.AUDIT_BATCH_SIZE
+            or time.monotonic() - self.last_flush >= settings.AUDIT_FLUSH_INTERVAL
+        )
+
+    def flush(self):
+        """写入缓冲区中的全部记录，返回写入条数"""
+        self._check_fork()
+        with self.lock:
+            logs, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if not logs:
+            return 0
+        name = self.model._meta.verbose_name
+        try:
+            self.model.objects.bulk_create(logs, batch_size=settings.AUDIT_BATCH_SIZE)
+        except Exception as e:
+            # 个别记录无效（如用户已被删除）时逐条写入，写入失败的记录保留在日志文件中
+            logger.warning(f'批量写入{name}失败，改为逐条写入（{len(logs)} 条）: {e}')
+            logs = [log for log in logs if self._write_one(log)]
+        if self.on_flush and logs:
+            self.on_flush(logs)
+        return len(logs)
+
+    def _write_one(self, log):
+        try:
+            self.model.objects.bulk_create([log])
+            return True
+        except Exception as e:
+            fields = {f.attname: getattr(log, f.attname) for f in self.model._meta.concrete_fields}
+            logger.error(f'写入{self.model._meta.verbose_name}失败: {fields}: {e}')
+            return False
+
+    def flush_if_due(self):
+        if not self.due():
+            return
+        if connection.in_atomic_block:
+            self.wakeup.set()
+        else:
+            self.flush()
+
+    def _run(self):
+        """后台线程：达到条数阈值时被唤醒，空闲进程也按时间阈值写入"""
+        while True:
+            self.wakeup.wait(settings.AUDIT_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            if self.pid != os.getpid():
+                return
+            try:
+                self.flush_if_due()
+            except Exception as e:
+                logger.exception(f'写入{self.model._meta.verbose_name}出错: {e}')
+            finally:
+                connection.close()
+
+
+def rollup(logs):
+    """累加批量写入的操作日志的每日汇总（bulk_create 不触发 post_save 信号）"""
+    from accounts.stats import record_activity
+
+    groups = {}
+    for log in logs:
+        key = (log.user_id, timezone.localdate(log.operation_time), log.result, log.operation_type)
+        when, count = groups.get(key, (log.operation_time, 0))
+        groups[key] = (when, count + 1)
+    for (user_id, _, result, operation_type), (when, count) in groups.items():
+        record_activity('operation', user_id, when, result, kind=operation_type, count=count)
+
+
+writer = BufferedWriter(OperationLog, on_flush=rollup)
+access_writer = BufferedWriter(AccessLog)
+
+
+def is_sync(operation_type, result):
+    """安全相关的操作需要同步写入"""
+    return operation_type in settings.AUDIT_SYNC_OPERATIONS or result in settings.AUDIT_SYNC_RESULTS
+
+
+def log_operation(request, operation_type, result, description, content_object=None, sync=None, **fields):
+    """
+    记录一条操作日志，用户、IP 和 User-Agent 取自请求
+
+    sync 为 None 时按操作类型和结果决定是否同步写入；AUDIT_BUFFERED 关闭时始终同步写入。
+    """
+    log = OperationLog(
+        user=request.user if request.user.is_authenticated else None,
+        operation_type=operation_type,
+        result=result,
+        description=description,
+        ip_address=request.META.get('REMOTE_ADDR'),
+        user_agent=request.META.get('HTTP_USER_AGENT'),
+        **fields
+    )
+    if content_object is not None:
+        # ContentType 按模型缓存在进程内，不会每次查询
+        log.content_type = ContentType.objects.get_for_model(content_object)
+        log.object_id = content_object.pk
+
+    if sync is None:
+        sync = is_sync(operation_type, result)
+    if sync or not settings.AUDIT_BUFFERED:
+        log.save()
+    else:
+        writer.add(log)
+    return log
+
+
+def flush():
+    """立即写入缓冲区中的全部日志"""
+    return writer.flush() + access_writer.flush()
+
+
+atexit.register(flush)
@@ -7,7 +7,7 @@ echo "开始部署Django项目..."
 sudo apt update && sudo apt upgrade -y
 
 # 安装必要的软件包
-sudo apt install -y python3 python3-pip python3-venv nginx mysql-server git
+sudo apt install -y python3 python3-pip python3-venv nginx mysql-server redis-server git
 
 # 安装Python依赖
 pip3 install --upgrade pip
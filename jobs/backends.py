@@ -0,0 +1,79 @@
+"""
+任务执行后端
+
+通过 settings.JOBS_BACKEND 选择：
+- LocalBackend：进程内线程池（JOBS_LOCAL_WORKERS 为 0 时在事务提交后同步执行，便于测试）
+- DatabaseBackend：只依赖任务表，由 run_jobs 管理命令执行
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils.module_loading import import_string
+
+from .queue import claim_job, execute_job, retry_delay
+
+logger = logging.getLogger('jobs')
+
+
+class BaseBackend:
+    """任务后端基类"""
+
+    def submit(self, job_id, delay=0):
+        raise NotImplementedError
+
+
+class DatabaseBackend(BaseBackend):
+    """任务已写入任务表，等待 run_jobs 领取"""
+
+    def submit(self, job_id, delay=0):
+        pass
+
+
+class LocalBackend(BaseBackend):
+    """在当前进程的线程池中执行任务（进程重启时未执行的任务可由 run_jobs 补做）"""
+
+    def __init__(self):
+        self.workers = settings.JOBS_LOCAL_WORKERS
+        self.executor = None
+        if self.workers:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='jobs')
+
+    def submit(self, job_id, delay=0):
+        if delay:
+            timer = threading.Timer(delay, self.dispatch, args=(job_id, True))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.dispatch(job_id)
+
+    def dispatch(self, job_id, in_thread=False):
+        if self.executor is not None:
+            self.executor.submit(self.run, job_id, True)
+        else:
+            self.run(job_id, in_thread)
+
+    def run(self, job_id, in_thread=False):
+        """执行任务；在工作线程中执行时使用独立的数据库连接"""
+        if in_thread:
+            close_old_connections()
+        try:
+            if not claim_job(job_id):
+                return
+            job = execute_job(job_id)
+            if job.status == 'pending':
+                self.submit(job_id, retry_delay(job.attempts))
+        except Exception as e:
+            logger.exception(f'执行任务出错: {job_id}: {e}')
+        finally:
+            if in_thread:
+                connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_backend(backend_path=None):
+    """按配置加载任务后端（每个进程只实例化一次）"""
+    return import_string(backend_path or settings.JOBS_BACKEND)()
@@ -0,0 +1,61 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.queue import claim_jobs, requeue_stale_jobs
+from jobs.worker import init_worker, run_job
+
+
+class Command(BaseCommand):
+    help = '领取并执行任务表中的后台任务（进程池）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOBS_WORKER_PROCESSES,
+                            help='并行执行任务的进程数')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='没有任务时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true',
+                            help='执行完当前到期的任务后退出')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        processes = options['processes']
+        # 使用 spawn，避免子进程继承主进程的数据库连接
+        context = multiprocessing.get_context('spawn')
+        running = set()
+        done_count = 0
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker) as pool:
+            while not self.stopping:
+                requeue_stale_jobs()
+                free = processes - len(running)
+                job_ids = claim_jobs(free) if free else []
+                running.update(pool.submit(run_job, job_id) for job_id in job_ids)
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_count += 1
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.stderr.write(f'任务进程出错: {e}')
+                running = set(running)
+
+            # 收到退出信号：等待已领取的任务执行完
+            wait(running)
+        self.stdout.write(self.style.SUCCESS(f'共执行 {done_count + len(running)} 个任务'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
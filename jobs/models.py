@@ -0,0 +1,46 @@
+import uuid
+
+from django.db import models
+from django.conf import settings
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """后台任务"""
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '执行中'),
+        ('succeeded', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=200, verbose_name="任务名称")
+    args = models.JSONField(default=list, blank=True, verbose_name="位置参数")
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name="关键字参数")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="状态")
+    attempts = models.IntegerField(default=0, verbose_name="已执行次数")
+    max_attempts = models.IntegerField(default=3, verbose_name="最多执行次数")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="最早执行时间")
+    result = models.JSONField(null=True, blank=True, verbose_name="执行结果")
+    error = models.TextField(blank=True, verbose_name="错误信息")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="执行进程")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="创建用户")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+
+    class Meta:
+        verbose_name = "后台任务"
+        verbose_name_plural = "后台任务"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
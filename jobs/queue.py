@@ -0,0 +1,144 @@
+"""
+后台任务队列
+
+用 @task 注册任务函数，视图通过 enqueue() 提交任务后立即返回（202），由配置的后端执行：
+- LocalBackend：当前进程内的线程池执行，无需额外进程（开发、测试、单机部署）
+- DatabaseBackend：只写入任务表，由 run_jobs 管理命令的进程池领取执行
+
+任务参数与返回值需可 JSON 序列化；失败后按指数退避重试，超过 max_attempts 次标记为失败。
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger('jobs')
+
+TASKS = {}
+
+
+def task(func=None, max_attempts=None):
+    """注册任务函数，可写作 @task 或 @task(max_attempts=5)"""
+    def register(func):
+        name = f'{func.__module__}.{func.__name__}'
+        func.job_name = name
+        func.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        TASKS[name] = func
+        return func
+    if func is not None:
+        return register(func)
+    return register
+
+
+def get_task(name):
+    """按名称获取已注册的任务函数（只允许执行用 @task 注册过的函数）"""
+    if name not in TASKS:
+        # 任务所在模块可能尚未导入
+        import_string(name)
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise LookupError(f'未注册的任务: {name}')
+
+
+def enqueue(func, args=(), kwargs=None, created_by=None, delay=0):
+    """
+    提交任务，返回 Job
+
+    在事务中调用时任务记录随事务提交，事务提交后才交给后端执行。
+    """
+    job = Job.objects.create(
+        name=func.job_name,
+        args=list(args),
+        kwargs=kwargs or {},
+        max_attempts=func.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        created_by=created_by if created_by is not None and created_by.is_authenticated else None,
+    )
+    from .backends import get_backend
+    backend = get_backend()
+    transaction.on_commit(lambda: backend.submit(job.id, delay))
+    return job
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def retry_delay(attempts):
+    """第 attempts 次失败后的重试间隔（秒）"""
+    return settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def claim_jobs(limit):
+    """领取最多 limit 个到期的任务并标记为执行中，返回任务 ID 列表"""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Job.objects.filter(status='pending', run_after__lte=now).order_by('run_after')
+        if connection.features.has_select_for_update_skip_locked:
+            # 多个 worker 同时领取时跳过已被锁定的行
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # 不支持 SKIP LOCKED 时其他 worker 可能已领取其中部分任务，只更新仍在等待的任务，
+        # 再按本次领取标记重新读取，只返回本 worker 实际领取到的任务
+        locked_by = worker_id()
+        Job.objects.filter(id__in=ids, status='pending').update(
+            status='running', attempts=F('attempts') + 1, locked_by=locked_by, started_at=now
+        )
+        return list(
+            Job.objects.filter(id__in=ids, status='running', locked_by=locked_by, started_at=now)
+            .order_by('run_after').values_list('id', flat=True)
+        )
+
+
+def claim_job(job_id):
+    """领取指定任务（由调用方负责延迟执行），已被领取时返回 False"""
+    now = timezone.now()
+    return Job.objects.filter(id=job_id, status='pending').update(
+        status='running', attempts=F('attempts') + 1, locked_by=worker_id(), started_at=now
+    ) == 1
+
+
+def requeue_stale_jobs():
+    """执行进程异常退出后遗留的执行中任务：重新排队或标记为失败"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status='running', started_at__lt=cutoff)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', error='执行超时', finished_at=timezone.now()
+    )
+    return stale.update(status='pending', run_after=timezone.now())
+
+
+def execute_job(job_id):
+    """执行已领取的任务，返回执行后的 Job"""
+    job = Job.objects.get(id=job_id)
+    try:
+        result = get_task(job.name)(*job.args, **job.kwargs)
+    except Exception as e:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            logger.warning(f'任务失败，稍后重试: {job.name} ({job.id}) 第 {job.attempts} 次: {e}')
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error(f'任务失败: {job.name} ({job.id}): {e}')
+    else:
+        job.status = 'succeeded'
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'run_after', 'finished_at', 'updated_at'])
+    return job
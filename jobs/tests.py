@@ -0,0 +1,166 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .backends import DatabaseBackend, LocalBackend
+from .models import Job
+from .queue import claim_job, claim_jobs, enqueue, execute_job, requeue_stale_jobs, retry_delay, task
+
+
+@task
+def add(a, b):
+    return a + b
+
+
+@task(max_attempts=2)
+def fail(message):
+    raise RuntimeError(message)
+
+
+@override_settings(JOBS_RETRY_DELAY=30, JOBS_LOCAL_WORKERS=0, JOBS_LOCK_TIMEOUT=3600)
+class QueueTests(TestCase):
+    """任务的提交、领取、执行和重试"""
+
+    def setUp(self):
+        self.backend = DatabaseBackend()
+        patcher = mock.patch('jobs.backends.get_backend', side_effect=lambda: self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = enqueue(add, args=[1, 2], delay=60)
+        self.assertEqual((job.name, job.args, job.status, job.max_attempts), ('jobs.tests.add', [1, 2], 'pending', 3))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+        # 事务提交后才交给后端
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(enqueue(fail, args=['x']).max_attempts, 2)
+
+    def test_claim_jobs(self):
+        due = enqueue(add, args=[1, 2])
+        enqueue(add, args=[3, 4], delay=60)
+        self.assertEqual(claim_jobs(10), [due.id])
+        due.refresh_from_db()
+        self.assertEqual((due.status, due.attempts), ('running', 1))
+        self.assertTrue(due.locked_by)
+        # 已领取的任务不会被再次领取
+        self.assertEqual(claim_jobs(10), [])
+        self.assertFalse(claim_job(due.id))
+
+    def test_claim_jobs_skips_jobs_claimed_concurrently(self):
+        first = enqueue(add, args=[1, 2])
+        second = enqueue(add, args=[3, 4])
+
+        def claimed_by_other_worker():
+            # 读取任务 ID 之后、更新之前，另一个 worker 领取了 first
+            Job.objects.filter(id=first.id).update(status='running', attempts=1, locked_by='other:1')
+            return 'this:1'
+
+        with mock.patch('jobs.queue.worker_id', side_effect=claimed_by_other_worker), \
+                mock.patch.object(connection.features, 'has_select_for_update_skip_locked', False):
+            self.assertEqual(claim_jobs(10), [second.id])
+        first.refresh_from_db()
+        self.assertEqual((first.attempts, first.locked_by), (1, 'other:1'))
+
+    def test_execute_job(self):
+        job = enqueue(add, args=[1, 2])
+        claim_jobs(1)
+        job = execute_job(job.id)
+        self.assertEqual((job.status, job.result, job.error), ('succeeded', 3, ''))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_with_backoff(self):
+        self.assertEqual([retry_delay(attempts) for attempts in (1, 2, 3)], [30, 60, 120])
+
+        job = enqueue(fail, args=['出错'])
+        claim_jobs(1)
+        before = timezone.now()
+        with self.assertLogs('jobs', 'WARNING'):
+            job = execute_job(job.id)
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('RuntimeError: 出错', job.error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=30))
+        # 重试时间未到，不会被领取
+        self.assertEqual(claim_jobs(1), [])
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        claim_jobs(1)
+        with self.assertLogs('jobs', 'ERROR'):
+            job = execute_job(job.id)
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_requeue_stale_jobs(self):
+        stale = enqueue(add, args=[1, 2])
+        exhausted = enqueue(fail, args=['x'])
+        fresh = enqueue(add, args=[3, 4])
+        claim_jobs(3)
+        Job.objects.filter(id=exhausted.id).update(attempts=2)
+        Job.objects.filter(id__in=[stale.id, exhausted.id]).update(started_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+        statuses = dict(Job.objects.values_list('id', 'status'))
+        self.assertEqual(
+            (statuses[stale.id], statuses[exhausted.id], statuses[fresh.id]), ('pending', 'failed', 'running'),
+        )
+
+    def test_database_backend_waits_for_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue(add, args=[1, 2])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+
+    def test_local_backend_runs_after_commit(self):
+        self.backend = LocalBackend()
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue(add, args=[1, 2])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ('succeeded', 3))
+
+    def test_local_backend_schedules_retry(self):
+        self.backend = LocalBackend()
+        with mock.patch('jobs.backends.threading.Timer') as timer, self.assertLogs('jobs', 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                job = enqueue(fail, args=['x'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        timer.assert_called_once_with(30, self.backend.dispatch, args=(job.id, True))
+        timer.return_value.start.assert_called_once_with()
+
+        # 已被其他进程领取的任务不会重复执行
+        claim_job(job.id)
+        self.backend.run(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('running', 2))
+
+
+class JobStatusTests(TestCase):
+    """任务状态查询接口"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user('job_owner', password='x')
+        cls.other = User.objects.create_user('job_other', password='x')
+        cls.job = Job.objects.create(
+            name='jobs.tests.fail', args=['x'], status='failed', attempts=3, created_by=cls.owner,
+            error='Traceback (most recent call last):\nRuntimeError: 出错\n', finished_at=timezone.now(),
+        )
+
+    def test_job_status(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('jobs:job_status', args=[self.job.id]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual((data['id'], data['status'], data['attempts']), (str(self.job.id), 'failed', 3))
+        # 只返回最后一行错误信息
+        self.assertEqual(data['error'], 'RuntimeError: 出错')
+
+    def test_other_users_job_not_found(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse('jobs:job_status', args=[self.job.id])).status_code, 404)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'jobs'
+
+urlpatterns = [
+    path('api/jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+]
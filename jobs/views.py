@@ -0,0 +1,43 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+
+from .models import Job
+
+
+def job_status_url(job):
+    """任务状态查询地址"""
+    return reverse('jobs:job_status', args=[job.id])
+
+
+def job_accepted(job, message, data=None, **extra):
+    """任务已提交的 202 响应，附带状态查询地址"""
+    payload = dict(data or {}, job_id=str(job.id), status_url=job_status_url(job))
+    return JsonResponse(dict(extra, success=True, message=message, data=payload), status=202)
+
+
+@login_required
+@require_http_methods(["GET"])
+def job_status(request, job_id):
+    """查询后台任务状态"""
+    jobs = Job.objects.all() if request.user.is_superuser else Job.objects.filter(created_by=request.user)
+    # 其他用户的任务按不存在处理，不暴露任务 ID 是否有效
+    job = get_object_or_404(jobs, id=job_id)
+
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'id': str(job.id),
+            'name': job.name,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'attempts': job.attempts,
+            'max_attempts': job.max_attempts,
+            'result': job.result,
+            'error': job.error.strip().splitlines()[-1] if job.error else '',
+            'created_at': job.created_at.isoformat(),
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }
+    })
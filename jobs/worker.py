@@ -0,0 +1,25 @@
+"""
+run_jobs 进程池子进程的入口
+
+子进程以 spawn 方式启动，反序列化这些函数时 Django 尚未初始化，因此本模块不能在
+顶层导入模型。
+"""
+import signal
+
+
+def init_worker():
+    """子进程初始化：加载 Django，退出信号交由主进程处理"""
+    import django
+    django.setup()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def run_job(job_id):
+    """执行一个已领取的任务，返回执行后的状态"""
+    from django.db import connection
+    from .queue import execute_job
+
+    try:
+        return execute_job(job_id).status
+    finally:
+        connection.close()
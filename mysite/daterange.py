@@ -0,0 +1,50 @@
+"""
+按日期筛选时间字段
+
+页面上的 start_date/end_date 是当前时区的自然日。用 field__date__gte 筛选会把列包在 DATE() 中，
+无法使用时间列上的索引；这里把日期换算为带时区的半开区间 [开始日 00:00, 结束日次日 00:00)，
+生成 field >= start AND field < end 的范围条件。
+
+    logs = filter_day_range(logs, 'operation_time', request.GET.get('start_date'), request.GET.get('end_date'))
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def parse_day(value):
+    """'YYYY-MM-DD' 或 date -> date，空值或格式无效时返回 None"""
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return parse_date(value)
+    except ValueError:
+        # 格式正确但日期不存在，如 2024-02-30
+        return None
+
+
+def day_start(day):
+    """当前时区 day 当天 00:00"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_range(start_date=None, end_date=None):
+    """返回 (开始时间, 结束时间)，结束时间不含；未指定或无效的一端为 None"""
+    start_day, end_day = parse_day(start_date), parse_day(end_date)
+    start = day_start(start_day) if start_day and start_day > date.min else None
+    # 结束日为 9999-12-31 时不限制结束时间
+    end = day_start(end_day + timedelta(days=1)) if end_day and end_day < date.max else None
+    return start, end
+
+
+def filter_day_range(queryset, field, start_date=None, end_date=None):
+    """按自然日筛选 field（含开始日和结束日）"""
+    start, end = day_range(start_date, end_date)
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
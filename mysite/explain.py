@@ -0,0 +1,129 @@
+"""
+查询计划检查
+
+用测试客户端请求各视图，记录执行的 SELECT，逐条 EXPLAIN，找出全表扫描和额外排序
+（SQLite "SCAN 表" / "USE TEMP B-TREE"，MySQL type=ALL / Using filesort，PostgreSQL Seq Scan / Sort）。
+
+    python manage.py explain_views --username perf_admin
+"""
+import re
+
+from django.db import DatabaseError, connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .testing import normalize, page_templates
+
+# 检查的视图：(URL 名称, 查询参数)，按真实页面的常见筛选组合
+VIEWS = [
+    ('accounts:dashboard', {}),
+    ('accounts:my_data', {}),
+    ('accounts:data_management', {}),
+    ('accounts:data_management', {'source': 'internal', 'start_date': '2000-01-01', 'end_date': '2999-12-31'}),
+    ('videos:dashboard', {}),
+    ('videos:video_list', {}),
+    ('videos:video_list', {'security_level': 2, 'sort': '-download_count'}),
+    ('audit:operation_logs', {}),
+    ('audit:operation_logs', {'operation_type': 'view', 'result': 'success'}),
+    ('audit:system_logs', {}),
+    ('audit:system_logs', {'level': 'ERROR'}),
+    ('audit:access_logs', {}),
+    ('audit:access_logs', {'status_code': 404}),
+    ('audit:export_logs', {'type': 'operation'}),
+    ('audit:log_statistics', {}),
+    ('permissions:user_list', {}),
+]
+
+ALIAS_RE = re.compile(r'"(\w+)"(?: AS)? "?([A-Z]\d+)"?\b')
+PG_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+
+
+def explain(sql):
+    """返回 (计划文本行, 全表扫描的表或别名, 是否额外排序)"""
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[3] for row in cursor.fetchall()]
+            scans = [
+                detail.split()[1] for detail in details
+                if detail.startswith('SCAN ') and 'INDEX' not in detail
+            ]
+            return details, scans, any('TEMP B-TREE' in detail for detail in details)
+        if vendor == 'mysql':
+            cursor.execute(f'EXPLAIN {sql}')
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            lines = [
+                f'{row["table"]}: type={row["type"]} key={row["key"]} rows={row["rows"]} {row["Extra"] or ""}'.rstrip()
+                for row in rows
+            ]
+            scans = [row['table'] for row in rows if row['type'] == 'ALL' and row['table']]
+            return lines, scans, any('filesort' in (row['Extra'] or '') for row in rows)
+        cursor.execute(f'EXPLAIN {sql}')
+        lines = [row[0] for row in cursor.fetchall()]
+        scans = [match.group(1) for line in lines for match in PG_SCAN_RE.finditer(line)]
+        return lines, scans, any(line.strip().startswith('Sort') for line in lines)
+
+
+def table_rows(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+def resolve_tables(sql, names, tables):
+    """把计划中的别名（U0、T3）还原为表名，忽略子查询"""
+    aliases = {alias: table for table, alias in ALIAS_RE.findall(sql)}
+    resolved = []
+    for name in names:
+        name = aliases.get(name, name)
+        if name in tables and name not in resolved:
+            resolved.append(name)
+    return resolved
+
+
+@override_settings(
+    # 与视图性能测试一致：日志同步写入（随请求回滚），不启动后台线程
+    AUDIT_BUFFERED=False,
+    ACCESS_LOG_ENABLED=False,
+    METRICS_ENABLED=False,
+)
+def check_views(user, views=VIEWS, min_rows=1000):
+    """请求每个视图并检查其查询计划，返回 [{view, params, queries: [...]}, ...]"""
+    tables = set(connection.introspection.table_names())
+    row_counts = {}
+    client = Client()
+    client.force_login(user)
+    report = []
+    with override_settings(TEMPLATES=page_templates()):
+        for name, params in views:
+            url = reverse(name)
+            # 请求中的写操作（访问计数、日志）全部回滚
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as context:
+                    client.get(url, params)
+                selects = [query['sql'] for query in context.captured_queries
+                           if query['sql'].lstrip().upper().startswith('SELECT')]
+                queries, seen = [], set()
+                for sql in selects:
+                    key = normalize(sql)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    try:
+                        plan, scans, sort = explain(sql)
+                    except DatabaseError:
+                        # 视图中执行失败后被捕获的查询（如没有统计信息表）
+                        continue
+                    full_scans = []
+                    for table in resolve_tables(sql, scans, tables):
+                        if table not in row_counts:
+                            row_counts[table] = table_rows(table)
+                        if row_counts[table] >= min_rows:
+                            full_scans.append({'table': table, 'rows': row_counts[table]})
+                    queries.append({'sql': sql, 'plan': plan, 'full_scans': full_scans, 'sort': sort})
+                transaction.set_rollback(True)
+            report.append({'view': name, 'params': params, 'queries': queries})
+    return report
@@ -0,0 +1,412 @@
+"""
+上传/下载接口压测
+
+启动服务（gunicorn 或 runserver），用多个线程模拟已登录用户，按比例并发调用：
+
+    upload_data_model      POST /api/data-models/
+    download_data_model    POST /api/data-models/<id>/download/，再下载返回的第一个文件
+    video_upload           POST /videos/upload/
+    video_download         GET  /videos/<id>/download/
+
+上传的文件按指定大小合成，每个文件开头写入随机标识，内容各不相同，不会被按哈希去重。
+统计每种操作的吞吐量、p50/p95/p99 延迟，以及每个服务进程的峰值 RSS（/proc/<pid>/status 的 VmHWM），
+结果写成 JSON，便于比较不同提交。
+"""
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+
+from django.urls import reverse
+
+OPERATIONS = ('upload_data_model', 'download_data_model', 'video_upload', 'video_download')
+BLOCK_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+SIZE_RE = re.compile(r'^(\d+(?:\.\d+)?)([KMG]?)B?$', re.IGNORECASE)
+UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(value):
+    """'512K' / '16M' / '1G' / '1000' -> 字节数"""
+    match = SIZE_RE.match(value.strip())
+    if not match:
+        raise ValueError(f'无法解析的文件大小: {value}')
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def parse_mix(value):
+    """'upload_data_model=1,video_download=3' -> {操作: 权重}"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'未知的操作: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, fraction):
+    """已排序列表的百分位数（最近秩法）"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class SyntheticFile:
+    """指定大小的合成文件：随机标识 + 重复的随机数据块，按块生成，不占用等量内存"""
+
+    block = os.urandom(BLOCK_SIZE)
+
+    def __init__(self, size):
+        self.size = size
+        self.marker = uuid.uuid4().hex.encode()
+
+    def chunks(self):
+        head = self.marker[:self.size]
+        yield head
+        remaining = self.size - len(head)
+        while remaining > 0:
+            chunk = self.block[:min(remaining, BLOCK_SIZE)]
+            yield chunk
+            remaining -= len(chunk)
+
+
+def multipart(fields, files):
+    """multipart/form-data 请求体：返回 (Content-Type, 长度, 分块迭代器)"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append((
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode(), None
+        ))
+    for name, filename, content_type, synthetic in files:
+        parts.append((
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode(), synthetic
+        ))
+    closing = f'--{boundary}--\r\n'.encode()
+    length = len(closing) + sum(len(head) + (synthetic.size + 2 if synthetic else 0) for head, synthetic in parts)
+
+    def body():
+        for head, synthetic in parts:
+            yield head
+            if synthetic:
+                yield from synthetic.chunks()
+                yield b'\r\n'
+        yield closing
+
+    return f'multipart/form-data; boundary={boundary}', length, body()
+
+
+class Client:
+    """一个已登录用户（独立的 Cookie 和 CSRF token）"""
+
+    def __init__(self, base_url, username, password, timeout=300):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+        self.login(username, password)
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, method, path, data=None, headers=None, length=None):
+        """发送请求，返回 (状态码, 响应体字节数, JSON 或 None)；响应体按块读取后丢弃"""
+        headers = dict(headers or {}, Accept='application/json')
+        if method != 'GET':
+            headers['X-CSRFToken'] = self.csrf_token()
+        if length is not None:
+            headers['Content-Length'] = str(length)
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            response = self.opener.open(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            response = e
+        with response:
+            is_json = 'json' in (response.headers.get('Content-Type') or '')
+            size, body = 0, []
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if is_json:
+                    body.append(chunk)
+            payload = json.loads(b''.join(body)) if is_json and body else None
+            return response.status, size, payload
+
+    def login(self, username, password):
+        self.request('GET', reverse('accounts:login'))
+        data = urllib.parse.urlencode({
+            'username': username, 'password': password, 'csrfmiddlewaretoken': self.csrf_token(),
+        }).encode()
+        self.request('POST', reverse('accounts:login'), data, {'Content-Type': 'application/x-www-form-urlencoded'})
+        if not any(cookie.name == 'sessionid' for cookie in self.cookies):
+            raise RuntimeError(f'登录失败: {username}')
+
+    def upload(self, path, fields, files):
+        content_type, length, body = multipart(fields, files)
+        return self.request('POST', path, body, {'Content-Type': content_type}, length)
+
+
+def failure(status, payload):
+    """失败原因：状态码和响应中的错误信息"""
+    payload = payload or {}
+    return f'HTTP {status}: {payload.get("message") or payload.get("error") or ""}'.rstrip(': ')
+
+
+class Workload:
+    """各操作的实现，返回 (传输字节数, 失败原因或 None)；上传成功的对象 ID 供下载操作随机选取"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.model_ids = []
+        self.video_ids = []
+
+    def remember(self, ids, payload):
+        object_id = ((payload or {}).get('data') or {}).get('id')
+        if object_id:
+            with self.lock:
+                ids.append(object_id)
+
+    def upload_data_model(self, client, size):
+        synthetic = SyntheticFile(size)
+        status, _, payload = client.upload(reverse('accounts:upload_data_model'), {
+            'name': f'压测模型-{synthetic.marker.decode()[:8]}', 'source': 'internal',
+            'infringement_risk': 'no', 'model_level': 'normal',
+        }, [('media_files', 'loadtest.jpg', 'image/jpeg', synthetic)])
+        if status != 202 or not (payload or {}).get('success'):
+            return 0, failure(status, payload)
+        self.remember(self.model_ids, payload)
+        return size, None
+
+    def download_data_model(self, client, size):
+        if not self.model_ids:
+            return 0, '没有可下载的数据模型'
+        model_id = random.choice(self.model_ids)
+        status, _, payload = client.request('POST', reverse('accounts:download_data_model', args=[model_id]))
+        downloads = (payload or {}).get('downloads') or []
+        if status != 200 or not downloads:
+            return 0, failure(status, payload)
+        status, received, payload = client.request('GET', downloads[0]['url'])
+        if status != 200:
+            return 0, failure(status, payload)
+        return received, None
+
+    def video_upload(self, client, size):
+        synthetic = SyntheticFile(size)
+        status, _, payload = client.upload(reverse('videos:video_upload'), {
+            'title': f'压测视频-{synthetic.marker.decode()[:8]}', 'security_level': 1,
+        }, [('file', 'loadtest.mp4', 'video/mp4', synthetic)])
+        if status != 202 or not (payload or {}).get('success'):
+            return 0, failure(status, payload)
+        self.remember(self.video_ids, payload)
+        return size, None
+
+    def video_download(self, client, size):
+        if not self.video_ids:
+            return 0, '没有可下载的视频'
+        video_id = random.choice(self.video_ids)
+        status, received, payload = client.request('GET', reverse('videos:video_download', args=[video_id]))
+        if status != 200:
+            return 0, failure(status, payload)
+        return received, None
+
+
+class RSSSampler(threading.Thread):
+    """定期读取服务主进程及其子进程的 RSS，记录每个进程的峰值"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def children(pid):
+        try:
+            with open(f'/proc/{pid}/task/{pid}/children') as f:
+                return [int(child) for child in f.read().split()]
+        except OSError:
+            return []
+
+    @staticmethod
+    def peak_rss(pid):
+        """进程的峰值 RSS（字节），进程已退出时返回 None"""
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def sample(self):
+        for pid in [self.pid] + self.children(self.pid):
+            rss = self.peak_rss(pid)
+            if rss is not None:
+                self.peaks[pid] = max(self.peaks.get(pid, 0), rss)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.sample()
+        return [
+            {'pid': pid, 'role': 'master' if pid == self.pid else 'worker', 'peak_rss_mb': round(rss / 1024 ** 2, 1)}
+            for pid, rss in sorted(self.peaks.items())
+        ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, settings_module, workers, port, log_path):
+    """启动被测服务，输出写入 log_path，返回 Popen"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    if server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'mysite.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+            '--timeout', '300', '--preload', '--log-level', 'warning',
+        ]
+    else:
+        command = [
+            sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}',
+            '--noreload', '--settings', settings_module,
+        ]
+    with open(log_path, 'ab') as log:
+        process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_for_server(process, f'http://127.0.0.1:{port}{reverse("accounts:login")}')
+    except RuntimeError:
+        process.terminate()
+        process.wait()
+        raise
+    return process
+
+
+def wait_for_server(process, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'服务启动失败（退出码 {process.returncode}）')
+        try:
+            urllib.request.urlopen(url, timeout=2).close()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'等待服务启动超时: {url}')
+
+
+def summarize(samples, elapsed):
+    """[(延迟秒, 失败原因, 字节数), ...] -> 统计结果（延迟只统计成功的请求）"""
+    latencies = sorted(latency * 1000 for latency, error, _ in samples if error is None)
+    transferred = sum(size for _, error, size in samples if error is None)
+    errors = Counter(error for _, error, _ in samples if error is not None)
+    ms = lambda value: round(value, 2) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(samples),
+        'errors': sum(errors.values()),
+        'error_reasons': dict(errors.most_common(5)),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0,
+        'throughput_mb_s': round(transferred / 1024 ** 2 / elapsed, 2) if elapsed else 0,
+        'bytes': transferred,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 0.50)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1] if latencies else None),
+            'mean': ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+    }
+
+
+def run(base_url, username, password, mix, sizes, concurrency, duration, warmup=1):
+    """
+    并发压测 duration 秒，返回 {操作: 统计结果}
+
+    开始计时前每个线程先各上传 warmup 个数据模型和视频，保证下载操作有可选的对象。
+    """
+    workload = Workload()
+    operations, weights = zip(*mix.items())
+    results = {name: [] for name in operations}
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    stop = threading.Event()
+    errors = []
+
+    def worker(index):
+        rng = random.Random(index)
+        try:
+            client = Client(base_url, username, password)
+            for _ in range(warmup):
+                workload.upload_data_model(client, sizes[0])
+                workload.video_upload(client, sizes[0])
+        except Exception as e:
+            errors.append(e)
+            ready.abort()
+            return
+        ready.wait()
+        while not stop.is_set():
+            name = rng.choices(operations, weights)[0]
+            size = rng.choice(sizes)
+            start = time.perf_counter()
+            try:
+                transferred, error = getattr(workload, name)(client, size)
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                transferred, error = 0, f'{type(e).__name__}: {e}'
+            elapsed = time.perf_counter() - start
+            with lock:
+                results[name].append((elapsed, error, transferred))
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        raise RuntimeError(f'压测准备失败: {errors[0] if errors else "未知错误"}')
+    start = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    summary = {name: summarize(samples, elapsed) for name, samples in results.items()}
+    summary['total'] = summarize([sample for samples in results.values() for sample in samples], elapsed)
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,310 @@
+"""
+请求指标
+
+MetricsMiddleware 按 URL 名称统计：
+- 请求耗时直方图（http_request_duration_seconds）和请求数（按状态码）
+- 数据库查询次数和查询耗时（connection.execute_wrapper）
+- 请求体 / 响应体字节数（取 Content-Length，不读取请求体）；X-Accel-Redirect 响应取文件发送后端记录的
+  文件大小（response.sendfile_size，Range 请求为范围长度的近似值）；没有 Content-Length 的流式响应
+  （如日志导出）在发送完成后累加实际字节数
+
+每个进程在内存中累加，每隔 METRICS_FLUSH_INTERVAL 秒（请求结束时检查）把快照写入
+METRICS_DIR/<pid>-<启动时间>.json。/metrics 合并所有进程的快照，以 Prometheus 文本格式输出；
+已退出进程的快照并入 archive.json，gunicorn 重启工作进程后计数器不会回退。
+"""
+import bisect
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+ARCHIVE = 'archive.json'
+LOCK = '.lock'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+COUNTERS = {
+    'http_requests_total': '请求数',
+    'db_queries_total': '数据库查询次数',
+    'db_query_duration_seconds_total': '数据库查询耗时（秒）',
+    'http_request_bytes_total': '请求体字节数',
+    'http_response_bytes_total': '响应体字节数',
+}
+
+
+class Registry:
+    """进程内的指标（线程安全）"""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{int(time.time())}.json'
+        self.lock = threading.Lock()
+        self.buckets = settings.METRICS_LATENCY_BUCKETS
+        # (view, method) -> [各区间计数..., 超出最大区间的计数, 耗时总和]
+        self.histograms = {}
+        # (指标名, view, method, status) -> 值
+        self.counters = {}
+        self.last_dump = time.monotonic()
+
+    def observe(self, view, method, status, seconds, queries, query_seconds, request_bytes, response_bytes):
+        if self.pid != os.getpid():
+            # preload_app 时 master 进程 fork 出 worker
+            self._reset()
+        index = bisect.bisect_left(self.buckets, seconds)
+        counters = self.counters
+        with self.lock:
+            histogram = self.histograms.get((view, method))
+            if histogram is None:
+                histogram = self.histograms[(view, method)] = [0] * (len(self.buckets) + 2)
+            histogram[index] += 1
+            histogram[-1] += seconds
+            for key, value in (
+                (('http_requests_total', view, method, status), 1),
+                (('db_queries_total', view, method, ''), queries),
+                (('db_query_duration_seconds_total', view, method, ''), query_seconds),
+                (('http_request_bytes_total', view, method, ''), request_bytes),
+                (('http_response_bytes_total', view, method, ''), response_bytes),
+            ):
+                counters[key] = counters.get(key, 0) + value
+
+    def add(self, key, value):
+        """累加一个计数器（响应发送完成后才知道的字节数）"""
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': [[*key, list(values)] for key, values in self.histograms.items()],
+                'counters': [[*key, value] for key, value in self.counters.items()],
+            }
+
+    def dump_if_due(self):
+        if time.monotonic() - self.last_dump >= settings.METRICS_FLUSH_INTERVAL:
+            self.dump()
+
+    def dump(self):
+        """写入本进程的快照文件"""
+        self.last_dump = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_json(os.path.join(settings.METRICS_DIR, self.name), self.snapshot())
+
+
+registry = Registry()
+
+
+def write_json(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def merge(total, snapshot):
+    """把快照累加到 total（两者格式相同）"""
+    histograms = {tuple(item[:2]): item[2] for item in total['histograms']}
+    for view, method, values in snapshot['histograms']:
+        current = histograms.get((view, method))
+        if current is None or len(current) != len(values):
+            histograms[(view, method)] = list(values)
+        else:
+            histograms[(view, method)] = [a + b for a, b in zip(current, values)]
+    counters = {tuple(item[:4]): item[4] for item in total['counters']}
+    for *key, value in snapshot['counters']:
+        counters[tuple(key)] = counters.get(tuple(key), 0) + value
+    return {
+        'histograms': [[*key, values] for key, values in histograms.items()],
+        'counters': [[*key, value] for key, value in counters.items()],
+    }
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """合并所有进程的快照，已退出进程的快照并入归档"""
+    registry.dump()
+    directory = settings.METRICS_DIR
+    empty = {'histograms': [], 'counters': []}
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_path = os.path.join(directory, ARCHIVE)
+        archive = read_json(archive_path) or empty
+        live, dead = [], []
+        for name in os.listdir(directory):
+            if not name.endswith('.json') or name == ARCHIVE:
+                continue
+            snapshot = read_json(os.path.join(directory, name))
+            if snapshot is None:
+                continue
+            if process_alive(int(name.split('-')[0])):
+                live.append(snapshot)
+            else:
+                archive = merge(archive, snapshot)
+                dead.append(name)
+        if dead:
+            write_json(archive_path, archive)
+            for name in dead:
+                os.remove(os.path.join(directory, name))
+    total = archive
+    for snapshot in live:
+        total = merge(total, snapshot)
+    return total
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(data):
+    """Prometheus 文本格式"""
+    lines = [
+        '# HELP http_request_duration_seconds 请求耗时（秒）',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    bounds = [str(b) for b in settings.METRICS_LATENCY_BUCKETS] + ['+Inf']
+    for view, method, values in sorted(data['histograms']):
+        labels = f'view="{escape(view)}",method="{method}"'
+        cumulative = 0
+        for bound, count in zip(bounds, values[:-1]):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {values[-1]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+    counters = sorted(data['counters'])
+    for name, description in COUNTERS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for metric, view, method, status, value in counters:
+            if metric != name:
+                continue
+            labels = f'view="{escape(view)}",method="{method}"'
+            if status:
+                labels += f',status="{status}"'
+            lines.append(f'{name}{{{labels}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus 抓取接口，只允许 METRICS_ALLOWED_IPS 或超级用户访问"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_superuser:
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def content_length(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def response_size(response):
+    """响应体字节数，流式响应且没有 Content-Length 时返回 None"""
+    if response.has_header('X-Accel-Redirect'):
+        # 文件由 nginx 发送，响应本身没有响应体
+        return getattr(response, 'sendfile_size', 0)
+    if response.has_header('Content-Length'):
+        return content_length(response['Content-Length'])
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def count_streamed(content, key):
+    """流式响应发送完成（或客户端断开）后累加实际发送的字节数"""
+    sent = 0
+    try:
+        for chunk in content:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        registry.add(key, sent)
+
+
+class QueryTimer:
+    """execute_wrapper：累计本请求的查询次数和耗时"""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """统计请求指标，应放在 MIDDLEWARE 靠前的位置以包含其他中间件的耗时"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.exclude_prefixes = tuple(settings.METRICS_EXCLUDE_PREFIXES)
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED or request.path.startswith(self.exclude_prefixes):
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        # 与 connection.execute_wrapper() 相同，省去上下文管理器的开销
+        wrappers = connection.execute_wrappers
+        wrappers.append(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            wrappers.remove(timer)
+
+        # 标签取值有限：未匹配的路径归为 unmatched，非常见方法归为 OTHER
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        method = request.method if request.method in METHODS else 'OTHER'
+        response_bytes = response_size(response)
+        if response_bytes is None:
+            response.streaming_content = count_streamed(
+                response.streaming_content, ('http_response_bytes_total', view, method, '')
+            )
+        registry.observe(
+            view,
+            method,
+            str(response.status_code),
+            elapsed,
+            timer.count,
+            timer.seconds,
+            content_length(request.META.get('CONTENT_LENGTH')),
+            response_bytes or 0,
+        )
+        registry.dump_if_due()
+        return response
@@ -0,0 +1,258 @@
+"""
+游标分页（keyset pagination）
+
+Paginator 每页都要 COUNT(*) 全部结果，并用 OFFSET 跳过前面的行，页码越大越慢。
+CursorPaginator 按 (时间, id) 排序，游标记录上一页最后一行的排序值，下一页用
+WHERE (时间, id) < (游标值) 查询，配合对应的联合索引，任意一页的开销都与第一页相同。
+
+总数可选：
+- 'exact'：COUNT(*)
+- 'approximate'：未筛选时读取表统计信息（MySQL information_schema / PostgreSQL pg_class /
+  SQLite sqlite_stat1），筛选后最多统计 COUNT_LIMIT 行
+- None：不统计
+
+    page = paginate(request, logs, 50, ordering=('-operation_time', '-id'), count='approximate')
+    page.object_list / page.next_url / page.previous_url / page.paginator.count_display
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from functools import reduce
+from operator import or_
+
+from django.db import DatabaseError, connections
+from django.db.models import Q
+
+COUNT_LIMIT = 10000
+CURSOR_PARAM = 'cursor'
+
+
+def encode_value(value):
+    # DjangoJSONEncoder 会把微秒截断为毫秒，游标需要精确到微秒
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values, previous=False):
+    data = json.dumps({'v': [encode_value(value) for value in values], 'p': previous}, default=str)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """游标 -> (排序值列表, 是否向前翻页)；无效游标返回 (None, False)"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return list(data['v']), bool(data['p'])
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None, False
+
+
+def table_row_estimate(model, using):
+    """从数据库统计信息读取表的大致行数，不支持或没有统计信息时返回 None"""
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'mysql': ('SELECT TABLE_ROWS FROM information_schema.TABLES '
+                  'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'),
+        'postgresql': 'SELECT reltuples FROM pg_class WHERE relname = %s',
+        'sqlite': 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL',
+    }
+    sql = queries.get(connection.vendor)
+    if sql is None:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # SQLite 未执行过 ANALYZE 时没有 sqlite_stat1 表
+        return None
+    if row is None or row[0] is None:
+        return None
+    # sqlite_stat1.stat 形如 "行数 ..."；PostgreSQL 从未分析的表 reltuples 为 -1
+    estimate = int(float(str(row[0]).split()[0]))
+    return estimate if estimate >= 0 else None
+
+
+class CursorPaginator:
+    """按 ordering（如 ('-operation_time', '-id')）做游标分页，ordering 最后一项需唯一"""
+
+    def __init__(self, queryset, per_page, ordering, count='exact'):
+        if count not in ('exact', 'approximate', None):
+            raise ValueError(f'无效的统计方式：{count}')
+        self.model = queryset.model
+        self.ordering = list(ordering)
+        pk = self.model._meta.pk.attname
+        if self.ordering[-1].lstrip('-') not in (pk, 'pk'):
+            self.ordering.append(('-' if self.ordering[-1].startswith('-') else '') + pk)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        for name in self.fields:
+            if '__' in name:
+                raise ValueError(f'游标分页不支持关联字段排序：{name}')
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = int(per_page)
+        self.count_mode = count
+        self.count_is_estimate = False
+
+    def key(self, obj):
+        # values() 查询集的行是字典
+        if isinstance(obj, dict):
+            return [obj[name] for name in self.fields]
+        return [getattr(obj, 'pk' if name == 'pk' else name) for name in self.fields]
+
+    def parse_values(self, values):
+        if values is None or len(values) != len(self.fields):
+            return None
+        try:
+            return [
+                self.model._meta.pk.to_python(value) if name == 'pk' else self.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception:
+            return None
+
+    def after(self, values, descending):
+        """
+        排在 values 之后的行：(a, b) < (x, y) 展开为 a <= x AND (a < x OR (a = x AND b < y))
+
+        单独的 a <= x 条件让数据库在索引上直接定位到游标位置，而不是从头扫描再逐行判断 OR 条件。
+        """
+        conditions = []
+        for i, name in enumerate(self.fields):
+            lookup = 'lt' if descending[i] else 'gt'
+            equal = {self.fields[j]: values[j] for j in range(i)}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+        bound = Q(**{f'{self.fields[0]}__{"lte" if descending[0] else "gte"}': values[0]})
+        return bound & reduce(or_, conditions)
+
+    def page(self, cursor=None):
+        """返回游标对应的一页；游标为空或无效时返回第一页"""
+        values, previous = decode_cursor(cursor) if cursor else (None, False)
+        values = self.parse_values(values)
+        descending = [name.startswith('-') for name in self.ordering]
+
+        queryset = self.queryset
+        if values is not None and previous:
+            # 向前翻页：反转排序取游标之前的行，再按原顺序排列
+            reverse_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            queryset = queryset.order_by(*reverse_ordering).filter(
+                self.after(values, [not flag for flag in descending])
+            )
+        elif values is not None:
+            queryset = queryset.filter(self.after(values, descending))
+
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if values is not None and previous:
+            rows.reverse()
+            has_previous, has_next = more, True
+        else:
+            has_previous, has_next = values is not None, more
+        return CursorPage(rows, self, has_next and bool(rows), has_previous and bool(rows))
+
+    def iterate(self):
+        """按顺序逐批（每批 per_page 行）读取全部结果，每批都是一次索引范围查询，内存占用与总行数无关"""
+        descending = [name.startswith('-') for name in self.ordering]
+        queryset = self.queryset
+        while True:
+            rows = list(queryset[:self.per_page])
+            yield from rows
+            if len(rows) < self.per_page:
+                return
+            queryset = self.queryset.filter(self.after(self.key(rows[-1]), descending))
+
+    def count_rows(self):
+        if self.count_mode is None:
+            return None
+        queryset = self.queryset.order_by()
+        if self.count_mode == 'approximate':
+            if not queryset.query.where:
+                estimate = table_row_estimate(self.model, queryset.db)
+                if estimate is not None:
+                    self.count_is_estimate = True
+                    return estimate
+            # LIMIT 子查询计数，最多扫描 COUNT_LIMIT + 1 行
+            count = queryset[:COUNT_LIMIT + 1].count()
+            if count > COUNT_LIMIT:
+                self.count_is_estimate = True
+                return COUNT_LIMIT
+            return count
+        return queryset.count()
+
+    @property
+    def count(self):
+        if not hasattr(self, '_count'):
+            self._count = self.count_rows()
+        return self._count
+
+    @property
+    def count_display(self):
+        """总数的显示文本：精确值、"约 N"（表统计）或 "N+"（超过 COUNT_LIMIT）"""
+        count = self.count
+        if count is None:
+            return ''
+        if not self.count_is_estimate:
+            return str(count)
+        return f'{count}+' if count == COUNT_LIMIT else f'约 {count}'
+
+
+class CursorPage:
+    """游标分页的一页，可直接在模板中迭代"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_url = self.previous_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(self.paginator.key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(self.paginator.key(self.object_list[0]), previous=True)
+
+    def as_dict(self, serialize):
+        """JSON 接口的分页结果"""
+        return {
+            'data': [serialize(obj) for obj in self.object_list],
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+            'count': self.paginator.count,
+            'count_is_estimate': self.paginator.count_is_estimate,
+        }
+
+
+def paginate(request, queryset, per_page, ordering, param=CURSOR_PARAM, count='exact'):
+    """按请求中的游标参数分页，next_url / previous_url 保留其他查询参数"""
+    page = CursorPaginator(queryset, per_page, ordering, count=count).page(request.GET.get(param))
+    for attr, cursor in (('next_url', page.next_cursor), ('previous_url', page.previous_cursor)):
+        if cursor is not None:
+            query = request.GET.copy()
+            query[param] = cursor
+            setattr(page, attr, f'?{query.urlencode()}')
+    return page
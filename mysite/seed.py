@@ -0,0 +1,236 @@
+"""
+性能测试数据
+
+seed() 用 bulk_create 批量生成用户、标签、数据模型、上传/下载记录、视频、评论和各类日志，
+并创建一个拥有全部模块权限和视频权限的管理员用户。数据量默认较小，可通过参数或环境变量放大：
+
+    PERF_USERS / PERF_MODELS / PERF_LOGS（每类日志的条数）/ PERF_VIDEOS
+
+例如按生产量级运行性能测试：
+
+    PERF_MODELS=100000 PERF_LOGS=1000000 python manage.py test accounts videos audit permissions
+
+也可用 seed_perf_data 命令写入开发数据库，供压测使用。
+"""
+import io
+import os
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.utils import timezone
+
+DEFAULTS = {
+    'users': 20,
+    'models': 200,
+    'logs': 1000,
+    'videos': 100,
+}
+PASSWORD = 'perf-password'
+ADMIN_USERNAME = 'perf_admin'
+DAYS = 90
+
+# 与 permissions.views.init_permissions 一致
+PERMISSIONS = [
+    ('video:upload', '上传视频', '视频管理'),
+    ('video:view', '观看视频', '视频管理'),
+    ('video:download', '下载视频', '视频管理'),
+    ('video:edit', '编辑视频', '视频管理'),
+    ('video:delete', '删除视频', '视频管理'),
+    ('video:manage', '视频管理', '视频管理'),
+    ('user:manage', '用户管理', '用户管理'),
+    ('role:manage', '角色管理', '角色管理'),
+    ('log:view', '查看日志', '系统管理'),
+    ('log:export', '导出日志', '系统管理'),
+]
+
+
+def volume(name, value=None):
+    """数据量：参数优先，其次环境变量 PERF_<NAME>，最后使用默认值"""
+    if value is not None:
+        return value
+    return int(os.environ.get(f'PERF_{name.upper()}', DEFAULTS[name]))
+
+
+def bulk_create(model, objects, batch_size):
+    """分批写入生成器产生的对象，避免一次性在内存中构造全部对象"""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+def media_file(index):
+    """数据模型的媒体文件信息（与上传接口保存的结构一致）"""
+    return {
+        'name': f'perf_{index}.jpg',
+        'path': f'models/perf_{index}.jpg',
+        'size': 204800,
+        'type': 'image',
+        'thumbnails': [
+            {'width': 320, 'jpeg': f'thumbnails/perf_{index}_320.jpg', 'webp': f'thumbnails/perf_{index}_320.webp'},
+        ],
+    }
+
+
+def create_admin(password):
+    """拥有全部模块权限、全部视频权限和最高安全级别的用户"""
+    from accounts.models import PermissionGroup, User, UserPermission
+    from permissions.models import Permission, Role, RolePermission, UserProfile
+
+    admin = User.objects.create_user(ADMIN_USERNAME, f'{ADMIN_USERNAME}@example.com', password,
+                                     display_name='性能测试管理员')
+    group = PermissionGroup.objects.create(
+        name='性能测试', can_view_dashboard=True, can_view_my_data=True,
+        can_view_data_management=True, can_view_system_settings=True,
+    )
+    UserPermission.objects.create(user=admin, permission_group=group)
+
+    permissions = [
+        Permission.objects.get_or_create(codename=codename, defaults={'name': name, 'module': module})[0]
+        for codename, name, module in PERMISSIONS
+    ]
+    role = Role.objects.create(name='性能测试', max_security_level=4)
+    RolePermission.objects.bulk_create([RolePermission(role=role, permission=p) for p in permissions])
+    UserProfile.objects.create(user=admin, role=role)
+    return admin
+
+
+def seed(users=None, models=None, logs=None, videos=None, batch_size=5000, stdout=None):
+    """生成性能测试数据，返回管理员用户"""
+    from accounts.models import DataModel, DownloadLog, LocationTag, ProjectTag, UploadLog, User
+    from audit.models import AccessLog, OperationLog, SystemLog
+    from videos.models import Category, Video, VideoComment
+
+    users, models, logs, videos = (
+        volume('users', users), volume('models', models), volume('logs', logs), volume('videos', videos)
+    )
+    rng = random.Random(0)
+    now = timezone.now()
+    password = make_password(PASSWORD)
+
+    def progress(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    def earlier(index, total):
+        # 按序号均匀分布在最近 DAYS 天内，序号越大越新
+        return now - timedelta(seconds=(total - index) * DAYS * 86400 // max(total, 1))
+
+    admin = create_admin(PASSWORD)
+    bulk_create(User, (
+        User(username=f'perf_user_{i}', email=f'perf_user_{i}@example.com', password=password,
+             display_name=f'测试用户{i}', created_by=admin)
+        for i in range(users)
+    ), batch_size)
+    user_ids = [admin.id] + list(User.objects.filter(username__startswith='perf_user_').values_list('id', flat=True))
+
+    def pick_user(index):
+        # 四分之一的记录属于管理员，保证“我的数据”等按用户分页的页面有足够数据
+        return admin.id if index % 4 == 0 else rng.choice(user_ids)
+
+    project_tags = ProjectTag.objects.bulk_create([ProjectTag(name=f'测试项目{i}') for i in range(20)])
+    location_tags = LocationTag.objects.bulk_create([LocationTag(name=f'测试地点{i}') for i in range(20)])
+    project_ids = [tag.id for tag in ProjectTag.objects.filter(name__startswith='测试项目')]
+    location_ids = [tag.id for tag in LocationTag.objects.filter(name__startswith='测试地点')]
+    progress(f'用户 {users + 1}，标签 {len(project_tags) + len(location_tags)}')
+
+    bulk_create(DataModel, (
+        DataModel(
+            name=f'测试模型{i}',
+            source=rng.choice(['internal', 'external']),
+            project_tag_id=rng.choice(project_ids),
+            location_tag_id=rng.choice(location_ids),
+            infringement_risk=rng.choice(['no', 'yes']),
+            model_level=rng.choice(['confidential', 'important', 'normal']),
+            description=f'性能测试数据 {i}',
+            media_files=[media_file(i)],
+            created_by_id=pick_user(i),
+        )
+        for i in range(models)
+    ), batch_size)
+    model_ids = list(DataModel.objects.values_list('id', flat=True))
+    progress(f'数据模型 {models}')
+
+    for log_model in (UploadLog, DownloadLog):
+        bulk_create(log_model, (
+            log_model(
+                user_id=pick_user(i),
+                filename=f'perf_{i}.jpg',
+                file_size=rng.randint(1024, 50 * 1024 * 1024),
+                status='success' if i % 20 else 'failed',
+                source_model_id=rng.choice(model_ids) if model_ids else None,
+            )
+            for i in range(logs)
+        ), batch_size)
+        progress(f'{log_model._meta.verbose_name} {logs}')
+
+    categories = Category.objects.bulk_create([Category(name=f'测试分类{i}') for i in range(5)])
+    category_ids = list(Category.objects.filter(name__startswith='测试分类').values_list('id', flat=True))
+    bulk_create(Video, (
+        Video(
+            title=f'测试视频{i}',
+            tags='测试,性能',
+            file=f'videos/perf_{i}.mp4',
+            file_type='video',
+            file_size=rng.randint(1024 * 1024, 1024 * 1024 * 1024),
+            file_extension='mp4',
+            md5_hash=f'{i:032x}',
+            resolution='1920x1080',
+            codec='h264',
+            category_id=rng.choice(category_ids),
+            security_level=rng.randint(1, 4),
+            uploader_id=pick_user(i),
+        )
+        for i in range(videos)
+    ), batch_size)
+    video = Video.objects.order_by('id').first()
+    if video is not None:
+        VideoComment.objects.bulk_create([
+            VideoComment(video=video, user_id=rng.choice(user_ids), content=f'测试评论{i}') for i in range(20)
+        ])
+    progress(f'视频 {videos}，分类 {len(categories)}')
+
+    operation_types = [choice for choice, _ in OperationLog.OPERATION_TYPE_CHOICES]
+    bulk_create(OperationLog, (
+        OperationLog(
+            user_id=pick_user(i),
+            operation_type=rng.choice(operation_types),
+            operation_time=earlier(i, logs),
+            result='success' if i % 10 else rng.choice(['failed', 'denied']),
+            description=f'性能测试操作 {i}',
+            ip_address='127.0.0.1',
+            security_level=rng.randint(1, 4),
+        )
+        for i in range(logs)
+    ), batch_size)
+    bulk_create(AccessLog, (
+        AccessLog(
+            user_id=pick_user(i),
+            path=f'/videos/{i % max(videos, 1) + 1}/',
+            method='GET' if i % 5 else 'POST',
+            status_code=200 if i % 50 else 500,
+            response_time=rng.uniform(5, 500),
+            ip_address='127.0.0.1',
+            accessed_at=earlier(i, logs),
+        )
+        for i in range(logs)
+    ), batch_size)
+    bulk_create(SystemLog, (
+        SystemLog(
+            level=rng.choice(['DEBUG', 'INFO', 'WARNING', 'ERROR']),
+            module=rng.choice(['accounts', 'videos', 'audit', 'jobs']),
+            message=f'性能测试日志 {i}',
+        )
+        for i in range(logs)
+    ), batch_size)
+    progress(f'操作/访问/系统日志各 {logs}')
+
+    # 批量写入不触发信号，重建每日汇总
+    call_command('rebuild_activity_rollup', batch_size=batch_size, stdout=stdout or io.StringIO())
+    return admin
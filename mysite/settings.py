@@ -44,9 +44,12 @@ INSTALLED_APPS = [
     'videos',
     'permissions',
     'audit',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'mysite.metrics.MetricsMiddleware',
+    'audit.middleware.AccessLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -139,6 +142,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # 自定义用户模型
 AUTH_USER_MODEL = 'accounts.User'
 
+# 缓存配置（本地内存缓存仅适用于单进程开发环境，多进程部署请使用共享缓存）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mysite',
+    }
+}
+
+# 权限快照缓存时间（秒），权限变更时会主动失效
+PERMISSION_CACHE_TIMEOUT = 300
+
 
 import os
 from pathlib import Path
@@ -155,12 +169,95 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 受保护文件发送（视图做权限检查，文件由后端发送）
+# 开发环境由 Django 流式返回；生产环境使用 nginx X-Accel-Redirect
+SENDFILE_BACKEND = 'videos.sendfile.LocalBackend'
+SENDFILE_ROOT = MEDIA_ROOT
+SENDFILE_URL = '/protected/'
+
 # 文件上传设置
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880000  # 5GB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760000  # 10GB
 MAX_FILE_SIZE = 5 * 1024 * 1024 * 1024  # 5GB
 FILE_UPLOAD_PERMISSIONS = 0o644
 
+# 分块上传（断点续传）
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 默认分块 8MB
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024  # 单块最大 64MB
+UPLOAD_STAGING_DIR = os.path.join(BASE_DIR, 'upload_staging')  # 不在 MEDIA_ROOT 下，避免被直接访问
+UPLOAD_INCOMING_DIR = os.path.join(UPLOAD_STAGING_DIR, 'incoming')  # 接收中的上传文件，需与 MEDIA_ROOT 在同一文件系统
+CHUNKED_UPLOAD_EXPIRE_HOURS = 24  # 未完成的上传会话保留时间
+
+# 缩略图与视频封面
+THUMBNAIL_WIDTHS = [320, 640]  # 列表页卡片使用的缩略图宽度
+THUMBNAIL_WEBP = True  # 同时生成 WebP（JPEG 始终生成）
+THUMBNAIL_QUALITY = 80
+MEDIA_CACHE_SECONDS = 86400  # 缩略图、封面等按内容命名的文件的浏览器缓存时间（秒）
+POSTER_MAX_WIDTH = 1280
+FFMPEG_BINARY = 'ffmpeg'
+FFPROBE_BINARY = 'ffprobe'  # 未安装时只解析 MP4/MOV/MKV/WebM 文件头
+FFMPEG_TIMEOUT = 120  # 秒
+
+# 多码率版本（VideoVersion），只生成不高于原视频分辨率的档位
+RENDITION_LADDER = [
+    {'height': 1080, 'bitrate': 5000000},
+    {'height': 720, 'bitrate': 2800000},
+    {'height': 480, 'bitrate': 1400000},
+    {'height': 360, 'bitrate': 800000},
+]
+RENDITION_AUDIO_BITRATE = 128000
+RENDITION_PRESET = 'veryfast'  # x264 编码速度预设
+RENDITION_TIMEOUT = 4 * 3600  # 单个版本转码超时（秒）
+RENDITION_BANDWIDTH_FACTOR = 0.8  # 按带宽选择版本时只使用的带宽比例
+HLS_SEGMENT_SECONDS = 6  # HLS 分片时长（秒）
+HLS_CACHE_SECONDS = 86400  # 播放列表与分片的浏览器缓存时间（主播放列表每次重新验证）
+# hls.js 固定版本；从 CDN 加载时必须配置 SRI 摘要，未配置时不加载（非 Safari 浏览器播放 MP4）
+# 摘要计算：curl -s <HLS_JS_URL> | openssl dgst -sha384 -binary | openssl base64 -A
+# 也可下载到 static/ 下自行托管，HLS_JS_URL 改为 '/static/...'，此时不需要摘要
+HLS_JS_URL = 'https://cdn.jsdelivr.net/npm/hls.js@1.5.13/dist/hls.min.js'
+HLS_JS_INTEGRITY = ''  # 'sha384-...'，升级版本时同步更新
+
+# 后台任务
+JOBS_BACKEND = 'jobs.backends.LocalBackend'  # 进程内线程池执行，无需额外进程
+JOBS_LOCAL_WORKERS = 2  # LocalBackend 线程数，0 表示事务提交后同步执行
+JOBS_WORKER_PROCESSES = 2  # run_jobs 进程数
+JOBS_POLL_INTERVAL = 2  # run_jobs 轮询间隔（秒）
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_DELAY = 30  # 首次重试间隔（秒），之后每次翻倍
+JOBS_LOCK_TIMEOUT = 6 * 3600  # 执行超过该时间（秒）的任务视为执行进程已退出，需大于转码等最长任务的时间
+
+# 操作日志批量写入
+AUDIT_BUFFERED = True  # 关闭时每条操作日志都在请求中同步写入
+AUDIT_BATCH_SIZE = 100  # 缓冲条数达到该值时写入
+AUDIT_FLUSH_INTERVAL = 5  # 缓冲最长保留时间（秒）
+AUDIT_SYNC_OPERATIONS = ['delete', 'permission_change', 'login', 'logout']  # 安全相关操作同步写入
+AUDIT_SYNC_RESULTS = ['denied']
+AUDIT_EXPORT_BATCH_SIZE = 2000  # 日志导出每批读取的行数
+
+# 日志保留与归档（manage.py archive_logs / partition_logs）
+AUDIT_RETENTION_MONTHS = 6  # 数据库中保留最近几个月（含当月）的操作、访问、系统日志
+AUDIT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'logs')  # 更早的日志按月压缩归档到该目录
+AUDIT_PARTITION_MONTHS_AHEAD = 3  # MySQL 按月分区时提前创建的分区数
+
+# 日志统计页
+AUDIT_STATS_CACHE_TIMEOUT = 60  # 统计结果缓存时间（秒）
+AUDIT_STATS_SETTLE_SECONDS = 60  # 系统日志增量计数只统计该时间（秒）之前创建的记录
+AUDIT_STATS_REBUILD_INTERVAL = 24 * 3600  # 系统日志计数全量重算的间隔（秒）
+
+# 访问日志（与操作日志共用批量写入）
+ACCESS_LOG_ENABLED = True
+ACCESS_LOG_SAMPLE_RATE = 1.0  # 记录比例，0~1
+ACCESS_LOG_SLOW_MS = 1000  # 超过该响应时间（毫秒）的请求不受抽样限制
+ACCESS_LOG_EXCLUDE_PREFIXES = ['/static/', '/media/', '/favicon.ico', '/metrics']
+
+# 请求指标（/metrics，Prometheus 文本格式）
+METRICS_ENABLED = True
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')  # 各工作进程的指标快照
+METRICS_FLUSH_INTERVAL = 10  # 快照写入间隔（秒）
+METRICS_LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]  # 秒
+METRICS_EXCLUDE_PREFIXES = ['/static/', '/media/', '/metrics']
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # 另外允许超级用户访问
+
 # 支持的文件格式
 ALLOWED_VIDEO_EXTENSIONS = ['mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv']
 ALLOWED_IMAGE_EXTENSIONS = ['png', 'jpg', 'jpeg', 'bmp', 'gif']
@@ -196,5 +293,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'jobs': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
\ No newline at end of file
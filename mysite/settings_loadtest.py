@@ -0,0 +1,50 @@
+"""
+压测配置（manage.py loadtest --settings=mysite.settings_loadtest）
+
+在开发配置的基础上：
+- LOADTEST_DATABASE=sqlite（默认）使用 LOADTEST_DIR 下的 SQLite 数据库；=mysql 使用本机 MySQL 的
+  LOADTEST_MYSQL_DATABASE 库（默认 video_management_loadtest，需事先创建）
+- 媒体文件、上传暂存目录和指标快照都写入 LOADTEST_DIR（默认 /tmp/mysite-loadtest），不影响开发数据
+- 后台任务只入队不执行，压测结果只反映请求本身的开销
+"""
+from .settings import *  # noqa: F401,F403
+
+LOADTEST_DIR = os.environ.get('LOADTEST_DIR', '/tmp/mysite-loadtest')
+
+if os.environ.get('LOADTEST_DATABASE', 'sqlite') == 'mysql':
+    DATABASES['default']['NAME'] = os.environ.get('LOADTEST_MYSQL_DATABASE', 'video_management_loadtest')
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(LOADTEST_DIR, 'db.sqlite3'),
+            # 多个工作进程并发写入时等待锁，而不是立即报错
+            'OPTIONS': {'timeout': 30},
+        }
+    }
+
+MEDIA_ROOT = os.path.join(LOADTEST_DIR, 'media')
+SENDFILE_ROOT = MEDIA_ROOT
+UPLOAD_STAGING_DIR = os.path.join(LOADTEST_DIR, 'upload_staging')
+UPLOAD_INCOMING_DIR = os.path.join(UPLOAD_STAGING_DIR, 'incoming')
+METRICS_DIR = os.path.join(LOADTEST_DIR, 'metrics')
+
+JOBS_BACKEND = 'jobs.backends.DatabaseBackend'
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'level': 'WARNING',
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+    },
+}
@@ -0,0 +1,154 @@
+"""
+视图性能测试
+
+PerformanceTestCase 在 setUpTestData 中用 mysite.seed 生成测试数据，assertBudget() 请求视图并检查：
+- 查询次数不超过预算
+- 同一条 SQL（只有参数不同）执行超过 N_PLUS_ONE_THRESHOLD 次，视为 N+1 查询（如列表中逐条读取外键）
+- 耗时不超过上限（默认 PERF_LATENCY_MS 毫秒，可按视图指定）
+
+先请求一次预热缓存（权限快照、模板），再统计第二次请求。
+
+    python manage.py test accounts videos audit permissions
+"""
+import os
+import re
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .seed import seed
+
+N_PLUS_ONE_THRESHOLD = 3
+LATENCY_MS = float(os.environ.get('PERF_LATENCY_MS', 500))
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_RE = re.compile(r'\bIN \((?:\?, )*\?\)')
+
+# 尚未编写的页面模板：用只渲染列表的替代模板驱动视图，列出真实页面会访问的关联对象。
+# 模板目录中存在同名模板时优先使用真实模板。
+PAGE_TEMPLATES = {
+    'audit/operation_logs.html': (
+        '{% for log in page_obj %}{{ log.operation_time }} {{ log.user.username }} '
+        '{{ log.get_operation_type_display }} {{ log.content_type }} {{ log.description }}{% endfor %}'
+    ),
+    'audit/access_logs.html': (
+        '{% for log in page_obj %}{{ log.accessed_at }} {{ log.user.username }} {{ log.path }}{% endfor %}'
+    ),
+    'audit/system_logs.html': (
+        '{% for log in page_obj %}{{ log.created_at }} {{ log.module }} {{ log.message }}{% endfor %}'
+        '{% for module in modules %}{{ module }}{% endfor %}'
+    ),
+    'audit/log_statistics.html': (
+        '{% for row in operation_stats %}{{ row }}{% endfor %}{% for row in operation_type_stats %}{{ row }}{% endfor %}'
+        '{% for row in result_stats %}{{ row }}{% endfor %}{% for row in user_stats %}{{ row }}{% endfor %}'
+        '{% for row in system_level_stats %}{{ row }}{% endfor %}'
+    ),
+    'permissions/role_list.html': '{% for role in page_obj %}{{ role.name }} {{ role.max_security_level }}{% endfor %}',
+    'permissions/role_form.html': (
+        '{{ role.name }}{% for permission in permissions %}{{ permission.name }}'
+        '{% if permission.id in role_permissions %} checked{% endif %}{% endfor %}'
+    ),
+    'permissions/user_list.html': (
+        '{% for item in page_obj %}{{ item.username }} {{ item.userprofile.role.name }}{% endfor %}'
+    ),
+    'permissions/user_form.html': '{{ user.username }}{% for role in roles %}{{ role.name }}{% endfor %}',
+    'permissions/my_permissions.html': (
+        '{{ role.name }}{% for permission in permissions %}{{ permission.name }}{% endfor %}'
+    ),
+}
+
+
+def normalize(sql):
+    """去掉 SQL 中的参数，用于识别重复执行的同一条查询"""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return IN_RE.sub('IN (...)', sql)
+
+
+def repeated_queries(queries, threshold=N_PLUS_ONE_THRESHOLD):
+    """执行次数超过 threshold 的查询：[(SQL, 次数), ...]"""
+    counts = Counter(normalize(query['sql']) for query in queries)
+    return [(sql, count) for sql, count in counts.most_common() if count > threshold]
+
+
+def page_templates():
+    """模板加载器配置：先查找真实模板，找不到时使用 PAGE_TEMPLATES"""
+    from django.conf import settings
+
+    templates = []
+    for engine in settings.TEMPLATES:
+        engine = dict(engine, APP_DIRS=False)
+        options = dict(engine.get('OPTIONS', {}))
+        options['loaders'] = [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+            ('django.template.loaders.locmem.Loader', PAGE_TEMPLATES),
+        ]
+        engine['OPTIONS'] = options
+        templates.append(engine)
+    return templates
+
+
+@override_settings(
+    # 日志在请求中同步写入（计入查询预算），不启动后台写入线程
+    AUDIT_BUFFERED=False,
+    ACCESS_LOG_ENABLED=False,
+    METRICS_ENABLED=False,
+)
+class PerformanceTestCase(TestCase):
+    """视图查询预算和耗时测试的基类，self.admin 拥有全部权限"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._templates = override_settings(TEMPLATES=page_templates())
+        cls._templates.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._templates.disable()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = seed()
+
+    def setUp(self):
+        # 权限快照缓存以用户 ID 为键，各测试类的数据不同
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def request(self, method, url, data=None, **extra):
+        return getattr(self.client, method.lower())(url, data, **extra)
+
+    def assertBudget(self, url, queries, method='GET', data=None, status=200, max_ms=None, **extra):
+        """请求视图，检查状态码、查询次数、N+1 查询和耗时，返回响应"""
+        if method == 'GET':
+            self.request(method, url, data, **extra)
+
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = self.request(method, url, data, **extra)
+            elapsed = (time.perf_counter() - start) * 1000
+
+        self.assertEqual(response.status_code, status, f'{method} {url}')
+        captured = context.captured_queries
+        listing = '\n'.join(f'  {query["sql"]}' for query in captured)
+
+        repeated = repeated_queries(captured)
+        if repeated:
+            self.fail(f'{method} {url} 存在 N+1 查询:\n' + '\n'.join(
+                f'  {count} 次: {sql}' for sql, count in repeated
+            ))
+        self.assertLessEqual(
+            len(captured), queries,
+            f'{method} {url} 执行了 {len(captured)} 条查询，预算 {queries} 条:\n{listing}'
+        )
+        max_ms = max_ms or LATENCY_MS
+        self.assertLessEqual(elapsed, max_ms, f'{method} {url} 耗时 {elapsed:.1f}ms，上限 {max_ms}ms')
+        return response
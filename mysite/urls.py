@@ -20,11 +20,16 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
 
+
+# 媒体文件（MEDIA_URL）不直接对外提供，经各视图检查权限后由文件发送后端（videos.sendfile）输出
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('accounts.urls')),
+    path('', include('jobs.urls')),
     path('videos/', include('videos.urls')),
     path('permissions/', include('permissions.urls')),
     path('audit/', include('audit.urls')),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
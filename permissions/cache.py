@@ -0,0 +1,121 @@
+"""
+角色权限编译缓存
+
+每个角色编译为不可变的 CompiledRole（权限代码 frozenset + 最高可访问级别），
+保存在进程内 LRU 中；用户到角色的映射缓存在 Django 缓存中。两者都以共享缓存里的
+版本号为准，角色、角色权限或用户信息变更时递增版本号，各进程自动重新编译。
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Role, RolePermission, UserProfile
+
+
+VERSION_KEY = 'permissions:role_version'
+
+
+class CompiledRole(namedtuple('CompiledRole', ['role_id', 'codenames', 'max_security_level'])):
+    """编译后的角色"""
+    __slots__ = ()
+
+    def has_permission(self, codename):
+        return codename in self.codenames
+
+
+_lock = threading.Lock()
+_compiled_roles = OrderedDict()  # role_id -> (version, CompiledRole)
+
+
+def get_version():
+    """获取当前角色权限版本号"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 以时间戳作为初始值，缓存被清空后不会与旧版本号重复
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """递增角色权限版本号，使所有进程的编译结果失效"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns() // 1000, None)
+
+
+def compile_role(role_id):
+    """从数据库编译角色，角色不存在时返回 None"""
+    role = Role.objects.filter(pk=role_id).values('max_security_level').first()
+    if role is None:
+        return None
+    codenames = RolePermission.objects.filter(role_id=role_id).values_list(
+        'permission__codename', flat=True
+    )
+    return CompiledRole(role_id, frozenset(codenames), role['max_security_level'])
+
+
+def get_compiled_role(role_id, version=None):
+    """获取编译后的角色（进程内 LRU，版本号变化时重新编译）"""
+    if version is None:
+        version = get_version()
+
+    with _lock:
+        entry = _compiled_roles.get(role_id)
+        if entry is not None and entry[0] == version:
+            _compiled_roles.move_to_end(role_id)
+            return entry[1]
+
+    compiled = compile_role(role_id)
+
+    with _lock:
+        _compiled_roles[role_id] = (version, compiled)
+        _compiled_roles.move_to_end(role_id)
+        while len(_compiled_roles) > getattr(settings, 'ROLE_CACHE_SIZE', 256):
+            _compiled_roles.popitem(last=False)
+    return compiled
+
+
+def get_user_role(user):
+    """
+    获取用户的角色
+
+    返回 (是否已配置用户信息, CompiledRole 或 None)，结果在一次请求内挂在 user 上。
+    """
+    cached = getattr(user, '_compiled_role', None)
+    if cached is not None:
+        return cached
+
+    version = get_version()
+    key = f'permissions:user_role:{user.pk}:{version}'
+    entry = cache.get(key)
+    if entry is None:
+        profile = UserProfile.objects.filter(user_id=user.pk).values('role_id').first()
+        entry = {
+            'has_profile': profile is not None,
+            'role_id': profile['role_id'] if profile else None,
+        }
+        cache.set(key, entry, getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300))
+
+    role = get_compiled_role(entry['role_id'], version) if entry['role_id'] else None
+    result = (entry['has_profile'], role)
+    user._compiled_role = result
+    return result
+
+
+def user_has_permission(user, codename):
+    """检查用户是否拥有指定权限（未配置用户信息或角色时返回 False）"""
+    has_profile, role = get_user_role(user)
+    return role is not None and role.has_permission(codename)
+
+
+def get_max_security_level(user):
+    """获取用户最高可访问的安全级别，未配置角色时为公开级别"""
+    has_profile, role = get_user_role(user)
+    if role is not None:
+        return role.max_security_level
+    return 1
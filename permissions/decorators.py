@@ -3,6 +3,8 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.http import JsonResponse
 
+from .cache import get_user_role
+
 
 def permission_required(permission_codename):
     """
@@ -16,21 +18,21 @@ def permission_required(permission_codename):
                     return JsonResponse({'error': '请先登录'}, status=401)
                 return redirect('accounts:login')
             
-            try:
-                user_profile = request.user.userprofile
-                if user_profile.has_permission(permission_codename):
-                    return view_func(request, *args, **kwargs)
-                else:
-                    if request.headers.get('Accept') == 'application/json':
-                        return JsonResponse({'error': '权限不足'}, status=403)
-                    messages.error(request, '您没有执行此操作的权限')
-                    return redirect('videos:dashboard')
-            except AttributeError:
+            has_profile, role = get_user_role(request.user)
+            if not has_profile:
                 # 用户没有配置角色
                 if request.headers.get('Accept') == 'application/json':
                     return JsonResponse({'error': '用户权限未配置'}, status=403)
                 messages.error(request, '您的用户权限未配置，请联系管理员')
                 return redirect('accounts:person')
+            
+            if role is not None and role.has_permission(permission_codename):
+                return view_func(request, *args, **kwargs)
+            else:
+                if request.headers.get('Accept') == 'application/json':
+                    return JsonResponse({'error': '权限不足'}, status=403)
+                messages.error(request, '您没有执行此操作的权限')
+                return redirect('videos:dashboard')
         
         return wrapper
     return decorator
@@ -48,20 +50,21 @@ def security_level_required(min_level):
                     return JsonResponse({'error': '请先登录'}, status=401)
                 return redirect('accounts:login')
             
-            try:
-                user_profile = request.user.userprofile
-                if user_profile.max_security_level >= min_level:
-                    return view_func(request, *args, **kwargs)
-                else:
-                    if request.headers.get('Accept') == 'application/json':
-                        return JsonResponse({'error': '安全级别不足'}, status=403)
-                    messages.error(request, f'您需要{min_level}级或以上权限才能访问此内容')
-                    return redirect('videos:dashboard')
-            except AttributeError:
+            has_profile, role = get_user_role(request.user)
+            if not has_profile:
                 if request.headers.get('Accept') == 'application/json':
                     return JsonResponse({'error': '用户权限未配置'}, status=403)
                 messages.error(request, '您的用户权限未配置，请联系管理员')
                 return redirect('accounts:person')
+            
+            max_security_level = role.max_security_level if role is not None else 1
+            if max_security_level >= min_level:
+                return view_func(request, *args, **kwargs)
+            else:
+                if request.headers.get('Accept') == 'application/json':
+                    return JsonResponse({'error': '安全级别不足'}, status=403)
+                messages.error(request, f'您需要{min_level}级或以上权限才能访问此内容')
+                return redirect('videos:dashboard')
         
         return wrapper
     return decorator
@@ -78,19 +81,19 @@ def admin_required(view_func):
                 return JsonResponse({'error': '请先登录'}, status=401)
             return redirect('accounts:login')
         
-        try:
-            user_profile = request.user.userprofile
-            if user_profile.has_permission('user:manage') or request.user.is_superuser:
-                return view_func(request, *args, **kwargs)
-            else:
-                if request.headers.get('Accept') == 'application/json':
-                    return JsonResponse({'error': '需要管理员权限'}, status=403)
-                messages.error(request, '您需要管理员权限才能访问此页面')
-                return redirect('videos:dashboard')
-        except AttributeError:
+        has_profile, role = get_user_role(request.user)
+        if not has_profile:
             if request.headers.get('Accept') == 'application/json':
                 return JsonResponse({'error': '用户权限未配置'}, status=403)
             messages.error(request, '您的用户权限未配置，请联系管理员')
             return redirect('accounts:person')
+        
+        if (role is not None and role.has_permission('user:manage')) or request.user.is_superuser:
+            return view_func(request, *args, **kwargs)
+        else:
+            if request.headers.get('Accept') == 'application/json':
+                return JsonResponse({'error': '需要管理员权限'}, status=403)
+            messages.error(request, '您需要管理员权限才能访问此页面')
+            return redirect('videos:dashboard')
     
     return wrapper
@@ -71,14 +71,18 @@ class UserProfile(models.Model):
     @property
     def max_security_level(self):
         """获取用户最高可访问的安全级别"""
-        if self.role:
-            return self.role.max_security_level
+        from .cache import get_compiled_role
+
+        role = get_compiled_role(self.role_id) if self.role_id else None
+        if role is not None:
+            return role.max_security_level
         return 1  # 默认公开级别
 
     def has_permission(self, codename):
         """检查用户是否有指定权限"""
-        if not self.role:
+        from .cache import get_compiled_role
+
+        if not self.role_id:
             return False
-        return self.role.rolepermission_set.filter(
-            permission__codename=codename
-        ).exists()
\ No newline at end of file
+        role = get_compiled_role(self.role_id)
+        return role is not None and role.has_permission(codename)
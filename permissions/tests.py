@@ -1,3 +1,26 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from mysite.testing import PerformanceTestCase
+
+from .models import Role
+
+
+class ViewPerformanceTests(PerformanceTestCase):
+    """页面和接口的查询预算"""
+
+    def test_role_list(self):
+        self.assertBudget(reverse('permissions:role_list'), queries=4)
+
+    def test_role_form(self):
+        role = Role.objects.first()
+        self.assertBudget(reverse('permissions:role_create'), queries=3)
+        self.assertBudget(reverse('permissions:role_edit', args=[role.id]), queries=5)
+
+    def test_user_list(self):
+        self.assertBudget(reverse('permissions:user_list'), queries=4)
+
+    def test_user_edit(self):
+        self.assertBudget(reverse('permissions:user_edit', args=[self.admin.id]), queries=5)
+
+    def test_my_permissions(self):
+        self.assertBudget(reverse('permissions:my_permissions'), queries=5)
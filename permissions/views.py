@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
 from django.http import JsonResponse
 from django.contrib import messages
 from django.core.paginator import Paginator
@@ -130,7 +130,7 @@ def role_delete(request, role_id):
 @permission_required('user:manage')
 def user_list(request):
     """用户列表"""
-    users = settings.AUTH_USER_MODEL.objects.select_related('userprofile__role').all().order_by('-date_joined')
+    users = get_user_model().objects.select_related('userprofile__role').all().order_by('-date_joined')
     
     # 搜索功能
     search = request.GET.get('search', '')
@@ -153,7 +153,7 @@ def user_list(request):
 @permission_required('user:manage')
 def user_edit(request, user_id):
     """编辑用户"""
-    user = get_object_or_404(settings.AUTH_USER_MODEL, id=user_id)
+    user = get_object_or_404(get_user_model(), id=user_id)
     user_profile, created = UserProfile.objects.get_or_create(user=user)
     
     if request.method == 'POST':
@@ -0,0 +1,19 @@
+"""
+videos 的系统检查（manage.py check，部署时执行）
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .hls import is_cross_origin
+
+
+@register(Tags.security, deploy=True)
+def check_hls_js(app_configs, **kwargs):
+    """从 CDN 加载 hls.js 时需配置 SRI 摘要，否则播放页不加载 hls.js"""
+    if settings.HLS_JS_URL and is_cross_origin(settings.HLS_JS_URL) and not settings.HLS_JS_INTEGRITY:
+        return [Warning(
+            '未配置 HLS_JS_INTEGRITY，播放页不会从 CDN 加载 hls.js，非 Safari 浏览器无法使用 HLS 播放',
+            hint='按 settings 中的说明计算 SRI 摘要，或把 hls.js 托管在 static/ 下',
+            id='videos.W001',
+        )]
+    return []
@@ -0,0 +1,219 @@
+"""
+HLS 切片
+
+把视频原始文件及各多码率版本（VideoVersion）切成 HLS_SEGMENT_SECONDS 秒的 MPEG-TS 分片，
+保存在 MEDIA_ROOT/hls/<视频ID>/ 下：
+
+    master.m3u8               主播放列表，列出全部清晰度
+    original/index.m3u8       原始文件
+    720p_2800k/index.m3u8     多码率版本（与版本文件同名）
+    <清晰度>/seg_00000.ts      分片
+
+播放器先读取主播放列表，按带宽自动切换清晰度，拖动进度条时只请求对应的分片，不再读取整个文件。
+播放列表和分片由视图检查权限后通过 sendfile 发送。
+"""
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+
+from jobs.queue import enqueue, task
+
+from .probe import probe
+
+logger = logging.getLogger('videos')
+
+HLS_DIR = 'hls'
+ORIGINAL = 'original'
+MASTER_PLAYLIST = 'master.m3u8'
+VARIANT_PLAYLIST = 'index.m3u8'
+VARIANT_RE = re.compile(r'^(?:original|\d+p_\d+k)$')
+FILENAME_RE = re.compile(r'^(?:index\.m3u8|seg_\d{5}\.ts)$')
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+def video_dir(video_id):
+    return os.path.join(settings.MEDIA_ROOT, HLS_DIR, str(video_id))
+
+
+def variant_name(version):
+    """版本对应的清晰度目录名，与版本文件名一致，如 720p_2800k"""
+    return os.path.splitext(os.path.basename(version.file.name))[0]
+
+
+def master_path(video_id):
+    return os.path.join(video_dir(video_id), MASTER_PLAYLIST)
+
+
+def file_path(video_id, variant, filename):
+    """清晰度目录下的播放列表或分片路径，名称不合法时返回 None"""
+    if not VARIANT_RE.match(variant) or not FILENAME_RE.match(filename):
+        return None
+    return os.path.join(video_dir(video_id), variant, filename)
+
+
+def is_packaged(video_id):
+    return os.path.exists(master_path(video_id))
+
+
+def segment(source_path, dest_dir, copy_video=True):
+    """
+    用 ffmpeg 切片到 dest_dir，返回是否成功
+
+    H.264 视频直接复制视频流，只在关键帧处切分；其他编码转码为 H.264。先切到临时目录，完成后
+    再整体替换，播放器不会读到切了一半的播放列表。
+    """
+    parent = os.path.dirname(dest_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    if copy_video:
+        video_codec = ['-c:v', 'copy']
+    else:
+        video_codec = [
+            '-c:v', 'libx264', '-preset', settings.RENDITION_PRESET, '-crf', '20',
+            '-force_key_frames', f'expr:gte(t,n_forced*{settings.HLS_SEGMENT_SECONDS})',
+        ]
+    command = [
+        settings.FFMPEG_BINARY, '-v', 'error', '-y', '-i', source_path,
+        *video_codec, '-c:a', 'aac', '-b:a', str(settings.RENDITION_AUDIO_BITRATE),
+        '-f', 'hls', '-hls_time', str(settings.HLS_SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(tmp_dir, 'seg_%05d.ts'),
+        os.path.join(tmp_dir, VARIANT_PLAYLIST),
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=settings.RENDITION_TIMEOUT)
+        for name in os.listdir(tmp_dir):
+            os.chmod(os.path.join(tmp_dir, name), settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.chmod(tmp_dir, 0o755)
+        if os.path.exists(dest_dir):
+            shutil.rmtree(dest_dir)
+        os.rename(tmp_dir, dest_dir)
+        return True
+    except FileNotFoundError:
+        logger.warning('未找到 ffmpeg，跳过 HLS 切片')
+        return False
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+
+
+def variant_bandwidth(variant_dir):
+    """
+    按分片实际大小计算清晰度的 (峰值码率, 平均码率)，单位比特每秒
+
+    主播放列表的 BANDWIDTH 应为分片的峰值码率，播放器据此判断带宽是否足够。
+    """
+    peak = total_bits = total_duration = 0
+    duration = None
+    with open(os.path.join(variant_dir, VARIANT_PLAYLIST)) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line and not line.startswith('#') and duration:
+                bits = os.path.getsize(os.path.join(variant_dir, line)) * 8
+                peak = max(peak, bits / duration)
+                total_bits += bits
+                total_duration += duration
+                duration = None
+    average = total_bits / total_duration if total_duration else 0
+    return int(peak), int(average)
+
+
+def write_master(video):
+    """按已切片的清晰度重写主播放列表（码率从高到低）"""
+    directory = video_dir(video.id)
+    variants = [(ORIGINAL, video.resolution)]
+    variants += [(variant_name(version), version.resolution) for version in video.versions.all()]
+
+    streams = []
+    for name, resolution in variants:
+        variant_dir = os.path.join(directory, name)
+        if os.path.exists(os.path.join(variant_dir, VARIANT_PLAYLIST)):
+            streams.append((name, resolution, *variant_bandwidth(variant_dir)))
+    if not streams:
+        return False
+
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for name, resolution, peak, average in sorted(streams, key=lambda s: s[2], reverse=True):
+        attributes = [f'BANDWIDTH={peak}', f'AVERAGE-BANDWIDTH={average}']
+        if resolution:
+            attributes.append(f'RESOLUTION={resolution}')
+        lines.append(f'#EXT-X-STREAM-INF:{",".join(attributes)}')
+        lines.append(f'{name}/{VARIANT_PLAYLIST}')
+
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+    os.replace(tmp, master_path(video.id))
+    return True
+
+
+@task(max_attempts=2)
+def package_hls(video_id, version_id=None):
+    """切片原始文件（version_id 为空）或指定版本，然后更新主播放列表"""
+    from .models import Video, VideoVersion
+
+    video = Video.objects.filter(id=video_id, file_type='video').first()
+    if video is None or not video.file:
+        return None
+    if version_id is None:
+        source_path, name = video.file.path, ORIGINAL
+        # 元数据探测任务可能尚未执行
+        codec = video.codec or probe(source_path).get('codec')
+        copy_video = codec == 'h264'
+    else:
+        version = VideoVersion.objects.filter(id=version_id, video_id=video_id).first()
+        if version is None:
+            return None
+        source_path, name, copy_video = version.file.path, variant_name(version), True
+
+    if not segment(source_path, os.path.join(video_dir(video_id), name), copy_video):
+        return None
+
+    # 多个切片任务并行完成时逐个重写主播放列表
+    with transaction.atomic():
+        video = Video.objects.select_for_update().filter(id=video_id).first()
+        if video is None:
+            remove_hls(video_id)
+            return None
+        write_master(video)
+    return name
+
+
+def remove_hls(video_id):
+    """删除视频的全部切片"""
+    shutil.rmtree(video_dir(video_id), ignore_errors=True)
+
+
+def player_script():
+    """
+    hls.js 的地址和 SRI 摘要，返回 {'url', 'integrity'}；不能加载时返回 None
+
+    跨域（CDN）加载时必须配置 HLS_JS_INTEGRITY，否则不加载（非 Safari 浏览器改为播放 MP4）；
+    自行托管在本站 static/ 下时不需要摘要。
+    """
+    url = settings.HLS_JS_URL
+    if not url:
+        return None
+    if is_cross_origin(url) and not settings.HLS_JS_INTEGRITY:
+        return None
+    return {'url': url, 'integrity': settings.HLS_JS_INTEGRITY}
+
+
+def is_cross_origin(url):
+    return '://' in url or url.startswith('//')
+
+
+def schedule_package(video_id, version_id=None, created_by=None):
+    """提交切片任务（事务提交后执行）"""
+    return enqueue(package_hls, args=[video_id, version_id], created_by=created_by)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from videos import renditions
+from videos.models import Video
+
+
+class Command(BaseCommand):
+    help = '为已有视频提交补生成多码率版本的后台任务（已生成的档位会跳过）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*', type=int, help='只处理指定的视频')
+
+    def handle(self, *args, **options):
+        queryset = Video.objects.filter(file_type='video', is_active=True)
+        if options['video_ids']:
+            queryset = queryset.filter(id__in=options['video_ids'])
+        video_ids = list(queryset.values_list('id', flat=True))
+
+        for video_id in video_ids:
+            renditions.schedule_renditions(video_id)
+
+        self.stdout.write(self.style.SUCCESS(f'已提交 {len(video_ids)} 个视频的多码率版本任务'))
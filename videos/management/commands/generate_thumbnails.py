@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import DataModel
+from videos import thumbnails
+from videos.models import Video
+
+
+class Command(BaseCommand):
+    help = '为已有的数据模型媒体文件和视频提交补生成缩略图/封面的后台任务'
+
+    def handle(self, *args, **options):
+        model_ids = [
+            model.id for model in DataModel.objects.only('id', 'media_files')
+            if any('thumbnails' not in entry for entry in model.media_files or [])
+        ]
+        video_ids = list(Video.objects.filter(thumbnail='').values_list('id', flat=True))
+
+        for model_id in model_ids:
+            thumbnails.schedule_data_model(model_id)
+        for video_id in video_ids:
+            thumbnails.schedule_video(video_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'已提交 {len(model_ids)} 个数据模型、{len(video_ids)} 个视频的缩略图任务'
+        ))
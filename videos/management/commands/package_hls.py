@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from videos import hls
+from videos.models import Video
+
+
+class Command(BaseCommand):
+    help = '为尚未切片的视频提交 HLS 切片任务（原始文件和已生成的多码率版本）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*', type=int, help='只处理指定的视频')
+        parser.add_argument('--force', action='store_true', help='重新切片已切片的视频')
+
+    def handle(self, *args, **options):
+        queryset = Video.objects.filter(file_type='video', is_active=True).prefetch_related('versions')
+        if options['video_ids']:
+            queryset = queryset.filter(id__in=options['video_ids'])
+
+        count = 0
+        for video in queryset:
+            if not options['force'] and hls.is_packaged(video.id):
+                continue
+            hls.schedule_package(video.id)
+            for version in video.versions.all():
+                hls.schedule_package(video.id, version.id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'已提交 {count} 个视频的 HLS 切片任务'))
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from videos.models import Video
+from videos.probe import PROBE_FIELDS, probe
+
+
+def probe_one(video):
+    try:
+        return video, probe(video.file.path)
+    except OSError:
+        return video, {}
+
+
+class Command(BaseCommand):
+    help = '批量探测视频元数据（时长、分辨率、编码、比特率、帧率），只读取文件头'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='并行探测的线程数')
+        parser.add_argument('--all', action='store_true', help='重新探测全部视频（默认只处理尚无时长/分辨率的）')
+        parser.add_argument('--batch-size', type=int, default=200, help='每批写入的记录数')
+
+    def handle(self, *args, **options):
+        videos = Video.objects.filter(file_type__in=['video', 'image']).only('id', 'file', *PROBE_FIELDS)
+        if not options['all']:
+            videos = videos.filter(duration__isnull=True, resolution__isnull=True)
+
+        batch_size = options['batch_size']
+        pending = []
+        updated = scanned = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for video, fields in executor.map(probe_one, videos.iterator(chunk_size=batch_size)):
+                scanned += 1
+                if not fields:
+                    continue
+                for name, value in fields.items():
+                    setattr(video, name, value)
+                pending.append(video)
+                if len(pending) >= batch_size:
+                    Video.objects.bulk_update(pending, PROBE_FIELDS)
+                    updated += len(pending)
+                    pending = []
+        if pending:
+            Video.objects.bulk_update(pending, PROBE_FIELDS)
+            updated += len(pending)
+
+        self.stdout.write(self.style.SUCCESS(f'已探测 {scanned} 个文件，更新 {updated} 条记录'))
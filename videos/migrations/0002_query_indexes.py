@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['uploaded_at', 'is_active', 'security_level'], name='video_uploaded_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['download_count', 'is_active', 'security_level'], name='video_downloads_active_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.urls import reverse
 import os
 
 
@@ -75,6 +76,12 @@ class Video(models.Model):
         verbose_name = "视频"
         verbose_name_plural = "视频"
         ordering = ['-uploaded_at']
+        # 列表按上传时间/下载次数倒序取前 N 条：按排序列反向扫描索引，
+        # is_active 和 security_level（范围条件）在索引中过滤，不回表
+        indexes = [
+            models.Index(fields=['uploaded_at', 'is_active', 'security_level'], name='video_uploaded_active_idx'),
+            models.Index(fields=['download_count', 'is_active', 'security_level'], name='video_downloads_active_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -89,25 +96,28 @@ class Video(models.Model):
         """返回安全级别的显示名称"""
         return dict(self.SECURITY_LEVEL_CHOICES).get(self.security_level, '未知')
 
+    def get_tag_list(self):
+        """标签列表（标签以逗号分隔）"""
+        return [tag.strip() for tag in (self.tags or '').split(',') if tag.strip()]
+
     def get_file_url(self):
-        """获取文件访问URL"""
+        """获取文件访问URL（经权限检查的播放地址，媒体目录不对外开放）"""
         if self.file:
-            return self.file.url
+            return reverse('videos:video_stream', args=[self.id])
         return None
 
     def get_thumbnail_url(self):
         """获取缩略图URL"""
         if self.thumbnail:
-            return self.thumbnail.url
+            return reverse('videos:video_thumbnail', args=[self.id])
         return None
 
     def can_user_access(self, user):
         """检查用户是否有权限访问此视频"""
-        try:
-            user_profile = user.userprofile
-            return user_profile.max_security_level >= self.security_level
-        except UserProfile.DoesNotExist:
-            return self.security_level == 1  # 默认只能访问公开级别
+        from permissions.cache import get_max_security_level
+
+        # 未配置角色的用户只能访问公开级别
+        return get_max_security_level(user) >= self.security_level
 
     def increment_view_count(self):
         """增加观看次数"""
@@ -137,6 +147,19 @@ class VideoVersion(models.Model):
     def __str__(self):
         return f"{self.video.title} - {self.resolution}"
 
+    @property
+    def height(self):
+        """画面高度（分辨率格式为 宽x高）"""
+        try:
+            return int(self.resolution.rsplit('x', 1)[1])
+        except (IndexError, ValueError):
+            return 0
+
+    @property
+    def label(self):
+        """清晰度名称，如 720p"""
+        return f'{self.height}p'
+
 
 class VideoComment(models.Model):
     """视频评论模型"""
@@ -0,0 +1,382 @@
+"""
+视频元数据探测
+
+只读取容器头部获取时长、分辨率、编码、比特率和帧率，不读取整个文件：
+- MP4/MOV（ISO BMFF）：逐个读取 box 头，跳过 mdat，只解析 moov 中的 mvhd/mdhd/hdlr/stsd/stts
+- MKV/WebM（EBML）：解析 Segment 中的 Info 和 Tracks，遇到第一个 Cluster 即停止
+- 其他容器：安装了 ffprobe 时使用 ffprobe
+- 图片：Pillow 只读取文件头获取尺寸
+"""
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+from datetime import timedelta
+
+from django.conf import settings
+from PIL import Image
+
+from jobs.queue import enqueue, task
+
+logger = logging.getLogger('videos')
+
+PROBE_FIELDS = ['duration', 'resolution', 'codec', 'bitrate', 'frame_rate']
+
+MP4_EXTENSIONS = {'mp4', 'm4v', 'mov'}
+MKV_EXTENSIONS = {'mkv', 'webm'}
+
+MP4_CODECS = {
+    'avc1': 'h264', 'avc3': 'h264',
+    'hvc1': 'hevc', 'hev1': 'hevc',
+    'mp4v': 'mpeg4', 'av01': 'av1', 'vp09': 'vp9',
+}
+MKV_CODECS = {
+    'V_MPEG4/ISO/AVC': 'h264', 'V_MPEGH/ISO/HEVC': 'hevc',
+    'V_VP8': 'vp8', 'V_VP9': 'vp9', 'V_AV1': 'av1',
+    'V_MPEG4/ISO/ASP': 'mpeg4', 'V_MPEG2': 'mpeg2video',
+}
+
+# EBML 元素 ID
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_CODEC_ID = 0x86
+MKV_DEFAULT_DURATION = 0x23E383
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+
+
+class ProbeError(Exception):
+    """文件头格式不正确"""
+
+
+# MP4 / MOV
+
+def _iter_boxes(f, start, end):
+    """遍历 [start, end) 范围内的 box，返回 (类型, 数据起始位置, 结束位置)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            raise ProbeError('box 大小不正确')
+        yield kind, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _find_box(f, start, end, path):
+    """按路径查找子 box，例如 [b'mdia', b'mdhd']"""
+    for kind, data_start, data_end in _iter_boxes(f, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return data_start, data_end
+            return _find_box(f, data_start, data_end, path[1:])
+    return None
+
+
+def _read_timescale_duration(f, start):
+    """读取 mvhd/mdhd 中的 (timescale, duration)"""
+    f.seek(start)
+    version = f.read(4)[0]
+    if version == 1:
+        f.seek(16, os.SEEK_CUR)
+        return struct.unpack('>IQ', f.read(12))
+    f.seek(8, os.SEEK_CUR)
+    return struct.unpack('>II', f.read(8))
+
+
+def _read_mp4_track(f, start, end):
+    """读取视频轨道的编码、尺寸和帧率，非视频轨道返回 None"""
+    hdlr = _find_box(f, start, end, [b'mdia', b'hdlr'])
+    if hdlr is None:
+        return None
+    f.seek(hdlr[0] + 8)
+    if f.read(4) != b'vide':
+        return None
+
+    track = {}
+    stsd = _find_box(f, start, end, [b'mdia', b'minf', b'stbl', b'stsd'])
+    if stsd is not None:
+        # fullbox(4) + entry_count(4) + 第一个 sample entry
+        f.seek(stsd[0] + 8)
+        entry = f.read(8 + 6 + 2 + 16 + 4)
+        if len(entry) == 36:
+            fourcc = entry[4:8].decode('latin-1')
+            track['codec'] = MP4_CODECS.get(fourcc, fourcc.strip())
+            width, height = struct.unpack('>HH', entry[32:36])
+            if width and height:
+                track['width'], track['height'] = width, height
+
+    mdhd = _find_box(f, start, end, [b'mdia', b'mdhd'])
+    stts = _find_box(f, start, end, [b'mdia', b'minf', b'stbl', b'stts'])
+    if mdhd is not None and stts is not None:
+        timescale, _ = _read_timescale_duration(f, mdhd[0])
+        f.seek(stts[0] + 4)
+        (count,) = struct.unpack('>I', f.read(4))
+        data = f.read(min(count, (stts[1] - stts[0] - 8) // 8) * 8)
+        samples = total = 0
+        for sample_count, delta in struct.iter_unpack('>II', data):
+            samples += sample_count
+            total += sample_count * delta
+        if timescale and total:
+            track['frame_rate'] = samples * timescale / total
+    return track
+
+
+def probe_mp4(f, file_size):
+    """解析 MP4/MOV 头部"""
+    moov = _find_box(f, 0, file_size, [b'moov'])
+    if moov is None:
+        raise ProbeError('未找到 moov')
+
+    info = {}
+    for kind, start, end in _iter_boxes(f, *moov):
+        if kind == b'mvhd':
+            timescale, duration = _read_timescale_duration(f, start)
+            if timescale:
+                info['duration'] = duration / timescale
+        elif kind == b'trak' and 'codec' not in info:
+            track = _read_mp4_track(f, start, end)
+            if track:
+                info.update(track)
+    return info
+
+
+# MKV / WebM
+
+def _read_vint(f, keep_marker=False):
+    """读取 EBML 变长整数，返回 (值, 是否为未知长度)"""
+    first = f.read(1)
+    if not first:
+        raise EOFError
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not byte & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ProbeError('EBML 长度不正确')
+    value = byte if keep_marker else byte & (mask - 1)
+    for b in f.read(length - 1):
+        value = (value << 8) | b
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, unknown
+
+
+def _iter_elements(f, start, end):
+    """遍历 [start, end) 范围内的 EBML 元素，返回 (ID, 数据起始位置, 结束位置)"""
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        try:
+            element_id, _ = _read_vint(f, keep_marker=True)
+            size, unknown = _read_vint(f)
+        except EOFError:
+            return
+        data_start = f.tell()
+        data_end = end if unknown else min(data_start + size, end)
+        yield element_id, data_start, data_end
+        pos = data_end
+
+
+def _read_uint(f, start, end):
+    f.seek(start)
+    return int.from_bytes(f.read(end - start), 'big')
+
+
+def _read_float(f, start, end):
+    f.seek(start)
+    data = f.read(end - start)
+    if len(data) == 4:
+        return struct.unpack('>f', data)[0]
+    if len(data) == 8:
+        return struct.unpack('>d', data)[0]
+    return None
+
+
+def _read_mkv_track(f, start, end):
+    """读取 TrackEntry，非视频轨道返回 None"""
+    track = {}
+    is_video = False
+    for element_id, data_start, data_end in _iter_elements(f, start, end):
+        if element_id == MKV_TRACK_TYPE:
+            is_video = _read_uint(f, data_start, data_end) == 1
+        elif element_id == MKV_CODEC_ID:
+            f.seek(data_start)
+            codec_id = f.read(data_end - data_start).rstrip(b'\0').decode('ascii', 'replace')
+            track['codec'] = MKV_CODECS.get(codec_id, codec_id)
+        elif element_id == MKV_DEFAULT_DURATION:
+            frame_ns = _read_uint(f, data_start, data_end)
+            if frame_ns:
+                track['frame_rate'] = 1e9 / frame_ns
+        elif element_id == MKV_VIDEO:
+            for child_id, child_start, child_end in _iter_elements(f, data_start, data_end):
+                if child_id == MKV_PIXEL_WIDTH:
+                    track['width'] = _read_uint(f, child_start, child_end)
+                elif child_id == MKV_PIXEL_HEIGHT:
+                    track['height'] = _read_uint(f, child_start, child_end)
+    return track if is_video else None
+
+
+def probe_mkv(f, file_size):
+    """解析 MKV/WebM 头部"""
+    elements = _iter_elements(f, 0, file_size)
+    header = next(elements, None)
+    if header is None or header[0] != EBML_HEADER:
+        raise ProbeError('不是 EBML 文件')
+    segment = next((e for e in elements if e[0] == MKV_SEGMENT), None)
+    if segment is None:
+        raise ProbeError('未找到 Segment')
+
+    info = {}
+    timecode_scale = 1000000
+    duration = None
+    has_tracks = False
+    for element_id, start, end in _iter_elements(f, segment[1], segment[2]):
+        if element_id == MKV_INFO:
+            for child_id, child_start, child_end in _iter_elements(f, start, end):
+                if child_id == MKV_TIMECODE_SCALE:
+                    timecode_scale = _read_uint(f, child_start, child_end)
+                elif child_id == MKV_DURATION:
+                    duration = _read_float(f, child_start, child_end)
+        elif element_id == MKV_TRACKS:
+            has_tracks = True
+            for child_id, child_start, child_end in _iter_elements(f, start, end):
+                if child_id == MKV_TRACK_ENTRY:
+                    track = _read_mkv_track(f, child_start, child_end)
+                    if track:
+                        info.update(track)
+                        break
+        elif element_id == MKV_CLUSTER:
+            # 媒体数据开始，头部信息已读取完毕
+            break
+        if duration is not None and has_tracks:
+            break
+
+    if duration is not None:
+        info['duration'] = duration * timecode_scale / 1e9
+    return info
+
+
+# ffprobe
+
+def ffprobe_available():
+    return shutil.which(settings.FFPROBE_BINARY) is not None
+
+
+def _parse_rate(value):
+    """解析 ffprobe 的帧率（如 30000/1001）"""
+    try:
+        num, _, den = value.partition('/')
+        return float(num) / float(den or 1) if float(den or 1) else None
+    except (ValueError, AttributeError):
+        return None
+
+
+def probe_ffprobe(path):
+    """用 ffprobe 读取元数据"""
+    command = [
+        settings.FFPROBE_BINARY, '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', '-select_streams', 'v:0', path,
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, timeout=settings.FFMPEG_TIMEOUT).stdout
+    data = json.loads(output)
+    info = {}
+    fmt = data.get('format') or {}
+    if fmt.get('duration'):
+        info['duration'] = float(fmt['duration'])
+    if fmt.get('bit_rate'):
+        info['bitrate'] = int(fmt['bit_rate'])
+    streams = data.get('streams') or []
+    if streams:
+        stream = streams[0]
+        if stream.get('codec_name'):
+            info['codec'] = stream['codec_name']
+        if stream.get('width') and stream.get('height'):
+            info['width'], info['height'] = stream['width'], stream['height']
+        frame_rate = _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate'))
+        if frame_rate:
+            info['frame_rate'] = frame_rate
+    return info
+
+
+# 入口
+
+def probe(path):
+    """
+    探测文件元数据，返回可直接写入 Video 的字段（无法识别时返回空字典）
+
+    {'duration': timedelta, 'resolution': '1920x1080', 'codec': 'h264',
+     'bitrate': 比特每秒, 'frame_rate': 29.97}
+    """
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    file_size = os.path.getsize(path)
+
+    info = {}
+    try:
+        if ext in settings.ALLOWED_IMAGE_EXTENSIONS:
+            with Image.open(path) as image:
+                info = {'width': image.width, 'height': image.height}
+        elif ext in MP4_EXTENSIONS or ext in MKV_EXTENSIONS:
+            parser = probe_mp4 if ext in MP4_EXTENSIONS else probe_mkv
+            with open(path, 'rb') as f:
+                info = parser(f, file_size)
+    except (ProbeError, struct.error, IndexError, OSError) as e:
+        logger.warning(f'解析文件头失败: {path}: {e}')
+        info = {}
+
+    if not info.get('codec') and ext in settings.ALLOWED_VIDEO_EXTENSIONS and ffprobe_available():
+        try:
+            info = probe_ffprobe(path)
+        except (subprocess.SubprocessError, ValueError, OSError) as e:
+            logger.warning(f'ffprobe 失败: {path}: {e}')
+
+    fields = {}
+    if info.get('duration'):
+        fields['duration'] = timedelta(seconds=round(info['duration'], 3))
+        fields['bitrate'] = info.get('bitrate') or int(file_size * 8 / info['duration'])
+    if info.get('width') and info.get('height'):
+        fields['resolution'] = f"{info['width']}x{info['height']}"
+    if info.get('codec'):
+        fields['codec'] = info['codec'][:50]
+    if info.get('frame_rate'):
+        fields['frame_rate'] = round(info['frame_rate'], 3)
+    return fields
+
+
+@task
+def probe_video(video_id):
+    """探测单个视频并保存元数据"""
+    from .models import Video
+
+    video = Video.objects.filter(id=video_id).only('id', 'file').first()
+    if video is None or not video.file:
+        return None
+    fields = probe(video.file.path)
+    if fields:
+        Video.objects.filter(id=video_id).update(**fields)
+    return {key: str(value) for key, value in fields.items()}
+
+
+def schedule_probe(video_id, created_by=None):
+    """提交元数据探测任务（事务提交后执行）"""
+    return enqueue(probe_video, args=[video_id], created_by=created_by)
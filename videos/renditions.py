@@ -0,0 +1,214 @@
+"""
+多码率版本（VideoVersion）
+
+上传视频后按 RENDITION_LADDER 用 ffmpeg 转码出不同分辨率/码率的版本，播放和下载时按客户端
+请求的清晰度（?quality=720p）或带宽（?bandwidth=<kbps>、Downlink 客户端提示）选择合适的版本，
+弱网客户端不必读取原始文件。
+
+转码作为后台任务执行：先由 generate_renditions 读取原视频分辨率确定档位，再为每个档位各提交
+一个 transcode_rendition 任务，多个 run_jobs 进程可以并行转码。未安装 ffmpeg 时跳过。
+"""
+import logging
+import os
+import re
+import subprocess
+import tempfile
+
+from django.conf import settings
+
+from jobs.queue import enqueue, task
+
+from . import hls
+from .probe import probe
+
+logger = logging.getLogger('videos')
+
+VERSION_DIR = 'videos/versions'
+RESOLUTION_RE = re.compile(r'^(\d+)x(\d+)$')
+QUALITY_RE = re.compile(r'^(?:\d+x)?(\d+)p?$')
+
+
+def parse_resolution(resolution):
+    """'1920x1080' -> (1920, 1080)，无法解析时返回 None"""
+    match = RESOLUTION_RE.match(resolution or '')
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def parse_quality(value):
+    """清晰度参数 '720p' / '720' / '1280x720' -> 720，无法解析时返回 None"""
+    match = QUALITY_RE.match((value or '').strip().lower())
+    return int(match.group(1)) if match else None
+
+
+def ladder_for(width, height):
+    """原视频适用的档位：[(宽, 高, 码率), ...]，不放大，宽度按比例取偶数"""
+    rungs = []
+    for rung in settings.RENDITION_LADDER:
+        if rung['height'] >= height:
+            continue
+        rung_width = max(2, round(width * rung['height'] / height / 2) * 2)
+        rungs.append((rung_width, rung['height'], rung['bitrate']))
+    return rungs
+
+
+def version_relpath(video_id, height, bitrate):
+    return f'{VERSION_DIR}/{video_id}/{height}p_{bitrate // 1000}k.mp4'
+
+
+def transcode(source_path, dest, height, bitrate):
+    """
+    用 ffmpeg 转码为 H.264/AAC 的 MP4，返回是否成功
+
+    限制峰值码率（maxrate/bufsize），保证按带宽选择的版本能平稳播放；按 HLS 分片时长插入关键帧，
+    各版本的分片边界一致，切换清晰度时无缝衔接；faststart 把 moov 放到文件头，播放器不必读完
+    整个文件即可开始播放。先写入临时文件，完成后再重命名。
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.mp4')
+    os.close(fd)
+    command = [
+        settings.FFMPEG_BINARY, '-v', 'error', '-y', '-i', source_path,
+        '-vf', f'scale=-2:{height}',
+        '-c:v', 'libx264', '-preset', settings.RENDITION_PRESET, '-profile:v', 'main',
+        '-b:v', str(bitrate), '-maxrate', str(int(bitrate * 1.07)), '-bufsize', str(bitrate * 2),
+        '-force_key_frames', f'expr:gte(t,n_forced*{settings.HLS_SEGMENT_SECONDS})',
+        '-c:a', 'aac', '-b:a', str(settings.RENDITION_AUDIO_BITRATE),
+        '-movflags', '+faststart',
+        tmp,
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=settings.RENDITION_TIMEOUT)
+        os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(tmp, dest)
+        return True
+    except FileNotFoundError:
+        logger.warning('未找到 ffmpeg，跳过多码率版本生成')
+        return False
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+@task
+def generate_renditions(video_id):
+    """确定视频适用的档位，为尚未生成的档位提交转码任务"""
+    from .models import Video
+
+    video = Video.objects.filter(id=video_id, file_type='video').first()
+    if video is None or not video.file:
+        return None
+
+    size = parse_resolution(video.resolution)
+    if size is None:
+        # 元数据探测任务可能尚未执行
+        size = parse_resolution(probe(video.file.path).get('resolution'))
+    if size is None:
+        logger.warning(f'无法获取视频分辨率，跳过多码率版本: {video_id}')
+        return None
+
+    existing = set(video.versions.values_list('resolution', 'bitrate'))
+    scheduled = []
+    for width, height, bitrate in ladder_for(*size):
+        if (f'{width}x{height}', bitrate) in existing:
+            continue
+        enqueue(transcode_rendition, args=[video_id, width, height, bitrate])
+        scheduled.append(f'{height}p')
+    return scheduled
+
+
+@task(max_attempts=2)
+def transcode_rendition(video_id, width, height, bitrate):
+    """转码一个档位并保存为 VideoVersion"""
+    from .models import Video, VideoVersion
+
+    video = Video.objects.filter(id=video_id).only('id', 'file').first()
+    if video is None or not video.file:
+        return None
+
+    relpath = version_relpath(video_id, height, bitrate)
+    dest = os.path.join(settings.MEDIA_ROOT, relpath)
+    if not transcode(video.file.path, dest, height, bitrate):
+        return None
+
+    if not Video.objects.filter(id=video_id).exists():
+        # 转码期间视频已被删除
+        os.remove(dest)
+        return None
+    version, _ = VideoVersion.objects.update_or_create(
+        video_id=video_id,
+        resolution=f'{width}x{height}',
+        bitrate=bitrate,
+        defaults={'file': relpath, 'file_size': os.path.getsize(dest)},
+    )
+    hls.schedule_package(video_id, version.id)
+    return relpath
+
+
+def remove_versions(video):
+    """删除视频的全部版本文件（记录随视频级联删除）"""
+    for version in video.versions.all():
+        if version.file:
+            try:
+                os.remove(version.file.path)
+            except FileNotFoundError:
+                pass
+
+
+def schedule_renditions(video_id, created_by=None):
+    """提交多码率版本任务（事务提交后执行）"""
+    return enqueue(generate_renditions, args=[video_id], created_by=created_by)
+
+
+# 版本选择
+
+def client_bandwidth(request):
+    """
+    客户端带宽（比特每秒），未提供时返回 None
+
+    优先使用 ?bandwidth=<kbps> 参数（播放器自行测速后传入），其次使用浏览器的 Downlink
+    客户端提示（Mbit/s，需在响应中声明 Accept-CH: Downlink）。
+    """
+    for value, scale in ((request.GET.get('bandwidth'), 1000),
+                         (request.headers.get('Downlink'), 1000000)):
+        try:
+            bandwidth = float(value)
+        except (TypeError, ValueError):
+            continue
+        if bandwidth > 0:
+            return int(bandwidth * scale)
+    return None
+
+
+def select_version(video, versions, request):
+    """
+    按请求选择播放/下载的版本，返回 VideoVersion，使用原始文件时返回 None
+
+    - ?quality=720p：不高于该分辨率的最高版本（original 表示原始文件）
+    - 带宽：码率不超过可用带宽 RENDITION_BANDWIDTH_FACTOR 倍的最高版本
+    - 都未提供时使用原始文件；没有合适版本时退回最低版本
+    """
+    if not versions:
+        return None
+    versions = sorted(versions, key=lambda v: (v.height, v.bitrate))
+
+    quality = request.GET.get('quality')
+    if quality == 'original':
+        return None
+    height = parse_quality(quality)
+    if height:
+        source = parse_resolution(video.resolution)
+        if source and height >= source[1]:
+            return None
+        fitting = [v for v in versions if v.height <= height]
+        return fitting[-1] if fitting else versions[0]
+
+    bandwidth = client_bandwidth(request)
+    if bandwidth:
+        budget = bandwidth * settings.RENDITION_BANDWIDTH_FACTOR
+        if video.bitrate and video.bitrate <= budget:
+            return None
+        fitting = [v for v in versions if v.bitrate <= budget]
+        return max(fitting, key=lambda v: v.bitrate) if fitting else versions[0]
+    return None
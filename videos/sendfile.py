@@ -0,0 +1,86 @@
+"""
+文件发送后端
+
+视图只负责权限检查，文件字节由后端发送：
+- LocalBackend：Django 流式返回（开发环境，无需 nginx）
+- NginxBackend：返回 X-Accel-Redirect，由 nginx 内部 location 直接 sendfile
+
+通过 settings.SENDFILE_BACKEND 选择后端。
+"""
+import os
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+from .streaming import RangeNotSatisfiable, content_disposition, parse_range, serve_file
+
+
+class BaseBackend:
+    """文件发送后端基类"""
+
+    def send(self, request, path, filename, etag=None, content_type=None, as_attachment=True):
+        raise NotImplementedError
+
+
+class LocalBackend(BaseBackend):
+    """由 Django 按块流式返回文件，支持断点续传"""
+
+    def send(self, request, path, filename, etag=None, content_type=None, as_attachment=True):
+        protected_path(path)
+        return serve_file(request, path, filename, etag=etag, content_type=content_type,
+                          as_attachment=as_attachment)
+
+
+class NginxBackend(BaseBackend):
+    """返回 X-Accel-Redirect 响应头，由 nginx 的 internal location 发送文件"""
+
+    def send(self, request, path, filename, etag=None, content_type=None, as_attachment=True):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        response = HttpResponse()
+        if content_type:
+            response['Content-Type'] = content_type
+        else:
+            # 交给 nginx 按扩展名确定 Content-Type
+            del response['Content-Type']
+        response['X-Accel-Redirect'] = settings.SENDFILE_URL + quote(protected_path(path))
+        response['Content-Disposition'] = content_disposition(filename, as_attachment)
+        # 供请求指标统计发送的字节数（响应本身没有响应体）
+        response.sendfile_size = sendfile_size(request, os.path.getsize(path))
+        return response
+
+
+def sendfile_size(request, size):
+    """nginx 将发送的字节数：Range 请求按范围长度估算（If-Range 由 nginx 判断，不在此处理）"""
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except RangeNotSatisfiable:
+        return 0
+    if byte_range is None:
+        return size
+    return byte_range[1] - byte_range[0] + 1
+
+
+def protected_path(path):
+    """返回文件相对 SENDFILE_ROOT 的路径，越出根目录时抛出异常"""
+    root = os.path.realpath(settings.SENDFILE_ROOT)
+    real_path = os.path.realpath(path)
+    if os.path.commonpath([root, real_path]) != root:
+        raise SuspiciousFileOperation(f'文件不在 SENDFILE_ROOT 目录下: {path}')
+    return os.path.relpath(real_path, root).replace(os.sep, '/')
+
+
+@lru_cache(maxsize=None)
+def get_backend(backend_path=None):
+    """按配置加载文件发送后端（每个进程只实例化一次）"""
+    return import_string(backend_path or settings.SENDFILE_BACKEND)()
+
+
+def send_file(request, path, filename, etag=None, content_type=None, as_attachment=True):
+    """使用配置的后端发送文件"""
+    return get_backend().send(request, path, filename, etag=etag, content_type=content_type,
+                              as_attachment=as_attachment)
@@ -0,0 +1,155 @@
+"""
+文件流式下载
+
+按块读取文件返回，单次下载的内存占用与文件大小无关；支持 HTTP Range / If-Range
+断点续传（206 Partial Content）以及基于 ETag 的条件请求。
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """请求的字节范围超出文件大小"""
+
+
+def parse_range(header, size):
+    """
+    解析 Range 请求头，返回闭区间 (start, end)
+
+    只支持单个字节范围，多段范围或格式错误时返回 None（按完整文件返回）；
+    范围无法满足时抛出 RangeNotSatisfiable。
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if start >= size:
+            raise RangeNotSatisfiable
+        if end < start:
+            return None
+        return start, min(end, size - 1)
+    if last:
+        # 后缀范围：bytes=-N 表示最后 N 个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    return None
+
+
+def if_range_matches(request, etag, last_modified):
+    """If-Range 条件是否成立（不成立时忽略 Range，返回完整文件）"""
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        # If-Range 只允许强校验
+        return etag is not None and value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and date == int(last_modified)
+
+
+def etag_matches(request, etag):
+    """If-None-Match 是否命中当前 ETag"""
+    value = request.META.get('HTTP_IF_NONE_MATCH')
+    if not value or etag is None:
+        return False
+    if value.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in value.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
+
+
+def content_disposition(filename, as_attachment=True):
+    """构造 Content-Disposition，非 ASCII 文件名按 RFC 5987 编码"""
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+    escaped = filename.replace('\\', '\\\\').replace('"', '\\"')
+    return f'{disposition}; filename="{escaped}"'
+
+
+def iter_file_range(path, start, length, chunk_size=CHUNK_SIZE):
+    """从 start 开始按块读取 length 个字节"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def serve_file(request, path, filename, etag=None, content_type=None, as_attachment=True):
+    """
+    流式返回文件
+
+    返回 200（完整文件）、206（部分内容）、304（未修改）或 416（范围无法满足）。
+    文件不存在时抛出 FileNotFoundError。
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if request.META.get('HTTP_RANGE') and if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_file_range(path, start, length), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = length
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Content-Disposition'] = content_disposition(filename, as_attachment)
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def is_initial_download(request, response):
+    """响应是否为一次新下载的开始（续传请求、304、416 不计入下载次数）"""
+    if response.status_code == 206:
+        return response['Content-Range'].startswith('bytes 0-')
+    if response.status_code != 200:
+        return False
+    if response.has_header('X-Accel-Redirect'):
+        # Range 由 nginx 处理，只能按请求头判断
+        byte_range = request.META.get('HTTP_RANGE', '').replace(' ', '')
+        return not byte_range or byte_range.startswith('bytes=0-')
+    return True
@@ -1,3 +1,383 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from mysite.metrics import MetricsMiddleware, registry
+from mysite.testing import PerformanceTestCase
+
+from . import hls, probe
+from .checks import check_hls_js
+from .models import Video
+from .sendfile import NginxBackend
+from .streaming import RangeNotSatisfiable, if_range_matches, parse_range, serve_file
+from .upload_handlers import hashed_uploads, install_hashing_handler
+
+
+class ViewPerformanceTests(PerformanceTestCase):
+    """页面和接口的查询预算"""
+
+    def setUp(self):
+        super().setUp()
+        # 带评论的视频
+        self.video = Video.objects.order_by('id').first()
+
+    def test_dashboard(self):
+        self.assertBudget(reverse('videos:dashboard'), queries=8)
+
+    def test_video_list(self):
+        self.assertBudget(reverse('videos:video_list'), queries=6)
+        self.assertBudget(reverse('videos:video_list'), queries=6, data={
+            'search': '视频', 'security_level': 2, 'sort': '-download_count', 'page': 2,
+        })
+
+    def test_video_detail(self):
+        self.assertBudget(reverse('videos:video_detail', args=[self.video.id]), queries=11)
+
+    def test_video_edit(self):
+        self.assertBudget(reverse('videos:video_edit', args=[self.video.id]), queries=7)
+
+    def test_video_upload(self):
+        self.assertBudget(reverse('videos:video_upload'), queries=4)
+
+    def test_video_delete(self):
+        self.assertBudget(reverse('videos:video_delete', args=[self.video.id]), queries=5)
+
+    def test_toggle_favorite(self):
+        self.assertBudget(reverse('videos:toggle_favorite', args=[self.video.id]), queries=8, method='POST')
+
+    def test_add_comment(self):
+        self.assertBudget(reverse('videos:add_comment', args=[self.video.id]), queries=7, method='POST',
+                          data={'content': '测试'})
+
+    def test_video_stream(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        path = os.path.join(media_root, self.video.file.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'0123456789')
+
+        url = reverse('videos:video_stream', args=[self.video.id])
+        self.assertEqual(self.video.get_file_url(), url)
+        with override_settings(MEDIA_ROOT=media_root, SENDFILE_ROOT=media_root):
+            response = self.client.get(url, {'quality': 'original'}, HTTP_RANGE='bytes=2-5')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), b'2345')
+            response.close()
+        # 在线播放不计入下载次数
+        self.assertEqual(Video.objects.get(id=self.video.id).download_count, self.video.download_count)
+
+    def test_video_download_missing_file(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root, SENDFILE_ROOT=media_root):
+            response = self.client.get(reverse('videos:video_download', args=[self.video.id]),
+                                       {'quality': 'original'})
+        # 文件不存在时返回 404，而不是当作下载失败重定向
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Video.objects.get(id=self.video.id).download_count, self.video.download_count)
+
+
+class StreamingTests(SimpleTestCase):
+    """Range / If-Range / ETag 条件请求"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        fd, self.path = tempfile.mkstemp()
+        self.data = bytes(range(256)) * 4
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.data)
+        self.addCleanup(os.remove, self.path)
+        self.mtime = os.stat(self.path).st_mtime
+
+    def serve(self, **headers):
+        return serve_file(self.factory.get('/', **headers), self.path, 'test.bin', etag='"v1"')
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1024), (0, 99))
+        self.assertEqual(parse_range('bytes=1000-', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=1000-5000', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=-24', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=-5000', 1024), (0, 1023))
+        # 格式错误、多段范围、结束位置小于开始位置：返回完整文件
+        for header in ('', 'bytes=', 'bytes=abc', 'bytes=0-1,5-6', 'items=0-1', 'bytes=10-5'):
+            self.assertIsNone(parse_range(header, 1024), header)
+        for header in ('bytes=1024-', 'bytes=-0'):
+            with self.assertRaises(RangeNotSatisfiable, msg=header):
+                parse_range(header, 1024)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=-1', 0)
+
+    def test_if_range_matches(self):
+        self.assertTrue(if_range_matches(self.factory.get('/'), '"v1"', self.mtime))
+        self.assertTrue(if_range_matches(self.factory.get('/', HTTP_IF_RANGE='"v1"'), '"v1"', self.mtime))
+        self.assertFalse(if_range_matches(self.factory.get('/', HTTP_IF_RANGE='"v2"'), '"v1"', self.mtime))
+        # If-Range 只允许强校验
+        self.assertFalse(if_range_matches(self.factory.get('/', HTTP_IF_RANGE='W/"v1"'), '"v1"', self.mtime))
+        date = http_date(self.mtime)
+        self.assertTrue(if_range_matches(self.factory.get('/', HTTP_IF_RANGE=date), '"v1"', self.mtime))
+        self.assertFalse(if_range_matches(self.factory.get('/', HTTP_IF_RANGE=date), '"v1"', self.mtime + 10))
+        self.assertFalse(if_range_matches(self.factory.get('/', HTTP_IF_RANGE='not a date'), '"v1"', self.mtime))
+
+    def test_full_response(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], '"v1"')
+        response.close()
+
+    def test_partial_response(self):
+        response = self.serve(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+        response = self.serve(HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[-10:])
+
+    def test_range_not_satisfiable(self):
+        response = self.serve(HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range_mismatch_returns_full_file(self):
+        response = self.serve(HTTP_RANGE='bytes=100-199', HTTP_IF_RANGE='"v0"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        response.close()
+
+        response = self.serve(HTTP_RANGE='bytes=100-199', HTTP_IF_RANGE='"v1"')
+        self.assertEqual(response.status_code, 206)
+        response.close()
+
+    def test_if_none_match(self):
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH='"v1"').status_code, 304)
+        self.assertEqual(self.serve(HTTP_IF_NONE_MATCH='"v0", W/"v1"').status_code, 304)
+        response = self.serve(HTTP_IF_NONE_MATCH='"v0"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+
+class UploadHandlerTests(SimpleTestCase):
+    """上传处理器边接收边计算摘要"""
+
+    CONTENT = b'upload-data' * 10000
+
+    def setUp(self):
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+
+    def upload_request(self):
+        return RequestFactory().post('/upload/', {'file': SimpleUploadedFile('scene.jpg', self.CONTENT)})
+
+    def test_digests(self):
+        request = self.upload_request()
+        install_hashing_handler(request, upload_dir=self.upload_dir)
+        uploaded = request.FILES['file']
+
+        self.assertEqual(uploaded.md5, hashlib.md5(self.CONTENT).hexdigest())
+        self.assertEqual(uploaded.sha256, hashlib.sha256(self.CONTENT).hexdigest())
+        self.assertEqual(uploaded.size, len(self.CONTENT))
+        # 写入指定目录的临时文件，保存时只需重命名
+        self.assertEqual(os.path.dirname(uploaded.temporary_file_path()), self.upload_dir)
+        self.assertEqual(uploaded.read(), self.CONTENT)
+        uploaded.close()
+
+    def test_hashed_uploads_keeps_csrf_check(self):
+        @hashed_uploads
+        def view(request):
+            return HttpResponse(request.FILES['file'].sha256)
+
+        with override_settings(UPLOAD_INCOMING_DIR=self.upload_dir):
+            rejected = self.upload_request()
+            self.assertEqual(view(rejected).status_code, 403)
+
+            request = self.upload_request()
+            request._dont_enforce_csrf_checks = True
+            response = view(request)
+        self.assertEqual(response.content.decode(), hashlib.sha256(self.CONTENT).hexdigest())
+        for uploaded in (rejected.FILES['file'], request.FILES['file']):
+            uploaded.close()
+
+
+def mp4_box(kind, *children):
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def mp4_track(handler, fourcc=b'avc1', width=0, height=0, timescale=30000, samples=(300, 1001)):
+    """只包含探测会读取的 box 的轨道"""
+    sample_entry = struct.pack('>I4s6xH16xHH', 36, fourcc, 1, width, height)
+    return mp4_box(
+        b'trak', mp4_box(b'mdia',
+            mp4_box(b'mdhd', struct.pack('>I8xII', 0, timescale, 0)),
+            mp4_box(b'hdlr', struct.pack('>II4s12x', 0, 0, handler)),
+            mp4_box(b'minf', mp4_box(b'stbl',
+                mp4_box(b'stsd', struct.pack('>II', 0, 1), sample_entry),
+                mp4_box(b'stts', struct.pack('>IIII', 0, 1, *samples)),
+            )),
+        ),
+    )
+
+
+def mp4_file(moov_last=False):
+    """1280x720 H.264，29.97fps，12.5 秒，前面有一条音频轨道"""
+    moov = mp4_box(
+        b'moov',
+        # moov 在末尾时使用 version 1 的 mvhd（64 位时长）
+        mp4_box(b'mvhd', struct.pack('>I16xIQ', 1 << 24, 1000, 12500) if moov_last
+                else struct.pack('>I8xII', 0, 1000, 12500)),
+        mp4_track(b'soun', fourcc=b'mp4a'),
+        mp4_track(b'vide', width=1280, height=720),
+    )
+    boxes = [mp4_box(b'ftyp', b'isom', b'\0\0\0\0'), mp4_box(b'mdat', b'\0' * 4096)]
+    boxes.insert(2 if moov_last else 1, moov)
+    return b''.join(boxes)
+
+
+def ebml(element_id, *children):
+    payload = b''.join(children)
+    size = bytes([0x80 | len(payload)]) if len(payload) < 0x7F else b'\x01' + len(payload).to_bytes(7, 'big')
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + size + payload
+
+
+def mkv_file():
+    """640x360 VP9，29.97fps，12.5 秒；Segment 为未知长度（流式写入的文件）"""
+    tracks = ebml(
+        probe.MKV_TRACKS,
+        ebml(probe.MKV_TRACK_ENTRY, ebml(probe.MKV_TRACK_TYPE, b'\x02'), ebml(probe.MKV_CODEC_ID, b'A_OPUS')),
+        ebml(
+            probe.MKV_TRACK_ENTRY,
+            ebml(probe.MKV_TRACK_TYPE, b'\x01'),
+            ebml(probe.MKV_CODEC_ID, b'V_VP9'),
+            ebml(probe.MKV_DEFAULT_DURATION, (33366667).to_bytes(4, 'big')),
+            ebml(probe.MKV_VIDEO, ebml(probe.MKV_PIXEL_WIDTH, (640).to_bytes(2, 'big')),
+                 ebml(probe.MKV_PIXEL_HEIGHT, (360).to_bytes(2, 'big'))),
+        ),
+    )
+    info = ebml(
+        probe.MKV_INFO,
+        ebml(probe.MKV_TIMECODE_SCALE, (1000000).to_bytes(3, 'big')),
+        ebml(probe.MKV_DURATION, struct.pack('>d', 12500.0)),
+    )
+    segment = probe.MKV_SEGMENT.to_bytes(4, 'big') + b'\x01' + b'\xff' * 7
+    return (ebml(probe.EBML_HEADER, ebml(0x4282, b'matroska')) + segment + info + tracks
+            + ebml(probe.MKV_CLUSTER, b'\0' * 64))
+
+
+@mock.patch('videos.probe.ffprobe_available', return_value=False)
+class ProbeTests(SimpleTestCase):
+    """从容器头部探测元数据（合成的最小文件）"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def probe(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return probe.probe(path)
+
+    def assertVideo(self, fields, data, codec, resolution):
+        self.assertEqual(fields['duration'], timedelta(seconds=12.5))
+        self.assertEqual(fields['codec'], codec)
+        self.assertEqual(fields['resolution'], resolution)
+        self.assertEqual(fields['frame_rate'], 29.97)
+        self.assertEqual(fields['bitrate'], int(len(data) * 8 / 12.5))
+
+    def test_mp4_moov_first(self, ffprobe_available):
+        data = mp4_file()
+        self.assertVideo(self.probe('clip.mp4', data), data, 'h264', '1280x720')
+
+    def test_mp4_moov_last(self, ffprobe_available):
+        data = mp4_file(moov_last=True)
+        self.assertVideo(self.probe('clip.mov', data), data, 'h264', '1280x720')
+
+    def test_mkv(self, ffprobe_available):
+        data = mkv_file()
+        self.assertVideo(self.probe('clip.mkv', data), data, 'vp9', '640x360')
+
+    def test_truncated(self, ffprobe_available):
+        data = mp4_file(moov_last=True)
+        moov = data.index(b'moov') - 4
+        with self.assertLogs('videos', 'WARNING'):
+            self.assertEqual(self.probe('cut.mp4', data[:moov + 30]), {})
+        # 只有 EBML 头，没有 Segment
+        with self.assertLogs('videos', 'WARNING'):
+            self.assertEqual(self.probe('cut.mkv', mkv_file()[:20]), {})
+
+    def test_garbage(self, ffprobe_available):
+        for name in ('garbage.mp4', 'garbage.mkv', 'empty.mp4'):
+            data = b'' if name == 'empty.mp4' else b'not a video file' * 64
+            with self.subTest(name), self.assertLogs('videos', 'WARNING'):
+                self.assertEqual(self.probe(name, data), {})
+
+
+class HlsPlayerScriptTests(SimpleTestCase):
+    """hls.js 跨域加载必须带 SRI 摘要"""
+
+    CDN_URL = 'https://cdn.jsdelivr.net/npm/hls.js@1.5.13/dist/hls.min.js'
+
+    def test_cdn_requires_integrity(self):
+        with override_settings(HLS_JS_URL=self.CDN_URL, HLS_JS_INTEGRITY=''):
+            self.assertIsNone(hls.player_script())
+            self.assertEqual([warning.id for warning in check_hls_js(None)], ['videos.W001'])
+        with override_settings(HLS_JS_URL=self.CDN_URL, HLS_JS_INTEGRITY='sha384-abc'):
+            self.assertEqual(hls.player_script(), {'url': self.CDN_URL, 'integrity': 'sha384-abc'})
+            self.assertEqual(check_hls_js(None), [])
+
+    def test_self_hosted(self):
+        with override_settings(HLS_JS_URL='/static/vendor/hls.min.js', HLS_JS_INTEGRITY=''):
+            self.assertEqual(hls.player_script(), {'url': '/static/vendor/hls.min.js', 'integrity': ''})
+            self.assertEqual(check_hls_js(None), [])
+
+
+class ResponseBytesMetricsTests(SimpleTestCase):
+    """X-Accel-Redirect 和没有 Content-Length 的流式响应也计入响应字节数"""
+
+    KEY = ('http_response_bytes_total', 'unmatched', 'GET', '')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, 'clip.mp4')
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 1000)
+        settings = override_settings(
+            SENDFILE_ROOT=self.root, METRICS_ENABLED=True, METRICS_DIR=self.root, METRICS_FLUSH_INTERVAL=3600,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def sent_bytes(self, get_response, **headers):
+        before = registry.counters.get(self.KEY, 0)
+        response = MetricsMiddleware(get_response)(RequestFactory().get('/download/', **headers))
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return registry.counters.get(self.KEY, 0) - before
+
+    def test_sendfile(self):
+        def view(request):
+            return NginxBackend().send(request, self.path, 'clip.mp4')
+
+        self.assertEqual(self.sent_bytes(view), 1000)
+        self.assertEqual(self.sent_bytes(view, HTTP_RANGE='bytes=100-199'), 100)
+        self.assertEqual(self.sent_bytes(view, HTTP_RANGE='bytes=5000-'), 0)
+
+    def test_streaming_without_content_length(self):
+        self.assertEqual(self.sent_bytes(lambda request: StreamingHttpResponse(iter([b'ab', b'cde']))), 5)
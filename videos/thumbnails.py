@@ -0,0 +1,221 @@
+"""
+缩略图与视频封面生成
+
+上传完成后作为后台任务（jobs）执行，列表页只加载缩略图，原始文件仅在预览/下载时读取：
+- 图片：按 THUMBNAIL_WIDTHS 生成多种宽度的 WebP/JPEG 缩略图
+- 视频：用 ffmpeg 截取一帧作为封面，再按封面生成缩略图
+
+缩略图按文件内容（sha256）命名，相同内容只生成一次。未安装 ffmpeg 时跳过视频封面。
+"""
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from jobs.queue import enqueue, task
+
+logger = logging.getLogger('videos')
+
+THUMBNAIL_DIR = 'thumbnails'
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+def thumbnail_formats():
+    """缩略图格式：JPEG 始终生成，作为 WebP 的回退（Pillow 未编译 WebP 支持时只生成 JPEG）"""
+    if settings.THUMBNAIL_WEBP and features.check('webp'):
+        return ['webp', 'jpeg']
+    return ['jpeg']
+
+
+def media_kind(name):
+    """按扩展名判断文件类型：image / video / None"""
+    ext = os.path.splitext(name)[1].lower().lstrip('.')
+    if ext in settings.ALLOWED_IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in settings.ALLOWED_VIDEO_EXTENSIONS:
+        return 'video'
+    return None
+
+
+def thumbnail_relpath(key, width, fmt):
+    return f'{THUMBNAIL_DIR}/{key[:2]}/{key}_{width}.{FORMAT_EXTENSIONS[fmt]}'
+
+
+def poster_relpath(key):
+    return f'{THUMBNAIL_DIR}/{key[:2]}/{key}_poster.jpg'
+
+
+def _save_atomic(image, dest, fmt):
+    """先写入同目录的临时文件再重命名，避免请求读到写了一半的图片"""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, format=fmt.upper(), quality=settings.THUMBNAIL_QUALITY)
+        os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(tmp, dest)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _flatten(image):
+    """去除透明通道（JPEG 不支持透明，铺白色背景）"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def make_thumbnails(source_path, key, widths=None):
+    """
+    生成缩略图，返回 [{'width': 320, 'webp': 路径, 'jpeg': 路径}, ...]
+
+    不放大图片：原图比目标宽度小时只生成一份原尺寸缩略图。已存在的文件直接复用。
+    """
+    widths = sorted(widths or settings.THUMBNAIL_WIDTHS)
+    formats = thumbnail_formats()
+    result = []
+    with Image.open(source_path) as image:
+        # JPEG 解码时直接按比例缩小，大图可以少解码很多像素
+        image.draft('RGB', (widths[-1], widths[-1]))
+        image = ImageOps.exif_transpose(image)
+        image = _flatten(image)
+        for width in widths:
+            if width >= image.width:
+                width = image.width
+            paths = {fmt: thumbnail_relpath(key, width, fmt) for fmt in formats}
+            if not all(os.path.exists(os.path.join(settings.MEDIA_ROOT, p)) for p in paths.values()):
+                height = max(1, round(image.height * width / image.width))
+                thumb = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+                for fmt, path in paths.items():
+                    _save_atomic(thumb, os.path.join(settings.MEDIA_ROOT, path), fmt)
+            result.append(dict(width=width, **paths))
+            if width == image.width:
+                break
+    return result
+
+
+def extract_poster(video_path, dest, seconds=1.0):
+    """用 ffmpeg 截取视频帧作为封面，视频短于 seconds 时取第一帧；失败返回 False"""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    for offset in (seconds, 0):
+        command = [
+            settings.FFMPEG_BINARY, '-v', 'error', '-y',
+            '-ss', str(offset), '-i', video_path,
+            '-frames:v', '1', '-vf', f"scale='min({settings.POSTER_MAX_WIDTH},iw)':-2",
+            dest,
+        ]
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=settings.FFMPEG_TIMEOUT)
+        except FileNotFoundError:
+            logger.warning('未找到 ffmpeg，跳过视频封面生成')
+            return False
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            logger.warning(f'截取视频封面失败: {video_path}: {e}')
+            return False
+        if os.path.exists(dest) and os.path.getsize(dest) > 0:
+            return True
+    return False
+
+
+def generate(source_path, name, key):
+    """按文件类型生成缩略图，返回写入 media_files 记录的字段，无法生成时返回 None"""
+    kind = media_kind(name)
+    if kind == 'image':
+        return {'thumbnails': make_thumbnails(source_path, key)}
+    if kind == 'video':
+        poster = poster_relpath(key)
+        poster_path = os.path.join(settings.MEDIA_ROOT, poster)
+        if not os.path.exists(poster_path) and not extract_poster(source_path, poster_path):
+            return None
+        return {'poster': poster, 'thumbnails': make_thumbnails(poster_path, key)}
+    return None
+
+
+def media_key(entry):
+    """缩略图命名用的内容标识（旧格式记录没有 sha256，按路径计算）"""
+    return entry.get('sha256') or hashlib.sha256(entry['path'].encode('utf-8')).hexdigest()
+
+
+@task
+def process_data_model(model_id):
+    """为数据模型中尚无缩略图的媒体文件生成缩略图"""
+    from accounts.models import DataModel
+
+    model = DataModel.objects.filter(id=model_id).first()
+    if model is None or not model.media_files:
+        return
+
+    results = {}
+    for entry in model.media_files:
+        if 'thumbnails' in entry or entry['path'] in results:
+            continue
+        source_path = os.path.join(settings.MEDIA_ROOT, entry['path'])
+        try:
+            fields = generate(source_path, entry['name'], media_key(entry))
+        except Exception as e:
+            logger.warning(f'生成缩略图失败: {entry["path"]}: {e}')
+            continue
+        if fields:
+            results[entry['path']] = fields
+    if not results:
+        return
+
+    # 生成期间媒体文件可能已被替换，重新加锁读取后按路径合并
+    with transaction.atomic():
+        model = DataModel.objects.select_for_update().filter(id=model_id).first()
+        if model is None:
+            return
+        for entry in model.media_files or []:
+            if entry['path'] in results:
+                entry.update(results[entry['path']])
+        model.save(update_fields=['media_files'])
+
+
+@task
+def process_video(video_id):
+    """为视频生成封面（图片类型直接缩放原图），保存到 Video.thumbnail"""
+    from .models import Video
+
+    video = Video.objects.filter(id=video_id).first()
+    if video is None or video.thumbnail or not video.file:
+        return
+
+    key = video.md5_hash or hashlib.sha256(video.file.name.encode('utf-8')).hexdigest()
+    fields = generate(video.file.path, video.file.name, key)
+    if fields:
+        Video.objects.filter(id=video_id, thumbnail='').update(thumbnail=fields['thumbnails'][-1]['jpeg'])
+
+
+@task
+def remove_thumbnails(key):
+    """删除内容对应的全部缩略图和封面"""
+    directory = os.path.join(settings.MEDIA_ROOT, THUMBNAIL_DIR, key[:2])
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(f'{key}_'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def schedule_data_model(model_id, created_by=None):
+    """提交数据模型缩略图任务（事务提交后执行）"""
+    return enqueue(process_data_model, args=[model_id], created_by=created_by)
+
+
+def schedule_video(video_id, created_by=None):
+    """提交视频封面任务（事务提交后执行）"""
+    return enqueue(process_video, args=[video_id], created_by=created_by)
@@ -11,6 +11,12 @@ urlpatterns = [
     path('list/', views.video_list, name='video_list'),
     path('<int:video_id>/', views.video_detail, name='video_detail'),
     path('<int:video_id>/download/', views.video_download, name='video_download'),
+    path('<int:video_id>/stream/', views.video_stream, name='video_stream'),
+    path('<int:video_id>/thumbnail/', views.video_thumbnail, name='video_thumbnail'),
+    
+    # HLS 播放
+    path('<int:video_id>/hls/master.m3u8', views.video_hls_master, name='video_hls_master'),
+    path('<int:video_id>/hls/<str:variant>/<str:filename>', views.video_hls_file, name='video_hls_file'),
     
     # 视频上传和编辑
     path('upload/', views.video_upload, name='video_upload'),
@@ -1,19 +1,25 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, Http404
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Sum
 from django.conf import settings
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import View
 import os
-import hashlib
-import mimetypes
 from .models import Video, Category, VideoComment, VideoFavorite
+from . import hls, probe, renditions, thumbnails
+from .sendfile import send_file
+from .streaming import is_initial_download
+from .upload_handlers import hashed_uploads
 from permissions.decorators import permission_required, security_level_required
-from audit.models import OperationLog
+from permissions.cache import get_max_security_level, user_has_permission
+from audit.writer import log_operation
+from jobs.views import job_accepted
 import json
 import logging
 
@@ -23,11 +29,7 @@ logger = logging.getLogger('videos')
 @login_required
 def dashboard(request):
     """仪表盘视图"""
-    try:
-        user_profile = request.user.userprofile
-        max_level = user_profile.max_security_level
-    except AttributeError:
-        max_level = 1
+    max_level = get_max_security_level(request.user)
     
     # 获取用户可访问的视频
     videos = Video.objects.filter(
@@ -35,11 +37,17 @@ def dashboard(request):
         security_level__lte=max_level
     )
     
-    # 统计数据
-    total_videos = videos.count()
-    total_size = videos.aggregate(total=Sum('file_size'))['total'] or 0
-    total_downloads = videos.aggregate(total=Sum('download_count'))['total'] or 0
-    total_views = videos.aggregate(total=Sum('view_count'))['total'] or 0
+    # 统计数据（一次聚合查询）
+    totals = videos.aggregate(
+        count=Count('id'),
+        size=Sum('file_size'),
+        downloads=Sum('download_count'),
+        views=Sum('view_count'),
+    )
+    total_videos = totals['count']
+    total_size = totals['size'] or 0
+    total_downloads = totals['downloads'] or 0
+    total_views = totals['views'] or 0
     
     # 按分类统计
     category_stats = videos.values('category__name').annotate(
@@ -58,10 +66,10 @@ def dashboard(request):
     ).order_by('-count')
     
     # 最近的视频
-    recent_videos = videos.order_by('-uploaded_at')[:10]
+    recent_videos = videos.select_related('uploader').order_by('-uploaded_at')[:10]
     
     # 热门视频
-    popular_videos = videos.order_by('-download_count')[:10]
+    popular_videos = videos.select_related('uploader').order_by('-download_count')[:10]
     
     context = {
         'total_videos': total_videos,
@@ -83,11 +91,7 @@ def dashboard(request):
 @permission_required('video:view')
 def video_list(request):
     """视频列表"""
-    try:
-        user_profile = request.user.userprofile
-        max_level = user_profile.max_security_level
-    except AttributeError:
-        max_level = 1
+    max_level = get_max_security_level(request.user)
     
     videos = Video.objects.filter(
         is_active=True,
@@ -116,9 +120,18 @@ def video_list(request):
     if file_type:
         videos = videos.filter(file_type=file_type)
     
+    # 按探测到的元数据筛选
+    codec = request.GET.get('codec')
+    if codec:
+        videos = videos.filter(codec=codec)
+    
+    resolution = request.GET.get('resolution')
+    if resolution:
+        videos = videos.filter(resolution=resolution)
+    
     # 排序
     sort_by = request.GET.get('sort', '-uploaded_at')
-    if sort_by in ['title', '-title', 'uploaded_at', '-uploaded_at', 'download_count', '-download_count', 'view_count', '-view_count']:
+    if sort_by in ['title', '-title', 'uploaded_at', '-uploaded_at', 'download_count', '-download_count', 'view_count', '-view_count', 'duration', '-duration']:
         videos = videos.order_by(sort_by)
     
     # 分页
@@ -136,6 +149,8 @@ def video_list(request):
         'category_id': category_id,
         'security_level': security_level,
         'file_type': file_type,
+        'codec': codec,
+        'resolution': resolution,
         'sort_by': sort_by,
         'security_levels': settings.SECURITY_LEVELS,
         'file_types': Video.FILE_TYPE_CHOICES,
@@ -148,7 +163,7 @@ def video_list(request):
 @permission_required('video:view')
 def video_detail(request, video_id):
     """视频详情"""
-    video = get_object_or_404(Video, id=video_id, is_active=True)
+    video = get_object_or_404(Video.objects.select_related('uploader'), id=video_id, is_active=True)
     
     # 检查权限
     if not video.can_user_access(request.user):
@@ -159,19 +174,14 @@ def video_detail(request, video_id):
     video.increment_view_count()
     
     # 记录观看日志
-    OperationLog.objects.create(
-        user=request.user,
-        operation_type='view',
-        result='success',
+    log_operation(
+        request, 'view', 'success', f'观看视频: {video.title}',
         content_object=video,
-        description=f'观看视频: {video.title}',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT'),
-        security_level=video.security_level
+        security_level=video.security_level,
     )
     
     # 获取评论
-    comments = video.comments.filter(is_active=True).order_by('-created_at')
+    comments = video.comments.filter(is_active=True).select_related('user').order_by('-created_at')
     
     # 检查是否已收藏
     is_favorited = False
@@ -181,13 +191,113 @@ def video_detail(request, video_id):
     except VideoFavorite.DoesNotExist:
         pass
     
+    # 多码率版本：按 ?quality= 或客户端带宽选择播放的版本
+    versions = sorted(video.versions.all(), key=lambda v: (-v.height, -v.bitrate))
+    selected_version = renditions.select_version(video, versions, request)
+    
     context = {
         'video': video,
         'comments': comments,
         'is_favorited': is_favorited,
+        'versions': versions,
+        'selected_version': selected_version,
+        # 固定为页面选中的版本，播放请求不再按带宽重新选择
+        'playback_url': video.get_file_url() + f'?quality={selected_version.label if selected_version else "original"}',
+        # 未指定清晰度时优先使用 HLS 自适应码率播放
+        'hls_url': (reverse('videos:video_hls_master', args=[video.id])
+                    if 'quality' not in request.GET and hls.is_packaged(video.id) else None),
+        'hls_js': hls.player_script(),
     }
     
-    return render(request, 'videos/video_detail.html', context)
+    response = render(request, 'videos/video_detail.html', context)
+    # 请浏览器在后续请求中携带 Downlink 带宽提示
+    response['Accept-CH'] = 'Downlink'
+    patch_vary_headers(response, ['Downlink'])
+    return response
+
+
+def _send_hls_file(request, path, max_age):
+    """发送播放列表或分片，ETag 取文件修改时间和大小（重新切片后失效）"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("文件不存在")
+    response = send_file(
+        request,
+        path,
+        filename=os.path.basename(path),
+        etag=f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        content_type=hls.CONTENT_TYPES[os.path.splitext(path)[1]],
+        as_attachment=False,
+    )
+    # 需登录才能访问，只允许浏览器缓存
+    response['Cache-Control'] = f'private, max-age={max_age}' if max_age else 'private, no-cache'
+    return response
+
+
+@login_required
+@permission_required('video:view')
+def video_hls_master(request, video_id):
+    """HLS 主播放列表（新的清晰度切片完成后会更新，每次重新验证）"""
+    video = get_object_or_404(Video.objects.only('id', 'security_level'), id=video_id, is_active=True)
+    if not video.can_user_access(request.user):
+        return JsonResponse({'error': '您没有权限访问此视频'}, status=403)
+    return _send_hls_file(request, hls.master_path(video.id), 0)
+
+
+@login_required
+@permission_required('video:view')
+def video_hls_file(request, video_id, variant, filename):
+    """HLS 清晰度播放列表和分片（切片后不再变化，由浏览器缓存）"""
+    video = get_object_or_404(Video.objects.only('id', 'security_level'), id=video_id, is_active=True)
+    if not video.can_user_access(request.user):
+        return JsonResponse({'error': '您没有权限访问此视频'}, status=403)
+    path = hls.file_path(video.id, variant, filename)
+    if path is None:
+        raise Http404("文件不存在")
+    return _send_hls_file(request, path, settings.HLS_CACHE_SECONDS)
+
+
+def _video_file(video, version):
+    """返回 (文件路径, 文件名, ETag)，version 为 None 时为原始文件"""
+    if version is not None:
+        return (
+            version.file.path,
+            f'{video.title}_{version.label}.mp4',
+            f'"{video.md5_hash}-{version.resolution}-{version.bitrate}"',
+        )
+    return video.file.path, f'{video.title}.{video.file_extension}', f'"{video.md5_hash}"'
+
+
+@login_required
+@permission_required('video:view')
+def video_stream(request, video_id):
+    """在线播放/查看文件（经权限检查，支持断点续传），?quality= 选择版本，不计入下载次数"""
+    video = get_object_or_404(Video, id=video_id, is_active=True)
+    if not video.can_user_access(request.user):
+        return JsonResponse({'error': '您没有权限访问此视频'}, status=403)
+    
+    version = renditions.select_version(video, list(video.versions.all()), request)
+    file_path, filename, etag = _video_file(video, version)
+    if not os.path.exists(file_path):
+        raise Http404("文件不存在")
+    return send_file(request, file_path, filename=filename, etag=etag, as_attachment=False)
+
+
+@login_required
+@permission_required('video:view')
+def video_thumbnail(request, video_id):
+    """视频封面（按内容命名，允许浏览器缓存）"""
+    video = get_object_or_404(Video.objects.only('id', 'security_level', 'thumbnail'), id=video_id, is_active=True)
+    if not video.can_user_access(request.user):
+        return JsonResponse({'error': '您没有权限访问此视频'}, status=403)
+    if not video.thumbnail or not os.path.exists(video.thumbnail.path):
+        raise Http404("封面不存在")
+    
+    filename = os.path.basename(video.thumbnail.name)
+    response = send_file(request, video.thumbnail.path, filename=filename, etag=f'"{filename}"', as_attachment=False)
+    response['Cache-Control'] = f'private, max-age={settings.MEDIA_CACHE_SECONDS}'
+    return response
 
 
 @login_required
@@ -204,52 +314,40 @@ def video_download(request, video_id):
         return redirect('videos:video_list')
     
     try:
-        # 增加下载次数
-        video.increment_download_count()
-        
-        # 记录下载日志
-        OperationLog.objects.create(
-            user=request.user,
-            operation_type='download',
-            result='success',
-            content_object=video,
-            description=f'下载视频: {video.title}',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT'),
-            security_level=video.security_level
-        )
-        
-        # 返回文件
-        file_path = video.file.path
+        # 按 ?quality= 或客户端带宽选择版本，默认下载原始文件
+        version = renditions.select_version(video, list(video.versions.all()), request)
+        file_path, filename, etag = _video_file(video, version)
         if not os.path.exists(file_path):
             raise Http404("文件不存在")
         
-        # 设置响应头
-        response = HttpResponse()
-        response['Content-Type'] = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
-        response['Content-Disposition'] = f'attachment; filename="{video.title}.{video.file_extension}"'
-        response['Content-Length'] = video.file_size
+        # 返回文件（流式读取，支持断点续传）
+        response = send_file(request, file_path, filename=filename, etag=etag)
         
-        # 读取文件内容
-        with open(file_path, 'rb') as f:
-            response.write(f.read())
+        # 续传请求不重复计数
+        if is_initial_download(request, response):
+            # 增加下载次数
+            video.increment_download_count()
+            
+            # 记录下载日志
+            log_operation(
+                request, 'download', 'success', f'下载视频: {video.title}',
+                content_object=video,
+                security_level=video.security_level,
+            )
         
         return response
         
+    except Http404:
+        raise
     except Exception as e:
         logger.error(f'下载视频失败: {str(e)}')
         
         # 记录失败日志
-        OperationLog.objects.create(
-            user=request.user,
-            operation_type='download',
-            result='failed',
+        log_operation(
+            request, 'download', 'failed', f'下载视频失败: {video.title}',
             content_object=video,
-            description=f'下载视频失败: {video.title}',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT'),
             security_level=video.security_level,
-            extra_data={'error': str(e)}
+            extra_data={'error': str(e)},
         )
         
         if request.headers.get('Accept') == 'application/json':
@@ -258,10 +356,19 @@ def video_download(request, video_id):
         return redirect('videos:video_detail', video_id=video_id)
 
 
+def _upload_failed(request, message):
+    """上传失败：页面通过 XHR 提交时返回 JSON，否则重新显示上传页面"""
+    if request.headers.get('Accept') == 'application/json':
+        return JsonResponse({'success': False, 'error': message}, status=400)
+    messages.error(request, message)
+    return render(request, 'videos/video_upload.html')
+
+
 @login_required
 @permission_required('video:upload')
+@hashed_uploads
 def video_upload(request):
-    """视频上传"""
+    """视频上传（文件在接收时已计算 MD5 并写入临时目录）"""
     if request.method == 'POST':
         try:
             # 获取表单数据
@@ -276,14 +383,12 @@ def video_upload(request):
             
             if not title or not file:
                 logger.error('标题或文件为空')
-                messages.error(request, '标题和文件不能为空')
-                return render(request, 'videos/video_upload.html')
+                return _upload_failed(request, '标题和文件不能为空')
             
             # 检查文件大小
             if file.size > settings.MAX_FILE_SIZE:
                 logger.error(f'文件过大: {file.size} > {settings.MAX_FILE_SIZE}')
-                messages.error(request, f'文件大小不能超过5GB，当前文件大小: {round(file.size / (1024*1024*1024), 2)}GB')
-                return render(request, 'videos/video_upload.html')
+                return _upload_failed(request, f'文件大小不能超过5GB，当前文件大小: {round(file.size / (1024*1024*1024), 2)}GB')
             
             # 检查文件类型
             file_extension = file.name.split('.')[-1].lower()
@@ -297,30 +402,22 @@ def video_upload(request):
                 file_type = 'model'
             else:
                 logger.error(f'不支持的文件格式: {file_extension}')
-                messages.error(request, f'不支持的文件格式: {file_extension}')
-                return render(request, 'videos/video_upload.html')
+                return _upload_failed(request, f'不支持的文件格式: {file_extension}')
             
-            # 计算MD5（分块读取避免内存问题）
-            file.seek(0)
-            md5_hash = hashlib.md5()
-            for chunk in file.chunks():
-                md5_hash.update(chunk)
-            md5_hash = md5_hash.hexdigest()
-            file.seek(0)
+            # MD5 已由上传处理器在接收文件时计算，无需再次读取文件
+            md5_hash = file.md5
             
             logger.info(f'文件MD5: {md5_hash}')
             
             # 检查是否已存在
             if Video.objects.filter(md5_hash=md5_hash).exists():
                 logger.warning(f'文件已存在: {md5_hash}')
+                if request.headers.get('Accept') == 'application/json':
+                    return JsonResponse({'success': False, 'error': '文件已存在，跳过上传'}, status=409)
                 messages.warning(request, '文件已存在，跳过上传')
                 return redirect('videos:video_list')
             
-            # 确保media目录存在
-            media_dir = os.path.join(settings.MEDIA_ROOT, 'videos')
-            os.makedirs(media_dir, exist_ok=True)
-            
-            # 创建视频记录
+            # 创建视频记录（临时文件与 MEDIA_ROOT 位于同一文件系统，保存时直接重命名）
             video = Video.objects.create(
                 title=title,
                 description=description,
@@ -337,25 +434,30 @@ def video_upload(request):
             
             logger.info(f'视频记录创建成功: {video.id}')
             
+            # 后台生成封面、探测元数据
+            job = thumbnails.schedule_video(video.id, request.user)
+            if file_type in ('video', 'image'):
+                probe.schedule_probe(video.id, request.user)
+            if file_type == 'video':
+                renditions.schedule_renditions(video.id, request.user)
+                hls.schedule_package(video.id, created_by=request.user)
+            
             # 记录上传日志
-            OperationLog.objects.create(
-                user=request.user,
-                operation_type='upload',
-                result='success',
+            log_operation(
+                request, 'upload', 'success', f'上传视频: {video.title}',
                 content_object=video,
-                description=f'上传视频: {video.title}',
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT'),
-                security_level=video.security_level
+                security_level=video.security_level,
             )
             
             messages.success(request, '视频上传成功')
+            if request.headers.get('Accept') == 'application/json':
+                return job_accepted(job, '视频上传成功', {'id': video.id},
+                                    redirect_url=reverse('videos:video_detail', args=[video.id]))
             return redirect('videos:video_detail', video_id=video.id)
             
         except Exception as e:
             logger.error(f'上传视频失败: {str(e)}', exc_info=True)
-            messages.error(request, f'上传失败: {str(e)}')
-            return render(request, 'videos/video_upload.html')
+            return _upload_failed(request, f'上传失败: {str(e)}')
     
     categories = Category.objects.filter(is_active=True)
     context = {
@@ -377,7 +479,7 @@ def video_edit(request, video_id):
     video = get_object_or_404(Video, id=video_id, is_active=True)
     
     # 检查权限（只有上传者或管理员可以编辑）
-    if video.uploader != request.user and not request.user.userprofile.has_permission('video:manage'):
+    if video.uploader != request.user and not user_has_permission(request.user, 'video:manage'):
         messages.error(request, '您没有权限编辑此视频')
         return redirect('videos:video_list')
     
@@ -390,15 +492,10 @@ def video_edit(request, video_id):
         video.save()
         
         # 记录编辑日志
-        OperationLog.objects.create(
-            user=request.user,
-            operation_type='edit',
-            result='success',
+        log_operation(
+            request, 'edit', 'success', f'编辑视频: {video.title}',
             content_object=video,
-            description=f'编辑视频: {video.title}',
-            ip_address=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT'),
-            security_level=video.security_level
+            security_level=video.security_level,
         )
         
         messages.success(request, '视频信息更新成功')
@@ -420,22 +517,17 @@ def video_delete(request, video_id):
     video = get_object_or_404(Video, id=video_id, is_active=True)
     
     # 检查权限（只有上传者或管理员可以删除）
-    if video.uploader != request.user and not request.user.userprofile.has_permission('video:manage'):
+    if video.uploader != request.user and not user_has_permission(request.user, 'video:manage'):
         messages.error(request, '您没有权限删除此视频')
         return redirect('videos:video_list')
     
     if request.method == 'POST':
         try:
             # 记录删除日志
-            OperationLog.objects.create(
-                user=request.user,
-                operation_type='delete',
-                result='success',
+            log_operation(
+                request, 'delete', 'success', f'删除视频: {video.title}',
                 content_object=video,
-                description=f'删除视频: {video.title}',
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT'),
-                security_level=video.security_level
+                security_level=video.security_level,
             )
             
             # 删除文件
@@ -443,6 +535,10 @@ def video_delete(request, video_id):
                 os.remove(video.file.path)
             if video.thumbnail and os.path.exists(video.thumbnail.path):
                 os.remove(video.thumbnail.path)
+            if video.md5_hash:
+                thumbnails.remove_thumbnails(video.md5_hash)
+            renditions.remove_versions(video)
+            hls.remove_hls(video.id)
             
             video.delete()
             messages.success(request, '视频删除成功')